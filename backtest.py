@@ -0,0 +1,241 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import breakout
+from config import config
+
+__all__ = ['load_bars', 'get_signals', 'backtest', 'print_summary']
+
+FIELDS = ['open', 'high', 'low', 'close']
+
+
+def read_bar_file(file_path):
+    if file_path.endswith('.parquet'):
+        return pd.read_parquet(file_path)
+    return pd.read_csv(file_path, dtype={'code': str})
+
+
+def load_bars(path):
+    """CSV/Parquet 일봉(code, date, open, high, low, close[, predicted])을 (종목, 일) 배열로 읽는다.
+
+    path 가 디렉터리면 그 안의 모든 .csv/.parquet 파일을 합친다.
+    """
+    if os.path.isdir(path):
+        files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                       if name.endswith('.csv') or name.endswith('.parquet'))
+        df = pd.concat([read_bar_file(file_path) for file_path in files], ignore_index=True)
+    else:
+        df = read_bar_file(path)
+
+    df = df.drop_duplicates(['code', 'date'], keep='last')
+    columns = FIELDS + (['predicted'] if 'predicted' in df.columns else [])
+    table = df.pivot(index='code', columns='date', values=columns).sort_index(axis=1)
+
+    bars = {
+        'codes': table.index.to_numpy(),
+        'dates': table['close'].columns.to_numpy(),
+    }
+    for column in columns:
+        bars[column] = table[column].to_numpy(dtype=float)
+    return bars
+
+
+def get_moving_averages(closes, window):
+    """전일까지의 종가 window 일 이동평균 (min_periods=1) 을 반환한다."""
+    filled = np.nan_to_num(closes)
+    valid = ~np.isnan(closes)
+    csum = np.concatenate([np.zeros((len(closes), 1)), np.cumsum(filled, axis=1)], axis=1)
+    ccount = np.concatenate([np.zeros((len(closes), 1)), np.cumsum(valid, axis=1)], axis=1)
+
+    days = closes.shape[1]
+    end = np.arange(days)  # t 일의 이동평균은 t-1 일까지
+    start = np.maximum(end - window, 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (csum[:, end] - csum[:, start]) / (ccount[:, end] - ccount[:, start])
+
+
+def get_rolling_best_k(bars, window, ks, chunk_size=256):
+    """t 일까지 window 일 일봉으로 breakout.get_best_k() 와 같이 고른 K 를 (종목, 일) 배열로 반환한다.
+
+    breakout.get_ror_grid() 의 d 일 수익률은 d 일과 그 다음 일자의 일봉에만 의존하므로, 일별 로그 수익률의 누적합에서
+    창 안의 최솟값을 빼면 창 별 최대 누적 수익률이 된다. (종목, 일, K) 배열만 사용한다.
+    """
+    opens, highs, lows, closes = (bars[field] for field in FIELDS)
+    codes, days = closes.shape
+    best_k = np.full((codes, days), np.nan)
+    if days < window:
+        return best_k
+
+    for start in range(0, codes, chunk_size):
+        stop = start + chunk_size
+        next_ranges = (highs[start:stop, 1:] - lows[start:stop, 1:])[:, :, None] * ks
+        targets = opens[start:stop, :-1, None] + next_ranges
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rors = np.where(highs[start:stop, :-1, None] > targets, closes[start:stop, :-1, None] / targets, 1.0)
+            log_rors = np.nan_to_num(np.log(rors))
+
+        # cum[:, e] = 0 ~ e-1 일 로그 수익률 합
+        cum = np.zeros((len(log_rors), days, len(ks)))
+        np.cumsum(log_rors, axis=1, out=cum[:, 1:])
+
+        lowest = cum[:, window - 1:].copy()
+        for offset in range(1, window):
+            np.minimum(lowest, cum[:, window - 1 - offset:days - offset], out=lowest)
+        best = np.round(cum[:, window - 1:] - lowest, 12)
+        best_k[start:stop, window - 1:] = ks[np.argmax(best, axis=2)]
+
+    return best_k
+
+
+def get_targets(bars, window, ks):
+    """전일까지 window 일 일봉으로 구한 K 로 일별 매수 목표가를 반환한다."""
+    highs, lows, closes = bars['high'], bars['low'], bars['close']
+    best_k = get_rolling_best_k(bars, window, ks)
+
+    # t 일 목표가 = (t-1) 일 종가 + (t-1) 일 변동폭 * K
+    targets = np.full(closes.shape, np.nan)
+    targets[:, 1:] = closes[:, :-1] + (highs[:, :-1] - lows[:, :-1]) * best_k[:, :-1]
+    return targets
+
+
+def get_signals(bars, window=10, k_step=None):
+    """sell_all_and_buy_code_list() 매수 조건을 일봉 전체에 대해 한 번에 계산한다.
+
+    진입가는 시가가 목표가 이상이면 시가, 장중 돌파면 목표가로 본다.
+    예측가(predicted) 열이 없으면 예측가 조건은 생략한다.
+    """
+    if k_step is None:
+        k_step = config.k_step
+    ks = breakout.get_k_grid(k_step)
+
+    opens, highs, closes = bars['open'], bars['high'], bars['close']
+    targets = get_targets(bars, window, ks)
+    ma5 = get_moving_averages(closes, 5)
+    ma10 = get_moving_averages(closes, 10)
+    prev_closes = np.concatenate([np.full((len(closes), 1), np.nan), closes[:, :-1]], axis=1)
+
+    entry_prices = np.fmax(opens, targets)
+    profit = config.profit_rate / 100
+    with np.errstate(invalid='ignore'):
+        entries = (highs > targets) \
+                  & (entry_prices < targets + targets * profit) \
+                  & (ma5 < entry_prices) \
+                  & (ma10 < entry_prices) \
+                  & (prev_closes < entry_prices)
+        if 'predicted' in bars:
+            entries &= entry_prices + entry_prices * profit < bars['predicted']
+
+    return {
+        'target': targets,
+        'ma5': ma5,
+        'ma10': ma10,
+        'entry': entries,
+        'entry_price': entry_prices,
+    }
+
+
+def backtest(bars, window=10, k_step=None, cash=10000000):
+    """매수 조건과 sell_all() 의 익절/손절(블랙리스트) 규칙으로 전 종목을 일 단위로 모의 매매한다.
+
+    일자만 순회하고 종목 방향은 배열 연산으로 처리한다.
+    """
+    signals = get_signals(bars, window, k_step)
+    opens, highs, lows, closes = (bars[field] for field in FIELDS)
+    codes, days = closes.shape
+    profit = config.profit_rate / 100
+    loss = config.loss_rate / 100
+
+    holding = np.zeros(codes, dtype=bool)
+    blacklisted = np.zeros(codes, dtype=bool)
+    entry_price = np.zeros(codes)
+    entry_day = np.zeros(codes, dtype=int)
+    shares = np.zeros(codes, dtype=int)
+
+    equity = np.empty(days)
+    trades = []
+    for t in range(days):
+        # 매도: 매수 다음 날부터 손절가/익절가에 닿으면 매도 (시가 갭은 시가로 체결)
+        held = holding & (entry_day < t)
+        if held.any():
+            stop_price = entry_price * (1 + loss)
+            take_price = entry_price * (1 + profit)
+            gap_stop = held & (opens[:, t] <= stop_price)
+            gap_take = held & ~gap_stop & (opens[:, t] >= take_price)
+            hit_stop = held & ~gap_stop & ~gap_take & (lows[:, t] <= stop_price)
+            hit_take = held & ~gap_stop & ~gap_take & ~hit_stop & (highs[:, t] >= take_price)
+
+            exit_price = np.where(gap_stop | gap_take, opens[:, t], np.where(hit_stop, stop_price, take_price))
+            stopped = gap_stop | hit_stop
+            exited = stopped | gap_take | hit_take
+            for i in np.flatnonzero(exited):
+                trades.append((bars['codes'][i], bars['dates'][entry_day[i]], entry_price[i],
+                               bars['dates'][t], exit_price[i], shares[i], bool(stopped[i])))
+            cash += float(np.sum(exit_price[exited] * shares[exited]))
+            holding &= ~exited
+            blacklisted |= stopped
+
+        # 매수: 목표 종목 수 한도와 주문 가능 금액 안에서 종목 순서대로
+        slots = config.target_buy_count - int(holding.sum())
+        candidates = np.flatnonzero(signals['entry'][:, t] & ~holding & ~blacklisted)
+        if 0 < slots and len(candidates):
+            prices = signals['entry_price'][candidates[:slots], t]
+            qty = (config.buy_amount // prices).astype(int)
+            cost = qty * prices
+            ok = (0 < qty) & (np.cumsum(cost) <= cash)
+            chosen = candidates[:slots][ok]
+            holding[chosen] = True
+            entry_price[chosen] = prices[ok]
+            entry_day[chosen] = t
+            shares[chosen] = qty[ok]
+            cash -= float(np.sum(cost[ok]))
+
+        marks = np.where(np.isnan(closes[:, t]), entry_price, closes[:, t])
+        equity[t] = cash + float(np.sum(marks[holding] * shares[holding]))
+
+    trades = pd.DataFrame(trades, columns=['code', 'entry_date', 'entry_price', 'exit_date',
+                                           'exit_price', 'shares', 'stop_loss'])
+    trades['pnl'] = (trades['exit_price'] - trades['entry_price']) * trades['shares']
+    trades['percentage'] = (trades['exit_price'] / trades['entry_price'] - 1) * 100
+
+    return {
+        'equity': pd.Series(equity, index=bars['dates']),
+        'trades': trades,
+        'hit_rate': float((trades['pnl'] > 0).mean()) if len(trades) else 0.0,
+        'signals': signals,
+    }
+
+
+def print_summary(result):
+    """백테스트 결과를 출력한다."""
+    equity = result['equity']
+    trades = result['trades']
+    print(f'기간: {equity.index[0]} ~ {equity.index[-1]} ({len(equity)}일)')
+    print(f'최종 평가금액: {equity.iloc[-1]:,.0f}원 ({(equity.iloc[-1] / equity.iloc[0] - 1) * 100:.2f}%)')
+    print(f'최대 낙폭: {((equity / equity.cummax()) - 1).min() * 100:.2f}%')
+    print(f'거래: {len(trades):,}건, 적중률: {result["hit_rate"] * 100:.2f}%, '
+          f'손절: {int(trades["stop_loss"].sum()):,}건')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='변동성 돌파 + 이동평균 매매 백테스트')
+    parser.add_argument('path', help='일봉 CSV/Parquet 파일 또는 디렉터리')
+    parser.add_argument('--window', type=int, default=10, help='K 계산 일봉 개수')
+    parser.add_argument('--k-step', type=float, default=config.k_step, help='K 후보 간격')
+    parser.add_argument('--cash', type=int, default=10000000, help='초기 금액')
+    parser.add_argument('--trades', help='거래 내역 CSV 저장 경로')
+    args = parser.parse_args()
+
+    t_start = time.perf_counter()
+    bars = load_bars(args.path)
+    t_loaded = time.perf_counter()
+    result = backtest(bars, args.window, args.k_step, args.cash)
+    t_done = time.perf_counter()
+
+    print_summary(result)
+    print(f'종목: {len(bars["codes"]):,}, 로딩: {t_loaded - t_start:.2f}초, 백테스트: {t_done - t_loaded:.2f}초')
+    if args.trades:
+        result['trades'].to_csv(args.trades, index=False)
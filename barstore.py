@@ -0,0 +1,228 @@
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+__all__ = ['FIELDS', 'BarStore']
+
+FIELDS = ['open', 'high', 'low', 'close', 'volume']
+
+# 배열 파일은 ROW_BLOCK 종목씩 늘린다. truncate 로 늘린 부분은 희소 파일이 아니면(NTFS 등) 바로 디스크를 차지한다.
+ROW_BLOCK = 256
+
+
+class BarStore:
+    """전 종목 일봉을 필드별 (종목, 일자) 메모리 맵 배열로 보관한다.
+
+    ./bars/<field>.f8 는 종목 순번 행, 일자 순번 열의 float64 배열(없으면 0)이고,
+    meta.json 에 종목 코드 색인, 일자 축, 종목별 마지막 수신 일자를 둔다.
+    파일은 max_codes 행을 한 번에 잡지 않고 종목이 늘어날 때 ROW_BLOCK 행씩 키운다.
+    update() 는 마지막 일봉 일자부터 빠진 일자만 받고, window() 는 배열의 슬라이스(복사 없음)를 돌려준다.
+    """
+
+    def __init__(self, path='./bars', max_codes=4096, max_days=1300, calendar=None):
+        self.path = path
+        self.max_codes = max_codes
+        self.max_days = max_days
+        self.calendar = calendar
+        self.codes = {}  # code -> 행 번호
+        self.dates = []  # 열 번호 -> YYYYMMDD
+        self.columns = {}  # YYYYMMDD -> 열 번호
+        self.last = {}  # code -> 마지막 일봉 일자 YYYYMMDD
+        self.updated = {}  # code -> 마지막으로 받은 날 YYYYMMDD
+        self.arrays = None
+        self.rows = 0  # 배열 파일에 잡혀 있는 종목 행 수
+        self.requests = 0
+        self.dirty = False
+
+    def get_file_path(self, name):
+        return os.path.join(self.path, name)
+
+    def open(self):
+        """메타 정보를 읽고 필드별 배열 파일을 메모리 맵으로 연다. 없으면 만든다."""
+        if self.arrays is not None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        meta_path = self.get_file_path('meta.json')
+        if os.path.isfile(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            self.max_codes, self.max_days = meta['max_codes'], meta['max_days']
+            self.codes = {code: i for i, code in enumerate(meta['codes'])}
+            self.dates = meta['dates']
+            self.columns = {day: i for i, day in enumerate(self.dates)}
+            self.last = meta['last']
+            self.updated = meta['updated']
+
+        sizes = [os.path.getsize(self.get_file_path(field + '.f8')) for field in FIELDS
+                 if os.path.isfile(self.get_file_path(field + '.f8'))]
+        rows = max(sizes, default=0) // (self.max_days * 8)
+        self.grow(max(rows, min(self.max_codes, ROW_BLOCK)))
+
+    def grow(self, rows):
+        """필드별 배열 파일을 rows 종목 크기로 늘리고 메모리 맵으로 다시 연다."""
+        if self.arrays:
+            for array in self.arrays.values():
+                array.flush()
+        self.arrays = None  # 파일 크기를 바꾸기 전에 메모리 맵을 닫는다.
+
+        for field in FIELDS:
+            file_path = self.get_file_path(field + '.f8')
+            if not os.path.isfile(file_path) or os.path.getsize(file_path) < rows * self.max_days * 8:
+                with open(file_path, 'ab') as f:
+                    f.truncate(rows * self.max_days * 8)
+
+        self.rows = rows
+        self.arrays = {field: np.memmap(self.get_file_path(field + '.f8'), dtype='<f8', mode='r+',
+                                        shape=(rows, self.max_days))
+                       for field in FIELDS}
+
+    def save(self):
+        """바뀐 일봉을 내려쓰고 메타 정보를 임시 파일에 쓴 뒤 교체한다."""
+        if not self.dirty:
+            return
+        for array in self.arrays.values():
+            array.flush()
+
+        meta = {
+            'max_codes': self.max_codes,
+            'max_days': self.max_days,
+            'codes': sorted(self.codes, key=self.codes.get),
+            'dates': self.dates,
+            'last': self.last,
+            'updated': self.updated,
+        }
+        meta_path = self.get_file_path('meta.json')
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + '.tmp', meta_path)
+        self.dirty = False
+
+    def get_row(self, code):
+        row = self.codes.get(code)
+        if row is None:
+            if self.max_codes <= len(self.codes):
+                raise IndexError(f'{self.path}: bar store is full ({self.max_codes} codes)')
+            row = self.codes[code] = len(self.codes)
+            if self.rows <= row:
+                self.grow(min(self.max_codes, self.rows + ROW_BLOCK))
+        return row
+
+    def get_column(self, day):
+        """일자의 열 번호를 반환한다. 새 일자는 뒤에 붙이고, 축에 없는 지난 일자는 None. (insert() 로 먼저 넣는다)"""
+        column = self.columns.get(day)
+        if column is not None:
+            return column
+        if self.dates and day < self.dates[-1]:
+            return None
+
+        if self.max_days <= len(self.dates):
+            self.roll(len(self.dates) - self.max_days + self.max_days // 10 + 1)
+        self.dates.append(day)
+        column = self.columns[day] = len(self.dates) - 1
+        return column
+
+    def roll(self, count):
+        """가장 오래된 count 일을 버리고 열을 앞으로 당긴다."""
+        for array in self.arrays.values():
+            array[:, :-count] = array[:, count:]
+            array[:, -count:] = 0
+        self.dates = self.dates[count:]
+        self.columns = {day: i for i, day in enumerate(self.dates)}
+
+    def insert(self, days):
+        """축의 마지막 일자보다 오래된 새 일자들을 제자리에 끼워 넣고 열을 뒤로 민다. (roll() 의 반대)
+
+        축이 가득 차면 가장 오래된 일자부터 버리므로, 남은 축보다 오래된 일자는 들어가지 않는다.
+        """
+        dates = sorted(set(self.dates).union(days))[-self.max_days:]
+        if dates == self.dates:
+            return
+        kept = [i for i, day in enumerate(self.dates) if day >= dates[0]]
+        targets = np.searchsorted(dates, [self.dates[i] for i in kept])
+        for array in self.arrays.values():
+            values = array[:, kept].copy()
+            array[:, :len(dates)] = 0
+            array[:, targets] = values
+        self.dates = dates
+        self.columns = {day: i for i, day in enumerate(self.dates)}
+
+    def write_bars(self, code, bars):
+        """(YYYYMMDD, 시가, 고가, 저가, 종가, 거래량) 목록을 기록한다. 순서는 상관없다."""
+        self.open()
+        row = self.get_row(code)
+        # 앞서 쓴 종목보다 과거 일봉이 길면 축 앞(또는 빠진 중간)에 일자를 넣어야 버리지 않는다.
+        older = {int(bar[0]) for bar in bars
+                 if self.dates and int(bar[0]) < self.dates[-1] and int(bar[0]) not in self.columns}
+        if older:
+            self.insert(older)
+        for bar in sorted(bars):
+            day = int(bar[0])
+            column = self.get_column(day)
+            if column is None:
+                continue
+            for field, value in zip(FIELDS, bar[1:]):
+                self.arrays[field][row, column] = value
+            self.last[code] = max(self.last.get(code, 0), day)
+
+    def get_missing_count(self, code, window, today=None):
+        """받아야 하는 일봉 개수를 반환한다. 마지막 수신 일자도 다시 받아 장중 일봉을 갱신한다."""
+        today = today or datetime.now()
+        last = self.last.get(code)
+        if last is None:
+            return window
+        if self.updated.get(code) == int(today.strftime('%Y%m%d')):
+            return 0
+        if self.calendar is None:
+            return window
+
+        missing = self.calendar.trading_days_between(str(last), today)
+        return min(self.max_days, missing + 1) if missing else 0
+
+    def update(self, code, window, fetch, today=None):
+        """빠진 일봉만 fetch(code, count) 로 받아 기록하고 받은 개수를 반환한다."""
+        self.open()
+        count = self.get_missing_count(code, window, today)
+        if count <= 0:
+            return 0
+
+        bars = fetch(code, count)
+        self.requests += 1
+        self.write_bars(code, bars)
+        self.updated[code] = int((today or datetime.now()).strftime('%Y%m%d'))
+        self.dirty = True
+        return len(bars)
+
+    def get_range(self, code, count):
+        """종목의 최근 count 일 열 범위 (start, end) 를 반환한다."""
+        end = self.columns.get(self.last.get(code), -1) + 1
+        return max(0, end - count), end
+
+    def window(self, code, field, count):
+        """종목의 최근 count 일 필드 값을 과거순 슬라이스로 반환한다. (복사 없음)"""
+        self.open()
+        row = self.codes.get(code)
+        if row is None:
+            return np.empty(0)
+        start, end = self.get_range(code, count)
+        return self.arrays[field][row, start:end]
+
+    def matrix(self, field, count):
+        """전 종목의 최근 count 일 필드 값을 (종목, 일자) 슬라이스로 반환한다. (복사 없음)"""
+        self.open()
+        end = len(self.dates)
+        return self.arrays[field][:len(self.codes), max(0, end - count):end]
+
+    def get_ohlc(self, code, count):
+        """get_ohlc() 과 같은 형식(최신 일자가 0번, 일자 인덱스)의 DataFrame 을 반환한다."""
+        self.open()
+        row = self.codes.get(code)
+        if row is None:
+            return pd.DataFrame(columns=['open', 'high', 'low', 'close'])
+
+        start, end = self.get_range(code, count)
+        df = pd.DataFrame({field: self.arrays[field][row, start:end] for field in ['open', 'high', 'low', 'close']},
+                          index=self.dates[start:end])
+        return df[df['close'] > 0][::-1]
@@ -0,0 +1,235 @@
+import argparse
+import contextlib
+import importlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from config import config
+
+
+def run_loop_bench(codes, cycles, latency, virtual, workers=0):
+    """시뮬레이션 브로커로 auto_trade() 루프 시간, 요청 수, 처리량을 측정한다. workers 가 있으면 병렬 평가를 쓴다."""
+    config.broker = 'sim'
+    import simulator
+
+    if virtual:
+        clock = simulator.SimClock()
+        market = simulator.SimMarket(codes=codes, latency=latency, clock=clock, sleep=clock.sleep)
+    else:
+        market = simulator.SimMarket(codes=codes, latency=latency)
+    simulator.set_market(market)
+
+    import trade
+    trade.slack_send_message = trade.print_message  # 벤치마크 중 슬랙 전송 안 함
+    trade.init_creon_objects()
+    trade.cpConclusion.Subscribe()
+    if workers:
+        from shard import ShardedEvaluator
+        trade.strategy = ShardedEvaluator(workers, 10, trade.indicator_engine.windows, trade.indicator_engine.ks,
+                                          config.profit_rate)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        t_start = time.perf_counter()
+        trade.get_code_list()
+        t_code_list = time.perf_counter() - t_start
+    # 거래량/등락률 상위 종목은 200 개까지이므로, 그보다 많은 후보의 평가 시간은 시장 종목으로 채워 잰다.
+    for code in market.codes:
+        if config.code_limit <= len(trade.code_list):
+            break
+        stock = market.stock(code)
+        trade.code_list.setdefault(code, (stock.volume, stock.price, stock.percent, stock.name))
+
+    loop_times = []
+    for _ in range(cycles):
+        with contextlib.redirect_stdout(io.StringIO()):
+            t_start = time.perf_counter()
+            trade.position_cache.invalidate()
+            trade.sell_watch_data()
+            trade.buy_watch_data()
+            trade.sell_all_and_buy_code_list()
+            loop_times.append(time.perf_counter() - t_start)
+
+    if workers:
+        trade.strategy.close()
+        trade.strategy = None
+
+    total = sum(loop_times)
+    print(f'universe: {codes} codes, code_list: {len(trade.code_list)}, cycles: {cycles}, '
+          f'latency: {latency * 1000:.1f}ms, clock: {"virtual" if virtual else "real"}, '
+          f'workers: {workers or "serial"}')
+    print(f'get_code_list: {t_code_list * 1000:10.2f}ms')
+    print(f'auto_trade loop: min {min(loop_times) * 1000:10.2f}ms  '
+          f'avg {total / cycles * 1000:10.2f}ms  max {max(loop_times) * 1000:10.2f}ms')
+    print(f'throughput: {len(trade.code_list) * cycles / total:10.1f} codes/s')
+    print(f'quota wait: {market.waited:10.2f}s')
+    for check_type, stats in trade.scheduler.stats().items():
+        print(f'quota[{check_type}]: requests {stats["requests"]:,}  waits {stats["waits"]:,}  '
+              f'wait {stats["wait_time"]:.2f}s  deferred {stats["deferred"]:,}  '
+              f'utilization {stats["utilization"] * 100:.0f}%')
+    print(f'position cache: hits {trade.position_cache.hits:,}  misses {trade.position_cache.misses:,}  '
+          f'invalidations {trade.position_cache.invalidations:,}')
+    print('requests:')
+    for prog_id, count in market.requests.most_common():
+        print(f'  {prog_id:24}{count:8,}  (rejected {market.rejects[prog_id]:,})')
+
+    return market, loop_times
+
+
+def setup_trade(codes, latency, virtual):
+    """새 작업 디렉터리와 시뮬레이션 시장에서 trade 모듈을 새로 불러와 초기화한다."""
+    config.broker = 'sim'
+    import simulator
+    from predtable import PredictionTable
+
+    os.chdir(tempfile.mkdtemp(prefix='auto-stock-bench-'))
+    clock = simulator.SimClock() if virtual else time.monotonic
+    sleep = clock.sleep if virtual else time.sleep
+    market = simulator.SimMarket(codes=codes, latency=latency, cash=10 ** 12, clock=clock, sleep=sleep)
+    simulator.set_market(market)
+
+    # 모든 종목의 예상가를 높게 두어 예상가 조건은 항상 통과시킨다.
+    table = PredictionTable('./predict/predict.tbl', writable=True)
+    for code in market.codes:
+        table.put(code, market.stock(code).price * 10)
+    table.flush()
+
+    import trade
+    trade = importlib.reload(trade)
+    trade.slack_send_message = trade.print_message  # 벤치마크 중 슬랙 전송 안 함
+    config.buy_amount = 10 ** 7
+    config.target_buy_count = codes
+    with contextlib.redirect_stdout(io.StringIO()):
+        trade.init_creon_objects()
+        trade.cpConclusion.Subscribe()
+        trade.get_watch_data()
+        trade.get_code_list()
+        trade.sell_all_and_buy_code_list()  # 일봉, 지표 준비
+        trade.update_subscriptions()
+    return trade, market
+
+
+def run_signal_bench(trade, market, path, signals, virtual):
+    """신호를 하나씩 넣고 그 종목의 주문이 나갈 때까지의 시간을 잰다.
+
+    path 'watch': 특징주 포착 이벤트 -> buy_watch_data() -> 매수 주문
+    path 'price': 실시간 체결가가 매수 목표가를 넘음 -> on_price() -> 매수 주문
+    지연 시간은 실제 경과 시간에 가상 시계로 진행한 요청 제한 대기를 더한 값이다.
+    """
+    import broker
+    from simulator import SimMarketWatchS, SimStockCur
+
+    def elapsed(wall_start, clock_start):
+        wall = time.perf_counter() - wall_start
+        return wall + (market.clock() - clock_start if virtual else 0.0)
+
+    # 지금 재는 신호의 종목과 시작 시각. 그 종목의 첫 주문이 나가는 순간의 경과 시간만 기록한다.
+    signal = {}
+    submit = trade.order_manager.submit
+
+    def timed_submit(order):
+        if order.code == signal.get('code') and 'latency' not in signal:
+            signal['latency'] = elapsed(*signal['start'])
+        return submit(order)
+
+    trade.order_manager.submit = timed_submit
+
+    buy_indicator = next(indicator for indicator, buy in trade.indicators.items() if buy is True)
+    holdings = trade.position_cache.peek()
+    if path == 'watch':
+        candidates = [code for code in market.codes
+                      if market.stock(code).big_listing and code not in holdings]
+    else:
+        candidates = []
+        for code in trade.code_list:
+            indicator = trade.indicator_engine.get(code)
+            if indicator is None or code in holdings or trade.code_list[code][2] <= 0:
+                continue
+            price = indicator['target'] * (1 + config.profit_rate / 200)  # 매수 구간 가운데
+            if indicator['ma5'] < price and indicator['ma10'] < price:
+                candidates.append((code, price))
+
+    latencies = []
+    missed = 0
+    requests = sum(market.requests.values())
+    t_total = time.perf_counter(), market.clock()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for candidate in candidates[:signals]:
+            code = candidate if path == 'watch' else candidate[0]
+            signal.clear()
+            signal['code'] = code
+            signal['start'] = time.perf_counter(), market.clock()
+            if path == 'watch':
+                publishers = [p for p in market.publishers if isinstance(p, SimMarketWatchS)]
+                for publisher in publishers:
+                    publisher.on_signal((int(time.strftime('%H%M')), code, buy_indicator))
+                broker.pump_events(0)  # CpEvent.OnReceived
+                trade.buy_watch_data()
+            else:
+                price = candidate[1]
+                stock = market.stock(code)
+                publishers = [p for p in market.publishers if isinstance(p, SimStockCur) and code in p.codes]
+                for publisher in publishers:
+                    publisher.fire({0: code, 1: stock.name, 4: stock.open, 5: max(stock.high, price),
+                                    6: stock.low, 9: stock.volume, 13: price, 18: int(time.strftime('%H%M%S'))}, [])
+                broker.pump_events(0)  # OnReceived -> on_price()
+
+            if 'latency' in signal:
+                latencies.append(signal['latency'])
+            else:
+                missed += 1
+    total = elapsed(*t_total)
+    trade.order_manager.submit = submit
+
+    count = len(latencies)
+    return {
+        'signals': count + missed,
+        'orders': count,
+        'p50': float(np.percentile(latencies, 50)) if count else float('nan'),
+        'p99': float(np.percentile(latencies, 99)) if count else float('nan'),
+        'max': max(latencies) if count else float('nan'),
+        'throughput': count / total if total else 0.0,
+        'requests': (sum(market.requests.values()) - requests) / max(count + missed, 1),
+    }
+
+
+def run_latency_suite(sizes, signals, latency, virtual):
+    """종목 수를 늘려가며 신호부터 매수 주문까지의 지연 시간(p50/p99)과 처리량을 출력한다."""
+    print(f'signals: {signals} per path, latency: {latency * 1000:.1f}ms, '
+          f'clock: {"virtual" if virtual else "real"}')
+    print(f'{"codes":>6} {"path":6} {"orders":>7} {"p50(ms)":>10} {"p99(ms)":>10} {"max(ms)":>10} '
+          f'{"orders/s":>9} {"req/signal":>10}')
+    results = []
+    for size in sizes:
+        for path in ('watch', 'price'):
+            trade, market = setup_trade(size, latency, virtual)
+            r = run_signal_bench(trade, market, path, signals, virtual)
+            results.append((size, path, r))
+            print(f'{size:6} {path:6} {r["orders"]:3}/{r["signals"]:<3} {r["p50"] * 1000:10.2f} '
+                  f'{r["p99"] * 1000:10.2f} {r["max"] * 1000:10.2f} {r["throughput"]:9.1f} {r["requests"]:10.1f}')
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='시뮬레이션 브로커 벤치마크')
+    parser.add_argument('--codes', type=int, default=config.sim_codes, help='시뮬레이션 종목 수')
+    parser.add_argument('--cycles', type=int, default=3, help='auto_trade 반복 횟수')
+    parser.add_argument('--latency', type=float, default=config.sim_latency, help='요청당 지연(초)')
+    parser.add_argument('--virtual', action='store_true', help='요청 제한 대기를 가상 시계로 진행')
+    parser.add_argument('--signal-latency', action='store_true', help='신호 -> 매수 주문 지연 시간 측정')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 500, 1000, 2000],
+                        help='신호 지연 측정 종목 수')
+    parser.add_argument('--signals', type=int, default=50, help='경로별 신호 수')
+    parser.add_argument('--workers', type=int, default=0, help='병렬 평가 작업 프로세스 수 (0 이면 순차 평가)')
+    parser.add_argument('--code-limit', type=int, default=config.code_limit, help='매수 후보 종목 수')
+    args = parser.parse_args()
+
+    config.code_limit = args.code_limit
+    if args.signal_latency:
+        run_latency_suite(args.sizes, args.signals, args.latency, args.virtual)
+    else:
+        os.chdir(tempfile.mkdtemp(prefix='auto-stock-bench-'))
+        run_loop_bench(args.codes, args.cycles, args.latency, args.virtual, args.workers)
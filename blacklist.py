@@ -0,0 +1,80 @@
+import csv
+import os
+from datetime import datetime
+
+__all__ = ['Blacklist']
+
+
+class Blacklist:
+    """blacklist.csv (code, name, percentage[, YYYYMMDD]) 를 메모리 색인으로 들고 있는다.
+
+    파일은 덧붙이기만 하므로 refresh() 는 크기/수정 시각이 바뀌었을 때 늘어난 부분만 읽는다.
+    days 가 0 보다 크면 등록일부터 days 거래일이 지난 종목은 블랙리스트에서 빠진다. (날짜 없는 행은 영구)
+    """
+
+    def __init__(self, path='blacklist.csv', days=0, calendar=None):
+        self.path = path
+        self.days = days
+        self.calendar = calendar
+        self.index = {}  # code -> (name, percentage, 해제일 또는 None)
+        self.offset = 0
+        self.mtime = None
+        self.today = datetime.now().date()
+
+    def get_expiry(self, day):
+        if not day or self.days <= 0 or self.calendar is None:
+            return None
+        return self.calendar.add_trading_days(datetime.strptime(day, '%Y%m%d').date(), self.days)
+
+    def add_row(self, row):
+        if not row:
+            return
+        code, name, percentage = row[0], row[1], row[2]
+        day = row[3] if 3 < len(row) else ''
+        self.index[code] = (name, percentage, self.get_expiry(day))
+
+    def refresh(self):
+        """파일이 바뀌었으면 덧붙은 행만 읽는다. 파일이 줄었으면 처음부터 다시 읽는다."""
+        self.today = datetime.now().date()
+        if not os.path.isfile(self.path):
+            return
+
+        stat = os.stat(self.path)
+        if stat.st_size == self.offset and stat.st_mtime == self.mtime:
+            return
+        if stat.st_size < self.offset:
+            self.index.clear()
+            self.offset = 0
+
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+
+        # 쓰다 만 마지막 줄은 다음에 읽는다.
+        end = data.rfind(b'\n') + 1
+        for row in csv.reader(data[:end].decode('utf-8').splitlines()):
+            self.add_row(row)
+        self.offset += end
+        self.mtime = stat.st_mtime
+
+    def add(self, code, name, percentage):
+        """블랙리스트에 종목을 덧붙인다."""
+        day = datetime.now().strftime('%Y%m%d')
+        row = [code, name, percentage, day]
+        with open(self.path, 'a', encoding="utf-8", newline='\n') as f:
+            csv_writer = csv.writer(f)
+            csv_writer.writerow(row)
+        self.index[code] = (name, percentage, self.get_expiry(day))
+
+    def __contains__(self, code):
+        entry = self.index.get(code)
+        if entry is None:
+            return False
+        return entry[2] is None or self.today < entry[2]
+
+    def get(self, code):
+        """블랙리스트에 있으면 [종목명, 손익] 을, 없으면 None 을 반환한다."""
+        if code not in self:
+            return None
+        name, percentage, _ = self.index[code]
+        return [name, percentage]
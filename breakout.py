@@ -0,0 +1,39 @@
+import numpy as np
+
+__all__ = ['get_k_grid', 'get_ror_grid', 'get_best_k']
+
+
+def get_k_grid(step=0.1):
+    """0 과 1 사이의 K 후보를 step 간격으로 반환한다. (0.1 -> 0.1 ~ 0.9)"""
+    count = int(round(1 / step))
+    return np.arange(1, count) / count
+
+
+def get_ror_grid(opens, highs, lows, closes, ks):
+    """(종목, 일) 배열과 K 후보로 (종목, K) 최대 누적 수익률을 반환한다.
+
+    최신 일자가 0번이고, d 번 일자의 목표가는 d 번 시가 + d-1 번 변동폭 * K 이다.
+    """
+    ranges = (highs - lows)[:, :, None] * ks  # (종목, 일, K)
+    targets = np.full(ranges.shape, np.nan)
+    targets[:, 1:, :] = opens[:, 1:, None] + ranges[:, :-1, :]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rors = np.where(highs[:, :, None] > targets, closes[:, :, None] / targets, 1.0)
+
+    return np.nanmax(np.cumprod(rors, axis=1), axis=1)
+
+
+def get_best_k(opens, highs, lows, closes, ks=None, chunk_size=256):
+    """종목별 누적 수익률이 가장 큰 K 를 반환한다. 같으면 작은 K 를 고른다."""
+    if ks is None:
+        ks = get_k_grid()
+    ks = np.asarray(ks, dtype=float)
+
+    best = np.empty(len(opens))
+    for start in range(0, len(opens), chunk_size):
+        stop = start + chunk_size
+        rors = get_ror_grid(opens[start:stop], highs[start:stop], lows[start:stop], closes[start:stop], ks)
+        best[start:stop] = ks[np.argmax(rors, axis=1)]
+    return best
+
@@ -0,0 +1,99 @@
+import ctypes
+import time
+
+import metrics
+from config import config
+
+__all__ = ['Dispatch', 'WithEvents', 'init_thread', 'is_user_admin', 'pump_events', 'clock', 'sleep']
+
+
+def Dispatch(prog_id):
+    """설정된 브로커(creon: 크레온 플러스, sim: 시뮬레이션, gateway: 게이트웨이 프로세스)의 COM 객체를 생성한다.
+    BlockRequest 는 계측한다."""
+    if config.broker == 'gateway':
+        import gateway
+        return metrics.instrument(gateway.get_client().Dispatch(prog_id), prog_id)
+
+    if config.broker == 'sim':
+        import simulator
+        return metrics.instrument(simulator.Dispatch(prog_id), prog_id)
+
+    import win32com.client
+    return metrics.instrument(win32com.client.Dispatch(prog_id), prog_id)
+
+
+def WithEvents(obj, handler_class):
+    """설정된 브로커의 실시간 이벤트 핸들러를 연결한다."""
+    if isinstance(obj, metrics.InstrumentedObject):
+        obj = obj._obj
+
+    if config.broker == 'gateway':
+        import gateway
+        return gateway.WithEvents(obj, handler_class)
+
+    if config.broker == 'sim':
+        import simulator
+        return simulator.WithEvents(obj, handler_class)
+
+    import win32com.client
+    return win32com.client.WithEvents(obj, handler_class)
+
+
+def init_thread():
+    """COM 객체를 만들고 이벤트를 받을 스레드에서 한 번 호출한다."""
+    if config.broker in ('sim', 'gateway'):
+        return
+
+    import pythoncom
+    pythoncom.CoInitialize()
+
+
+def is_user_admin():
+    """관리자 권한으로 프로세스가 실행 중인지 반환한다. (게이트웨이면 게이트웨이 프로세스가 확인한다.)"""
+    if config.broker in ('sim', 'gateway'):
+        return True
+
+    return bool(ctypes.windll.shell32.IsUserAnAdmin())
+
+
+def pump_events(timeout=0.0):
+    """timeout 초 동안 실시간 이벤트(OnReceived)를 처리한다. 시뮬레이션에서는 시장을 한 틱 진행한다."""
+    if config.broker == 'gateway':
+        import gateway
+        gateway.get_client().pump(timeout)
+        return
+
+    if config.broker == 'sim':
+        import simulator
+        market = simulator.get_market()
+        market.tick()
+        market.pump()
+        time.sleep(timeout)
+        return
+
+    import pythoncom
+    t_end = time.monotonic() + timeout
+    while True:
+        pythoncom.PumpWaitingMessages()
+        if t_end <= time.monotonic():
+            break
+        time.sleep(0.01)
+
+
+def clock():
+    """요청 제한 계산에 쓰는 단조 시계(초). 시뮬레이션에서는 시장의 시계를 따른다."""
+    if config.broker == 'sim':
+        import simulator
+        return simulator.get_market().clock()
+
+    return time.monotonic()
+
+
+def sleep(seconds):
+    """요청 제한 해제를 기다린다. 시뮬레이션에서는 시장의 시계를 따른다."""
+    if config.broker == 'sim':
+        import simulator
+        simulator.get_market().wait(seconds)
+        return
+
+    time.sleep(seconds)
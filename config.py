@@ -25,6 +25,27 @@ class Config(object):
         Config.__instance.profit_rate = float(parser['DEFAULT']['profit_rate'])
         Config.__instance.loss_rate = float(parser['DEFAULT']['loss_rate'])
         Config.__instance.K = float(parser['DEFAULT']['K'])
+        Config.__instance.k_step = float(parser['DEFAULT']['k_step'])
+        Config.__instance.quote_max_age = float(parser['DEFAULT']['quote_max_age'])
+        Config.__instance.realtime_limit = int(parser['DEFAULT']['realtime_limit'])
+        Config.__instance.tick_retention_days = int(parser['DEFAULT']['tick_retention_days'])
+        Config.__instance.predict_workers = int(parser['DEFAULT']['predict_workers'])
+        Config.__instance.predict_timeout = float(parser['DEFAULT']['predict_timeout'])
+        Config.__instance.strategy_workers = int(parser['DEFAULT']['strategy_workers'])
+        Config.__instance.watch_log_size = int(parser['DEFAULT']['watch_log_size'])
+        Config.__instance.blacklist_days = int(parser['DEFAULT']['blacklist_days'])
+        Config.__instance.connect_timeout = float(parser['DEFAULT']['connect_timeout'])
+        Config.__instance.state_path = parser['DEFAULT']['state_path']
+        Config.__instance.state_interval = float(parser['DEFAULT']['state_interval'])
+        Config.__instance.notify_queue_size = int(parser['DEFAULT']['notify_queue_size'])
+        Config.__instance.notify_coalesce = float(parser['DEFAULT']['notify_coalesce'])
+        Config.__instance.metrics_path = parser['DEFAULT']['metrics_path']
+        Config.__instance.metrics_port = int(parser['DEFAULT']['metrics_port'])
+        Config.__instance.gateway_address = parser['DEFAULT']['gateway_address']
+        Config.__instance.gateway_cache_ttl = float(parser['DEFAULT']['gateway_cache_ttl'])
+        Config.__instance.broker = parser['DEFAULT']['broker']
+        Config.__instance.sim_codes = int(parser['DEFAULT']['sim_codes'])
+        Config.__instance.sim_latency = float(parser['DEFAULT']['sim_latency'])
 
         return Config.__instance
 
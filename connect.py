@@ -3,12 +3,34 @@ import sys
 import time
 import traceback
 
-from pywinauto import application
-
+import broker
 from config import config
 
 
+def is_ready():
+    """크레온 플러스가 서버에 연결되고 주문 초기화까지 끝났는지 반환한다."""
+    try:
+        if broker.Dispatch('CpUtil.CpCybos').IsConnect == 0:
+            return False
+        return broker.Dispatch('CpTrade.CpTdUtil').TradeInit(0) == 0
+    except Exception:
+        return False  # 시작 중에는 COM 객체 생성이 실패할 수 있다.
+
+
+def wait_until_ready(timeout=180, interval=1.0, ready=is_ready, clock=time.monotonic, sleep=time.sleep):
+    """ready() 가 참이 될 때까지 interval 초마다 확인한다. timeout 초 안에 준비되면 True."""
+    t_end = clock() + timeout
+    while not ready():
+        if t_end <= clock():
+            return False
+        sleep(interval)
+    return True
+
+
 def connect():
+    """크레온 플러스를 다시 띄우고 연결될 때까지 기다린다. 준비되면 True, 시간 초과면 False."""
+    from pywinauto import application
+
     try:
         # os.system('taskkill /IM coStarter* /F /T')
         # os.system('wmic process where "name like \'%coStarter%\'" call terminate')
@@ -19,10 +41,15 @@ def connect():
         app = application.Application()
         app.start(f'C:\CREON\STARTER\coStarter.exe /prj:cp '
                   f'/id:{config.id} /pwd:{config.pwd} /pwdcert:{config.pwdcert} /autostart')
-        time.sleep(180)
+
+        t_start = time.monotonic()
+        ready = wait_until_ready(config.connect_timeout)
+        print(f'connect -> {"ready" if ready else "timeout"} ({time.monotonic() - t_start:.1f}s)')
+        return ready
     except OSError as e:
         traceback.print_exc(file=sys.stdout)
         print('`connect -> exception! ' + str(e) + '`')
+        return False
 
 
 if __name__ == '__main__':
@@ -0,0 +1,569 @@
+import argparse
+import itertools
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from datetime import datetime
+from multiprocessing.connection import Client, Listener
+
+from config import config
+from quota import (QUOTA_ORDER, QUOTA_QUOTE, PRIORITY_EXIT, PRIORITY_ORDER, PRIORITY_QUOTE, PRIORITY_UNIVERSE,
+                   RequestScheduler)
+from runtime import BrokerExecutor
+
+__all__ = ['SCHEMAS', 'get_address', 'get_quota_type', 'GatewayServer', 'GatewayClient', 'RemoteObject',
+           'get_client', 'WithEvents']
+
+# 요청/이벤트 후 클라이언트에 넘길 값: prog_id(소문자) -> (헤더 필드, 행 수 헤더 필드, 데이터 필드)
+# 데이터 필드가 int 면 그 입력 필드(요청 필드 목록)의 길이만큼 0, 1, 2, ... 를 넘긴다.
+SCHEMAS = {
+    'cpsysdib.cpsvr7049': ((0,), 0, (1, 2, 3, 5, 6)),
+    'cpsysdib.cpsvrnew7043': ((0,), 0, (0, 1, 2, 4, 6)),
+    'cpsysdib.marketeye': ((0, 2), 2, 0),
+    'cpsysdib.stockchart': ((3,), 3, 5),
+    'cpsysdib.cpmarketwatch': ((2,), 2, (0, 1, 3)),
+    'cpsysdib.cpmarketwatchs': ((0, 2), 2, (0, 1, 2)),
+    'dscbo1.stockmst': ((11, 14, 15), None, ()),
+    'dscbo1.stockbid': ((2,), 2, (4, 9)),
+    'dscbo1.stockcur': ((0, 1, 4, 5, 6, 9, 13, 18), None, ()),
+    'dscbo1.cpconclusion': ((2, 3, 4, 5, 9, 12, 14), None, ()),
+    'cptrade.cptd0311': ((8,), None, ()),
+    'cptrade.cptd6032': ((3,), None, ()),
+    'cptrade.cptdnew5331a': ((9,), None, ()),
+    'cptrade.cptd6033': ((7,), 7, (0, 11, 12, 15, 17)),
+    'cptrade.cptd5341': ((6,), 6, (3, 4, 9, 11, 13, 35)),
+}
+
+
+def get_address():
+    """게이트웨이 주소. 설정이 없으면 Windows 는 named pipe, 그 밖에는 Unix 소켓 파일이다."""
+    if config.gateway_address:
+        return config.gateway_address
+    if sys.platform == 'win32':
+        return r'\\.\pipe\auto-stock-gateway'
+    return './gateway.sock'
+
+
+def get_quota_type(prog_id):
+    """BlockRequest 가 쓰는 요청 제한 종류. 요청 제한이 없는 객체는 None."""
+    prog_id = prog_id.lower()
+    if prog_id.startswith('cputil.') or prog_id == 'cptrade.cptdutil':
+        return None
+    if prog_id.startswith('cptrade.'):
+        return QUOTA_ORDER
+    return QUOTA_QUOTE
+
+
+def freeze(value):
+    """입력값을 캐시 키로 쓸 수 있게 바꾼다. (목록 -> 튜플)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def snapshot(obj, prog_id, inputs):
+    """SCHEMAS 의 헤더/데이터 값을 읽어 (헤더, 행 목록) 으로 반환한다."""
+    headers, count_field, data_fields = SCHEMAS.get(prog_id.lower(), ((), None, ()))
+    header = {field: obj.GetHeaderValue(field) for field in headers}
+    data = []
+    if count_field is not None:
+        if isinstance(data_fields, int):
+            data_fields = range(len(dict(inputs).get(data_fields, ())))
+        count = header[count_field] if count_field in header else obj.GetHeaderValue(count_field)
+        for i in range(count):
+            data.append({field: obj.GetDataValue(field, i) for field in data_fields})
+    return header, data
+
+
+class Topic:
+    """게이트웨이가 구독 중인 실시간 객체 하나와 그 구독자들"""
+
+    def __init__(self, key, obj):
+        self.key = key
+        self.obj = obj
+        self.subscribers = set()  # (Connection, 클라이언트 구독 번호)
+
+
+class GatewayEvent:
+    """게이트웨이 쪽 실시간 이벤트 핸들러. 받은 값을 구독자에게 보낸다."""
+
+    def set_params(self, server, topic):
+        self.server = server
+        self.topic = topic
+
+    def OnReceived(self):
+        self.server.publish(self.topic)
+
+
+class Connection:
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = threading.Lock()
+        self.topics = {}  # 클라이언트 구독 번호 -> Topic
+        self.closed = False
+
+    def send(self, message):
+        with self.lock:
+            if self.closed:
+                return
+            try:
+                self.conn.send(message)
+            except (OSError, EOFError):
+                self.closed = True
+
+
+class GatewayServer:
+    """크레온 세션 하나를 여러 로컬 프로세스(trade.py, predict.py, marketwatch.py)가 나눠 쓰게 한다.
+
+    COM 객체와 요청 제한은 게이트웨이의 브로커 스레드 하나가 모두 가진다. 클라이언트는 Unix 소켓
+    (Windows 는 named pipe) 으로 요청하고, 같은 시세 요청은 ttl 동안 캐시에서, 처리 중인 같은 요청은
+    그 결과를 같이 받는다. 실시간 구독은 같은 객체/입력이면 하나만 구독하고 이벤트를 구독자 모두에게 보낸다.
+    backend 는 Dispatch/WithEvents/init_thread/pump_events/clock/sleep 을 가진 모듈이다. (broker)
+    """
+
+    def __init__(self, address=None, backend=None, cache_ttl=None, pump_interval=0.05, max_cache=10000):
+        if backend is None:
+            import broker as backend
+        self.address = address or get_address()
+        self.backend = backend
+        self.cache_ttl = config.gateway_cache_ttl if cache_ttl is None else cache_ttl
+        self.pump_interval = pump_interval
+        self.max_cache = max_cache
+        self.executor = BrokerExecutor(backend.init_thread, name='gateway-broker')
+        self.scheduler = None
+        self.objects = {}  # prog_id -> 요청/속성용 COM 객체 (브로커 스레드에서만 쓴다)
+        self.lock = threading.Lock()
+        self.cache = {}  # (prog_id, 입력) -> (만료 시각, 결과)
+        self.inflight = {}  # (prog_id, 입력) -> Future
+        self.topics = {}  # (prog_id, 입력) -> Topic
+        self.connections = set()
+        self.listener = None
+        self.stopped = threading.Event()
+        self.counts = {'requests': 0, 'executed': 0, 'hits': 0, 'deduped': 0, 'events': 0, 'errors': 0}
+
+    # 브로커 스레드
+    def get_object(self, prog_id):
+        obj = self.objects.get(prog_id.lower())
+        if obj is None:
+            obj = self.objects[prog_id.lower()] = self.backend.Dispatch(prog_id)
+        return obj
+
+    def get_scheduler(self):
+        if self.scheduler is None:
+            self.scheduler = RequestScheduler(self.get_object('CpUtil.CpCybos'), self.backend.clock,
+                                              self.backend.sleep)
+        return self.scheduler
+
+    def execute(self, key, prog_id, inputs, priority, ttl):
+        """요청 토큰이 있으면 입력을 넣고 BlockRequest 한 뒤 결과를 캐시에 넣고 (True, 결과) 를 반환한다.
+
+        토큰이 없으면 기다리지 않고 (False, 남은 시간) 을 반환한다. 기다리는 것은 연결 스레드다. (call)
+        """
+        quota_type = get_quota_type(prog_id)
+        if quota_type is not None:
+            scheduler = self.get_scheduler()
+            if not scheduler.try_acquire(quota_type, priority):
+                return False, max(scheduler.time_until(quota_type, priority), 0.001)
+
+        obj = self.get_object(prog_id)
+        for field, value in inputs:
+            obj.SetInputValue(field, list(value) if isinstance(value, tuple) else value)
+        ret = obj.BlockRequest()
+        header, data = snapshot(obj, prog_id, inputs)
+        result = {'ret': ret, 'status': obj.GetDibStatus(), 'message': obj.GetDibMsg1(),
+                  'header': header, 'data': data, 'continue': getattr(obj, 'Continue', 0)}
+
+        with self.lock:
+            self.counts['executed'] += 1
+            if ttl and ret == 0 and key is not None:
+                if self.max_cache <= len(self.cache):
+                    now = time.monotonic()
+                    for expired in [k for k, (expires, _) in self.cache.items() if expires <= now]:
+                        del self.cache[expired]
+                self.cache[key] = (time.monotonic() + ttl, result)
+            # 캐시에 넣은 뒤 지워야 그 사이에 온 같은 요청이 다시 나가지 않는다.
+            self.inflight.pop(key, None)
+        return True, result
+
+    def get_attr(self, prog_id, name, args):
+        """속성을 읽거나 메서드를 부른다. 메서드를 args 없이 읽으면 CALLABLE 을 반환한다."""
+        value = getattr(self.get_object(prog_id), name)
+        if args is None:
+            return CALLABLE if callable(value) else value
+        return value(*args)
+
+    def add_subscriber(self, connection, topic_id, prog_id, inputs):
+        key = (prog_id.lower(), inputs)
+        topic = self.topics.get(key)
+        if topic is None:
+            obj = self.backend.Dispatch(prog_id)
+            for field, value in inputs:
+                obj.SetInputValue(field, list(value) if isinstance(value, tuple) else value)
+            topic = Topic(key, obj)
+            handler = self.backend.WithEvents(obj, GatewayEvent)
+            handler.set_params(self, topic)
+            obj.Subscribe()
+            self.topics[key] = topic
+        topic.subscribers.add((connection, topic_id))
+        connection.topics[topic_id] = topic
+
+    def remove_subscriber(self, connection, topic_id):
+        topic = connection.topics.pop(topic_id, None)
+        if topic is None:
+            return
+        topic.subscribers.discard((connection, topic_id))
+        if not topic.subscribers and self.topics.get(topic.key) is topic:
+            del self.topics[topic.key]
+            topic.obj.Unsubscribe()
+
+    def publish(self, topic):
+        """실시간 이벤트 값을 읽어 구독자 모두에게 보낸다."""
+        header, data = snapshot(topic.obj, topic.key[0], topic.key[1])
+        self.counts['events'] += 1
+        for connection, topic_id in list(topic.subscribers):
+            connection.send(('event', topic_id, header, data))
+
+    def pump(self):
+        self.backend.pump_events(0)
+
+    # 연결 스레드
+    def call(self, key, prog_id, inputs, priority, ttl):
+        """요청 토큰을 얻을 때까지 이 스레드에서 기다렸다가 브로커 스레드에서 요청한 결과를 반환한다.
+
+        브로커 스레드는 토큰을 기다리며 잠들지 않으므로, 예약분을 기다리는 시세 요청이 매도 주문을 막지 않는다.
+        """
+        while True:
+            done, value = self.executor.submit(priority, self.execute, key, prog_id, inputs, priority, ttl).result()
+            if done:
+                return value
+            self.backend.sleep(value)
+
+    def request(self, prog_id, inputs, priority, ttl):
+        """요청 결과를 반환한다. 시세 요청은 캐시와 처리 중인 같은 요청의 결과를 쓴다."""
+        inputs = tuple(sorted((field, freeze(value)) for field, value in inputs))
+        self.counts['requests'] += 1
+        if get_quota_type(prog_id) != QUOTA_QUOTE:
+            # 주문/계좌 요청은 같은 입력이어도 매번 보낸다.
+            return self.call(None, prog_id, inputs, priority, 0)
+
+        key = (prog_id.lower(), inputs)
+        ttl = self.cache_ttl if ttl is None else ttl
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None and time.monotonic() < entry[0]:
+                self.counts['hits'] += 1
+                return entry[1]
+            future = self.inflight.get(key)
+            if future is not None:
+                self.counts['deduped'] += 1
+                owner = False
+            else:
+                future = self.inflight[key] = Future()
+                owner = True
+
+        if owner:
+            # 같은 요청을 기다리는 쪽은 이 Future 로 결과를 같이 받는다.
+            try:
+                future.set_result(self.call(key, prog_id, inputs, priority, ttl))
+            except Exception as e:
+                with self.lock:
+                    self.inflight.pop(key, None)
+                future.set_exception(e)
+        return future.result()
+
+    def handle(self, connection, message):
+        kind, request_id = message[0], message[1]
+        try:
+            if kind == 'request':
+                _, _, prog_id, inputs, priority, ttl = message
+                result = self.request(prog_id, inputs, priority, ttl)
+            elif kind == 'attr':
+                _, _, prog_id, name, args = message
+                result = self.executor.submit(PRIORITY_EXIT, self.get_attr, prog_id, name, args).result()
+            elif kind == 'subscribe':
+                _, _, prog_id, inputs = message
+                inputs = tuple(sorted((field, freeze(value)) for field, value in inputs))
+                result = self.executor.submit(PRIORITY_ORDER, self.add_subscriber, connection, request_id,
+                                              prog_id, inputs).result()
+            elif kind == 'unsubscribe':
+                result = self.executor.submit(PRIORITY_ORDER, self.remove_subscriber, connection,
+                                              message[2]).result()
+            elif kind == 'stats':
+                result = self.stats()
+            else:
+                raise ValueError(f'gateway: unknown message {kind}')
+        except Exception as e:
+            self.counts['errors'] += 1
+            connection.send(('error', request_id, e))
+            return
+        connection.send(('reply', request_id, result))
+
+    def serve_connection(self, conn):
+        connection = Connection(conn)
+        with self.lock:
+            self.connections.add(connection)
+        try:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    break
+                # 요청마다 스레드를 두어 느린 요청이 같은 클라이언트의 다른 요청을 막지 않게 한다.
+                threading.Thread(target=self.handle, args=(connection, message), daemon=True).start()
+        finally:
+            connection.closed = True
+            with self.lock:
+                self.connections.discard(connection)
+            for topic_id in list(connection.topics):
+                self.executor.submit(PRIORITY_ORDER, self.remove_subscriber, connection, topic_id)
+            conn.close()
+
+    def pump_loop(self):
+        """구독이 있는 동안 브로커 스레드에서 실시간 이벤트를 처리한다."""
+        while not self.stopped.wait(self.pump_interval):
+            if self.topics:
+                try:
+                    self.executor.submit(PRIORITY_UNIVERSE + 1, self.pump).result()
+                except Exception:
+                    traceback.print_exc(file=sys.stdout)
+
+    def start(self):
+        """주소에서 연결을 받기 시작한다."""
+        if sys.platform != 'win32' and os.path.exists(self.address):
+            os.remove(self.address)  # 지난번 실행이 남긴 소켓 파일
+        self.listener = Listener(self.address)
+        threading.Thread(target=self.accept_loop, name='gateway-accept', daemon=True).start()
+        threading.Thread(target=self.pump_loop, name='gateway-pump', daemon=True).start()
+        return self
+
+    def accept_loop(self):
+        while not self.stopped.is_set():
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                break
+            threading.Thread(target=self.serve_connection, args=(conn,), daemon=True).start()
+
+    def close(self):
+        self.stopped.set()
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+        for connection in list(self.connections):
+            with connection.lock:
+                connection.closed = True
+                connection.conn.close()
+        self.executor.shutdown(wait=False)
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts, cache=len(self.cache), topics=len(self.topics),
+                        subscribers=sum(len(topic.subscribers) for topic in self.topics.values()),
+                        clients=len(self.connections))
+
+
+# 속성이 메서드임을 알리는 값
+CALLABLE = '__gateway_callable__'
+
+
+class RemoteObject:
+    """게이트웨이 너머의 COM 객체. SetInputValue/BlockRequest/GetHeaderValue/GetDataValue 와 구독을 흉내 낸다.
+
+    BlockRequest 결과는 SCHEMAS 의 필드만 받아 두므로 그 밖의 필드를 읽으면 KeyError 가 난다.
+    """
+
+    def __init__(self, client, prog_id):
+        self._client = client
+        self._prog_id = prog_id
+        self._inputs = {}
+        self._header = {}
+        self._data = []
+        self._status = 0
+        self._message = ''
+        self._topic = None
+        self.Continue = 0  # 연속 조회. 요청 결과와 함께 받는다.
+        self.handlers = []
+        self.ttl = None  # 캐시 유지 시간. None 이면 게이트웨이 설정
+        self.priority = PRIORITY_ORDER if get_quota_type(prog_id) == QUOTA_ORDER else PRIORITY_QUOTE
+
+    def SetInputValue(self, field, value):
+        self._inputs[field] = value
+
+    def BlockRequest(self):
+        result = self._client.call('request', self._prog_id, list(self._inputs.items()), self.priority, self.ttl)
+        self._header = result['header']
+        self._data = result['data']
+        self._status = result['status']
+        self._message = result['message']
+        self.Continue = result['continue']
+        return result['ret']
+
+    def Request(self):
+        return self.BlockRequest()
+
+    def GetHeaderValue(self, field):
+        try:
+            return self._header[field]
+        except KeyError:
+            raise KeyError(f'gateway: {self._prog_id} header {field} is not in SCHEMAS') from None
+
+    def GetDataValue(self, field, index):
+        try:
+            return self._data[index][field]
+        except KeyError:
+            raise KeyError(f'gateway: {self._prog_id} data {field} is not in SCHEMAS') from None
+
+    def GetDibStatus(self):
+        return self._status
+
+    def GetDibMsg1(self):
+        return self._message
+
+    def Subscribe(self):
+        if self._topic is None:
+            self._topic = self._client.subscribe(self, list(self._inputs.items()))
+
+    def Unsubscribe(self):
+        if self._topic is not None:
+            self._client.unsubscribe(self._topic)
+            self._topic = None
+        self.handlers.clear()
+
+    def on_event(self, header, data):
+        self._header = header
+        self._data = data
+        for handler in list(self.handlers):
+            handler.OnReceived()
+
+    def __getattr__(self, name):
+        # IsConnect, GetLimitRemainCount, AccountNumber, CodeToName 등은 게이트웨이의 객체에 묻는다.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        value = self._client.call('attr', self._prog_id, name, None)
+        if value != CALLABLE:
+            return value
+
+        def method(*args):
+            return self._client.call('attr', self._prog_id, name, args)
+
+        self.__dict__[name] = method
+        return method
+
+
+class GatewayClient:
+    """게이트웨이에 연결해 요청하고, 실시간 이벤트는 pump() 를 부른 스레드에서 핸들러로 전달한다."""
+
+    def __init__(self, address=None):
+        self.conn = Client(address or get_address())
+        self.lock = threading.Lock()
+        self.sequence = itertools.count(1)
+        self.pending = {}  # 요청 번호 -> Future
+        self.subscriptions = {}  # 구독 번호 -> RemoteObject
+        self.events = queue.Queue()
+        self.thread = threading.Thread(target=self.read_loop, name='gateway-client', daemon=True)
+        self.thread.start()
+
+    def read_loop(self):
+        while True:
+            try:
+                kind, request_id, *values = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            if kind == 'event':
+                self.events.put((request_id, values[0], values[1]))
+                continue
+            future = self.pending.pop(request_id, None)
+            if future is None:
+                continue
+            if kind == 'error':
+                future.set_exception(values[0])
+            else:
+                future.set_result(values[0])
+
+        error = ConnectionError('gateway: connection closed')
+        for request_id in list(self.pending):
+            self.pending.pop(request_id).set_exception(error)
+
+    def send(self, kind, *args):
+        request_id = next(self.sequence)
+        future = self.pending[request_id] = Future()
+        with self.lock:
+            self.conn.send((kind, request_id) + args)
+        return request_id, future
+
+    def call(self, kind, *args):
+        return self.send(kind, *args)[1].result()
+
+    def Dispatch(self, prog_id):
+        return RemoteObject(self, prog_id)
+
+    def subscribe(self, obj, inputs):
+        request_id, future = self.send('subscribe', obj._prog_id, inputs)
+        self.subscriptions[request_id] = obj
+        future.result()
+        return request_id
+
+    def unsubscribe(self, topic_id):
+        self.subscriptions.pop(topic_id, None)
+        self.call('unsubscribe', topic_id)
+
+    def pump(self, timeout=0.0):
+        """timeout 초 동안 받은 실시간 이벤트를 구독 객체의 핸들러로 전달한다."""
+        t_end = time.monotonic() + timeout
+        while True:
+            try:
+                topic_id, header, data = self.events.get(timeout=max(0.0, t_end - time.monotonic()))
+            except queue.Empty:
+                break
+            obj = self.subscriptions.get(topic_id)
+            if obj is not None:
+                obj.on_event(header, data)
+
+    def stats(self):
+        return self.call('stats')
+
+    def close(self):
+        self.conn.close()
+
+
+_client = None
+
+
+def get_client():
+    """프로세스 공용 게이트웨이 클라이언트를 반환한다."""
+    global _client
+    if _client is None:
+        _client = GatewayClient()
+    return _client
+
+
+def WithEvents(obj, handler_class):
+    handler = handler_class()
+    obj.handlers.append(handler)
+    return handler
+
+
+if __name__ == '__main__':
+    """크레온 세션을 가진 게이트웨이를 띄운다. --broker sim 이면 Windows 없이 시뮬레이션 시장으로 동작한다."""
+    parser = argparse.ArgumentParser(description='broker gateway')
+    parser.add_argument('--broker', default=config.broker if config.broker != 'gateway' else 'creon',
+                        choices=['creon', 'sim'])
+    parser.add_argument('--address', default=None)
+    parser.add_argument('--report', type=float, default=60, help='통계 출력 주기(초)')
+    args = parser.parse_args()
+
+    config.broker = args.broker
+    server = GatewayServer(args.address).start()
+    print(datetime.now().strftime('[%Y-%m-%d %H:%M:%S]'), f'gateway: {server.address} ({args.broker})')
+    try:
+        while True:
+            time.sleep(args.report)
+            print(datetime.now().strftime('[%Y-%m-%d %H:%M:%S]'), 'gateway:', server.stats())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
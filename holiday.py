@@ -4,6 +4,7 @@ from datetime import datetime
 import requests
 
 from config import config
+from tradingday import TradingCalendar
 
 
 def get_request_query(params):
@@ -14,38 +15,42 @@ def get_request_query(params):
     return query
 
 
-def is_holiday():
-    date = datetime.now()
-
-    weekday = date.weekday()
-    if weekday == 5 or weekday == 6:
-        return True
-
-    solYear = date.year
-    solMonth = f'{date.month:02d}'
-    params = {'solYear': solYear, 'solMonth': solMonth}
+def get_holidays(year):
+    """인자로 받은 해의 공휴일을 {날짜: 이름} 으로 반환한다. 요청이 실패하면 None."""
+    params = {'solYear': year, 'numOfRows': 100}
 
     request_query = get_request_query(params)
     # print('request:', request_query)
 
-    response = requests.get(url=request_query)
+    response = requests.get(url=request_query, timeout=10)
     # print('status_code:', response.status_code)
 
-    if response.ok:
-        result = response.text
-
-        root = ET.fromstring(result)
-
-        today = str(solYear) + str(solMonth) + f'{date.day:02d}'
-        # print(today)
-        items = root.find('./body/items')
-        for item in items:
-            isHoliday = item.find('isHoliday').text
-            locdate = item.find('locdate').text
-            # print(locdate, isHoliday)
-            if today == locdate and isHoliday == 'Y':
-                print('holiday')
-                return True
+    if not response.ok:
+        return None
+
+    root = ET.fromstring(response.text)
+
+    holidays = {}
+    items = root.find('./body/items')
+    for item in items:
+        isHoliday = item.find('isHoliday').text
+        locdate = item.find('locdate').text
+        dateName = item.find('dateName').text
+        # print(locdate, isHoliday)
+        if isHoliday == 'Y':
+            holidays[datetime.strptime(locdate, '%Y%m%d').date()] = dateName
+
+    return holidays
+
+
+trading_calendar = TradingCalendar('./calendar', get_holidays)
+
+
+def is_holiday():
+    """오늘이 휴장일(주말, 공휴일, 거래소 휴장일)이면 True 를 반환한다. 공휴일은 해마다 한 번만 받는다."""
+    if not trading_calendar.is_trading_day(datetime.now()):
+        print('holiday')
+        return True
 
     return False
 
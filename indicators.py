@@ -0,0 +1,111 @@
+import numpy as np
+
+import breakout
+
+__all__ = ['compute_indicators', 'IndicatorEngine']
+
+
+def compute_indicators(opens, highs, lows, closes, windows=(5, 10), ks=None):
+    """과거순 (종목, 일) 배열로 이동평균, 전일 변동폭, 최적 K, 매수 목표가를 계산한다."""
+    results = {}
+    with np.errstate(invalid='ignore'):
+        for window in windows:
+            # rolling(min_periods=1) 처럼 있는 일봉만 평균한다.
+            recent = closes[:, -window:]
+            counts = np.sum(~np.isnan(recent), axis=1)
+            results[f'ma{window}'] = np.where(counts, np.nansum(recent, axis=1) / np.maximum(counts, 1), np.nan)
+
+    # breakout 은 최신 일자가 0번인 배열을 받는다.
+    best_k = breakout.get_best_k(opens[:, ::-1], highs[:, ::-1], lows[:, ::-1], closes[:, ::-1], ks)
+    ranges = highs[:, -1] - lows[:, -1]
+    results['k'] = best_k
+    results['range'] = ranges
+    results['target'] = closes[:, -1] + ranges * best_k  # 전일 종가 + 전일 변동폭 * K
+    return results
+
+
+class IndicatorEngine:
+    """전 종목 일봉을 (종목, 일) 배열 하나로 들고 이동평균, 변동폭, 매수 목표가를 한 번에 계산한다.
+
+    배열은 과거순(마지막 열이 최신 일자)이고 일수가 모자란 종목은 앞쪽을 NaN 으로 채운다.
+    계산 결과는 종목 코드 색인이 붙은 표(table) 로 두고, 매매 루프는 get() 으로 읽기만 한다.
+    """
+
+    def __init__(self, days=10, windows=(5, 10), ks=None):
+        self.days = days
+        self.windows = tuple(windows)
+        self.ks = breakout.get_k_grid() if ks is None else np.asarray(ks, dtype=float)
+        self.index = {}  # code -> 행 번호
+        self.bars = {column: np.empty((0, days)) for column in ('open', 'high', 'low', 'close')}
+        self.dtype = np.dtype([('code', 'U12'), ('k', '<f8'), ('range', '<f8'), ('target', '<f8')]
+                              + [(f'ma{window}', '<f8') for window in self.windows])
+        self.table = np.zeros(0, dtype=self.dtype)
+
+    def __contains__(self, code):
+        return code in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def set_bars(self, ohlcs, compute=True):
+        """{code: get_ohlc() DataFrame} 의 일봉을 넣고 그 종목들의 지표를 한 번에 계산한다."""
+        if not ohlcs:
+            return
+
+        new_codes = [code for code in ohlcs if code not in self.index]
+        if new_codes:
+            count = len(self.index)
+            for i, code in enumerate(new_codes):
+                self.index[code] = count + i
+            for column in self.bars:
+                self.bars[column] = np.vstack([self.bars[column], np.full((len(new_codes), self.days), np.nan)])
+            table = np.zeros(len(new_codes), dtype=self.dtype)
+            table['code'] = new_codes
+            self.table = np.concatenate([self.table, table])
+
+        rows = np.array([self.index[code] for code in ohlcs])
+        for column, array in self.bars.items():
+            array[rows] = np.nan
+            for row, ohlc in zip(rows, ohlcs.values()):
+                values = ohlc[column].to_numpy(dtype=float)[:self.days][::-1]  # 최신순 -> 과거순
+                if len(values):
+                    array[row, -len(values):] = values
+        if compute:
+            self.compute(rows)
+
+    def update_bar(self, code, open_price, high, low, close):
+        """새 일봉이 들어오면 그 종목의 배열을 한 칸 밀고 지표를 다시 계산한다."""
+        row = self.index.get(code)
+        if row is None:
+            return
+        for column, value in zip(('open', 'high', 'low', 'close'), (open_price, high, low, close)):
+            array = self.bars[column]
+            array[row, :-1] = array[row, 1:]
+            array[row, -1] = value
+        self.compute(np.array([row]))
+
+    def compute(self, rows=None):
+        """rows (없으면 전 종목) 의 지표를 다시 계산한다."""
+        if rows is None:
+            rows = np.arange(len(self.index))
+        if not len(rows):
+            return
+
+        results = compute_indicators(*(self.bars[column][rows] for column in ('open', 'high', 'low', 'close')),
+                                     self.windows, self.ks)
+        self.set_results(rows, results)
+
+    def set_results(self, rows, results):
+        """compute_indicators() 결과를 rows 에 쓴다. (다른 프로세스에서 계산한 결과 포함)"""
+        for name, values in results.items():
+            self.table[name][rows] = values
+
+    def get_bars(self, codes):
+        """종목들의 (open, high, low, close) 배열 묶음을 반환한다."""
+        rows = np.array([self.index[code] for code in codes], dtype=int)
+        return tuple(self.bars[column][rows] for column in ('open', 'high', 'low', 'close'))
+
+    def get(self, code):
+        """종목의 지표 레코드(code, k, range, target, ma<n>...)를 반환한다. 없으면 None."""
+        row = self.index.get(code)
+        return None if row is None else self.table[row]
@@ -1,10 +1,6 @@
 from collections import OrderedDict
 
-import win32com.client
-
-g_objCodeMgr = win32com.client.Dispatch('CpUtil.CpCodeMgr')
-g_objCpStatus = win32com.client.Dispatch('CpUtil.CpCybos')
-g_objCpTrade = win32com.client.Dispatch('CpTrade.CpTdUtil')
+import broker
 
 indicators = {
     10: '외국계증권사창구첫매수',
@@ -59,44 +55,34 @@ indicators = {
 
 # CpEvent: 실시간 이벤트 수신 클래스
 class CpEvent:
-    def set_params(self, client, listWatchData):
+    def set_params(self, client, watch_log):
         self.client = client  # CP 실시간 통신 object
-        self.listWatchData = listWatchData
+        self.watch_log = watch_log
 
     def OnReceived(self):
         # 실시간 처리 - marketwatch : 특이 신호(차트, 외국인 순매수 등)
         code = self.client.GetHeaderValue(0)
 
         for i in range(self.client.GetHeaderValue(2)):
-            time = self.client.GetDataValue(0, i)
-            h, m = divmod(time, 100)
-            item = {
-                'time': '%02d:%02d' % (h, m),
-                'code': code,
-                'indicator': ''
-            }
-            indicator = self.client.GetDataValue(2, i)
-            if indicator in indicators:
-                update = self.client.GetDataValue(1, i)
-                if update != ord('c'):
-                    item['indicator'] = indicator
-                    item['remark'] = indicators[indicator]
-            self.listWatchData[code] = item
+            update = self.client.GetDataValue(1, i)
+            if update == ord('c'):
+                continue  # 신호 해제: 이미 처리한 신호를 되돌리지 않으므로 기록하지 않는다.
+            self.watch_log.append(self.client.GetDataValue(0, i), code, self.client.GetDataValue(2, i))
 
 
 class CpPublish:
     def __init__(self, serviceID):
-        self.obj = win32com.client.Dispatch(serviceID)
+        self.obj = broker.Dispatch(serviceID)
 
     def Unsubscribe(self):
         self.obj.Unsubscribe()
 
-    def Subscribe(self, code, listWatchData):
+    def Subscribe(self, code, watch_log):
         if 0 < len(code):
             self.obj.SetInputValue(0, code)
 
-        handler = win32com.client.WithEvents(self.obj, CpEvent)
-        handler.set_params(self.obj, listWatchData)
+        handler = broker.WithEvents(self.obj, CpEvent)
+        handler.set_params(self.obj, watch_log)
         self.obj.Subscribe()
 
 
@@ -108,34 +94,71 @@ class CpMarketWatchS(CpPublish):
 
 # CpRpMarketWatch : 특징주 포착 통신
 class CpRpMarketWatch:
-    def __init__(self):
-        self.cpMarketWatch = win32com.client.Dispatch('CpSysDib.CpMarketWatch')
-        self.cpMarketWatchS = CpMarketWatchS()
+    """특징주 포착 실시간 구독 하나를 계속 유지한다.
 
-    def Request(self, code, listWatchData):
-        listWatchData.clear()
-
-        self.cpMarketWatchS.Unsubscribe()
+    처음 구독할 때와 연결이 끊겼다 다시 이어진 뒤에만 마지막으로 받은 시각 이후의 신호를 조회해 채운다.
+    connected() 는 연결 여부(CpCybos.IsConnect), wait(check_type) 는 요청 제한 대기다.
+    """
 
+    def __init__(self, connected=None, wait=None):
+        self.cpMarketWatch = broker.Dispatch('CpSysDib.CpMarketWatch')
+        self.cpMarketWatchS = CpMarketWatchS()
+        self.connected = connected
+        self.wait = wait
+        self.code = None
+        self.subscribed = False
+        self.subscribes = 0
+        self.backfills = 0
+        self.backfill_rows = 0
+        self.saved_requests = 0  # 구독이 살아 있어 하지 않은 전체 조회
+        self.saved_rows = 0  # 하지 않은 전체 조회가 받았을 행 수 (당일 받은 신호 수로 어림)
+
+    def disconnect(self):
+        """구독을 끊는다. 다음 Request() 에서 다시 구독하고 놓친 신호를 채운다."""
+        if self.subscribed:
+            self.cpMarketWatchS.Unsubscribe()
+            self.subscribed = False
+
+    def Request(self, code, watch_log):
+        """구독을 유지하고, 새로 구독했으면 watch_log(WatchLog) 의 마지막 시각 이후 신호를 덧붙인다."""
+        if self.connected is not None and not self.connected():
+            self.disconnect()
+            return
+
+        if self.subscribed and code == self.code:
+            self.saved_requests += 1
+            self.saved_rows += watch_log.next_seq - 1
+            return
+
+        self.disconnect()
+        # 먼저 구독하고 조회해야 그 사이의 신호를 놓치지 않는다. 겹치는 신호는 watch_log 가 걸러 낸다.
+        if self.wait:
+            self.wait(2)
+        self.code = code
+        self.cpMarketWatchS.Subscribe(code, watch_log)
+        self.subscribed = True
+        self.subscribes += 1
+        self.backfill(code, watch_log, watch_log.last_time)
+
+    def backfill(self, code, watch_log, since=0):
+        """since(hhmm) 이후의 특징주 포착을 watch_log 에 덧붙인다. 받은 적 있는 신호는 건너뛴다."""
         self.cpMarketWatch.SetInputValue(0, code)
         # 1: 종목 뉴스 2: 공시정보 10: 외국계 창구첫매수, 11:첫매도 # 12 외국인 순매수 13 순매도
         self.cpMarketWatch.SetInputValue(1, '1,2,10,11,12,13')
-        self.cpMarketWatch.SetInputValue(2, 0)  # 시작 시간: 0 처음부터
+        self.cpMarketWatch.SetInputValue(2, max(since, 0))  # 시작 시간: 0 처음부터
 
+        if self.wait:
+            self.wait(1)
         self.cpMarketWatch.BlockRequest()
-
-        for i in range(self.cpMarketWatch.GetHeaderValue(2)):
-            time = self.cpMarketWatch.GetDataValue(0, i)
-            h, m = divmod(time, 100)
-            code = self.cpMarketWatch.GetDataValue(1, i)
-            indicator = self.cpMarketWatch.GetDataValue(3, i)
-            item = {
-                'time': '%02d:%02d' % (h, m),
-                'code': code,
-                'indicator': indicator
-            }
-            if indicator in indicators:
-                item['remark'] = indicators[indicator]
-            listWatchData[code] = item
-
-        self.cpMarketWatchS.Subscribe(code, listWatchData)
+        self.backfills += 1
+
+        count = self.cpMarketWatch.GetHeaderValue(2)
+        self.backfill_rows += count
+        for i in range(count):
+            watch_log.append(self.cpMarketWatch.GetDataValue(0, i),  # 시각 hhmm
+                             self.cpMarketWatch.GetDataValue(1, i),  # 종목코드
+                             self.cpMarketWatch.GetDataValue(3, i))  # 지표
+
+    def report(self):
+        return f'특징주 구독: {self.subscribes}회, 보충 조회: {self.backfills}회 {self.backfill_rows}행, ' \
+               f'절약: 조회 {self.saved_requests}회 {self.saved_rows}행'
@@ -0,0 +1,222 @@
+import bisect
+import functools
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+__all__ = ['LATENCY_BUCKETS', 'Counter', 'Histogram', 'Registry', 'InstrumentedObject', 'registry', 'instrument',
+           'timed', 'observe_quota_wait', 'runtime_collector', 'write', 'serve']
+
+# 초 단위 지연 시간 구간 (Prometheus histogram le)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def render(self, name, labels):
+        yield f'{name}{format_labels(labels)} {self.value}'
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 마지막은 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            yield f'{name}_bucket{format_labels(labels + (("le", le),))} {total}'
+        yield f'{name}_sum{format_labels(labels)} {self.sum}'
+        yield f'{name}_count{format_labels(labels)} {self.count}'
+
+
+class Family:
+    """이름 하나에 레이블 조합별 측정값을 둔다."""
+
+    def __init__(self, name, help_text, kind, factory):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.factory = factory
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(sorted(labels.items()))
+        child = self.children.get(key)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(key, self.factory())
+        return child
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} {self.kind}'
+        for labels, child in list(self.children.items()):
+            yield from child.render(self.name, labels)
+
+
+class Registry:
+    def __init__(self):
+        self.families = {}
+        self.collectors = []  # 내보낼 때마다 불러서 (이름, 종류, 도움말, {레이블: 값}) 을 받는다.
+
+    def counter(self, name, help_text):
+        return self.families.setdefault(name, Family(name, help_text, 'counter', Counter))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self.families.setdefault(name, Family(name, help_text, 'histogram', lambda: Histogram(buckets)))
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self):
+        """Prometheus text format 으로 반환한다."""
+        lines = []
+        for family in list(self.families.values()):
+            lines.extend(family.render())
+        for collector in self.collectors:
+            for name, kind, help_text, samples in collector():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples.items():
+                    lines.append(f'{name}{format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+request_total = registry.counter('creon_requests_total', 'BlockRequest calls by COM object')
+request_errors = registry.counter('creon_request_errors_total', 'BlockRequest exceptions or non-zero returns')
+request_seconds = registry.histogram('creon_request_seconds', 'BlockRequest latency')
+quota_wait_seconds = registry.histogram('creon_quota_wait_seconds', 'Time spent waiting for the request quota')
+function_seconds = registry.histogram('trade_function_seconds', 'Top-level trade function latency')
+function_errors = registry.counter('trade_function_errors_total', 'Top-level trade function exceptions')
+
+
+class InstrumentedObject:
+    """COM 객체를 감싸 BlockRequest 의 횟수, 지연 시간, 오류를 기록한다. 나머지는 그대로 넘긴다."""
+
+    def __init__(self, obj, prog_id):
+        self.__dict__['_obj'] = obj
+        self.__dict__['_total'] = request_total.labels(prog_id=prog_id)
+        self.__dict__['_errors'] = request_errors.labels(prog_id=prog_id)
+        self.__dict__['_seconds'] = request_seconds.labels(prog_id=prog_id)
+
+    def BlockRequest(self):
+        start = time.perf_counter()
+        try:
+            ret = self._obj.BlockRequest()
+        except Exception:
+            self._errors.inc()
+            raise
+        finally:
+            self._seconds.observe(time.perf_counter() - start)
+            self._total.inc()
+        if ret:
+            self._errors.inc()
+        return ret
+
+    def __getattr__(self, name):
+        value = getattr(self._obj, name)
+        if callable(value):
+            self.__dict__[name] = value  # 메서드는 다음부터 바로 찾는다.
+        return value
+
+    def __setattr__(self, name, value):
+        setattr(self._obj, name, value)
+
+
+def instrument(obj, prog_id):
+    return InstrumentedObject(obj, prog_id)
+
+
+def timed(func):
+    """함수의 실행 시간과 예외를 기록한다."""
+    seconds = function_seconds.labels(function=func.__name__)
+    errors = function_errors.labels(function=func.__name__)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            seconds.observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+def observe_quota_wait(check_type, seconds):
+    quota_wait_seconds.labels(check_type=check_type).observe(seconds)
+
+
+def runtime_collector(runtime):
+    """Runtime 작업별 실행 통계를 내보내는 collector 를 반환한다."""
+    def collect():
+        stats = runtime.stats()
+        for key, kind, help_text in (('runs', 'counter', 'Job runs'),
+                                     ('skipped', 'counter', 'Job slots skipped after an overrun'),
+                                     ('coalesced', 'counter', 'Job slots coalesced after an overrun'),
+                                     ('deadline_misses', 'counter', 'Job runs that finished after the deadline'),
+                                     ('latency', 'gauge', 'Last job run time in seconds'),
+                                     ('latency_max', 'gauge', 'Longest job run time in seconds'),
+                                     ('lateness', 'gauge', 'Last job start delay in seconds'),
+                                     ('lateness_max', 'gauge', 'Longest job start delay in seconds')):
+            name = f'trade_job_{key}' + ('_total' if kind == 'counter' else '')
+            yield name, kind, help_text, {(('job', job),): s[key] for job, s in stats.items()}
+
+    return collect
+
+
+def write(path='./metrics/trade.prom'):
+    """node_exporter textfile collector 등이 읽도록 파일로 내보낸다."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(registry.render())
+    os.replace(temp_path, path)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port, host='127.0.0.1'):
+    """/metrics 를 내보내는 HTTP 서버를 백그라운드 스레드로 띄운다."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
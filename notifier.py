@@ -0,0 +1,157 @@
+import collections
+import sys
+import threading
+import time
+import traceback
+
+__all__ = ['DROP_OLDEST', 'DROP_NEW', 'BLOCK', 'SlackSink', 'MemorySink', 'Notifier']
+
+# 큐가 가득 찼을 때: 가장 오래된 메시지를 버림 / 새 메시지를 버림 / block_timeout 까지 기다린 뒤 새 메시지를 버림
+DROP_OLDEST = 'drop_oldest'
+DROP_NEW = 'drop_new'
+BLOCK = 'block'
+
+
+class SlackSink:
+    """슬랙 채널로 보낸다."""
+
+    def __init__(self, slack):
+        self.slack = slack
+
+    def post(self, channel, text):
+        self.slack.chat.post_message(channel, text)
+
+
+class MemorySink:
+    """보낸 메시지를 목록에 쌓는다. (슬랙 없이 시험할 때)"""
+
+    def __init__(self):
+        self.messages = []
+
+    def post(self, channel, text):
+        self.messages.append((channel, text))
+
+
+class Notifier:
+    """알림을 제한된 큐에 넣고 백그라운드 스레드에서 모아 보낸다. send() 는 네트워크를 기다리지 않는다.
+
+    같은 key 의 메시지가 coalesce_window 초 안에 다시 오면 보내지 않고 세었다가,
+    창이 끝나면 반복 횟수를 붙인 메시지 한 건으로 보낸다.
+    """
+
+    def __init__(self, sink, channel='#stock', maxsize=100, batch_size=20, batch_interval=1.0,
+                 coalesce_window=60.0, policy=DROP_OLDEST, block_timeout=0.1, clock=time.monotonic):
+        self.sink = sink
+        self.channel = channel
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.coalesce_window = coalesce_window
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.clock = clock
+
+        self.queue = collections.deque()
+        self.condition = threading.Condition()
+        self.recent = {}  # key -> [처음 보낸 시각, 마지막 메시지, 억누른 횟수]
+        self.closed = False
+        self.thread = None
+
+        self.sent = 0
+        self.batches = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.failures = 0
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.worker, name='notifier', daemon=True)
+            self.thread.start()
+
+    def send(self, message, key=None):
+        """메시지를 큐에 넣는다. 억눌렀거나 버렸으면 False 를 반환한다."""
+        self.start()
+        key = message if key is None else key
+        with self.condition:
+            now = self.clock()
+            entry = self.recent.get(key)
+            if entry is not None and now - entry[0] < self.coalesce_window:
+                entry[1] = message
+                entry[2] += 1
+                self.coalesced += 1
+                return False
+            self.recent[key] = [now, message, 0]
+            return self._put(message)
+
+    def _put(self, message):
+        if self.maxsize <= len(self.queue):
+            if self.policy == DROP_OLDEST:
+                self.queue.popleft()
+                self.dropped += 1
+            elif self.policy == BLOCK:
+                self.condition.wait_for(lambda: len(self.queue) < self.maxsize, self.block_timeout)
+                if self.maxsize <= len(self.queue):
+                    self.dropped += 1
+                    return False
+            else:
+                self.dropped += 1
+                return False
+
+        self.queue.append(message)
+        self.condition.notify_all()
+        return True
+
+    def expire(self, now):
+        """창이 끝난 억누른 메시지를 반복 횟수와 함께 큐에 넣는다."""
+        for key, (first, message, count) in list(self.recent.items()):
+            if self.coalesce_window <= now - first:
+                del self.recent[key]
+                if count:
+                    self._put(f'{message}\n(같은 메시지 {count}회 더)')
+
+    def worker(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.queue or self.closed, self.batch_interval)
+                self.expire(self.clock())
+                if not self.queue:
+                    if self.closed:
+                        return
+                    continue
+
+                # 잠깐 더 모아 한 번에 보낸다.
+                if len(self.queue) < self.batch_size and not self.closed:
+                    self.condition.wait_for(lambda: self.batch_size <= len(self.queue) or self.closed,
+                                            self.batch_interval)
+                batch = [self.queue.popleft() for _ in range(min(self.batch_size, len(self.queue)))]
+                self.condition.notify_all()
+
+            try:
+                self.sink.post(self.channel, '\n'.join(batch))
+                self.sent += len(batch)
+                self.batches += 1
+            except Exception:
+                self.failures += 1
+                traceback.print_exc(file=sys.stdout)
+
+    def close(self, timeout=5.0):
+        """억누른 메시지까지 보내고 스레드를 멈춘다."""
+        with self.condition:
+            for key, (first, message, count) in list(self.recent.items()):
+                if count:
+                    self._put(f'{message}\n(같은 메시지 {count}회 더)')
+            self.recent.clear()
+            self.closed = True
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def stats(self):
+        return {
+            'queued': len(self.queue),
+            'sent': self.sent,
+            'batches': self.batches,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'failures': self.failures,
+        }
@@ -0,0 +1,205 @@
+import itertools
+import time
+from datetime import datetime
+
+__all__ = ['PENDING', 'SUBMITTED', 'PARTIALLY_FILLED', 'FILLED', 'REJECTED', 'CANCELLED', 'SELL', 'BUY', 'Order',
+           'OrderManager']
+
+# 주문 상태
+PENDING = 'pending'  # 주문 요청 전
+SUBMITTED = 'submitted'  # 주문 접수
+PARTIALLY_FILLED = 'partially_filled'  # 일부 체결
+FILLED = 'filled'  # 전량 체결
+REJECTED = 'rejected'  # 거부
+CANCELLED = 'cancelled'  # 취소 (IOC 미체결 잔량 포함)
+
+TERMINAL_STATES = (FILLED, REJECTED, CANCELLED)
+
+# 매매구분
+SELL = '1'
+BUY = '2'
+
+# CpConclusion 체결구분
+FLAG_FILLED = '1'
+FLAG_CONFIRMED = '2'
+FLAG_REJECTED = '3'
+FLAG_ACCEPTED = '4'
+
+# CpTd0311 BlockRequest 반환값 4: 연속 주문 제한 (주문이 나가지 않았다)
+REQUEST_LIMITED = 4
+
+
+class Order:
+    """주문 한 건. client_id 는 프로그램이 붙이는 번호, order_id 는 증권사 주문번호다."""
+
+    def __init__(self, client_id, code, name, side, quantity, message=''):
+        self.client_id = client_id
+        self.code = code
+        self.name = name
+        self.side = side
+        self.quantity = quantity
+        self.message = message
+        self.order_id = None
+        self.state = PENDING
+        self.filled = 0
+        self.amount = 0  # 체결 금액 합
+        self.fills = []  # (체결수량, 체결가격)
+        self.attempts = 0
+        self.created = time.time()
+        self.updated = self.created
+
+    @property
+    def price(self):
+        """평균 체결가"""
+        return self.amount / self.filled if self.filled else 0
+
+    @property
+    def done(self):
+        return self.state in TERMINAL_STATES
+
+    def __repr__(self):
+        return f'Order({self.client_id}, {self.code}, side={self.side}, {self.filled}/{self.quantity}, {self.state})'
+
+
+class OrderManager:
+    """주문마다 client_id 와 상태를 두고, 실시간 체결 이벤트로 상태와 당일 주문/체결 장부를 갱신한다.
+
+    submit(order) 는 실제 주문을 내고 (BlockRequest 반환값, 주문번호) 를 반환한다.
+    체결 이벤트는 on_conclusion() 으로 받는다. (CpConclusion 리스너 또는 기록해 둔 이벤트 재생)
+    """
+
+    def __init__(self, submit, on_limited=None, today=None):
+        self.submit = submit
+        self.on_limited = on_limited  # 연속 주문 제한일 때 다시 내기 전에 부른다.
+        self.day = today or datetime.now().strftime('%Y%m%d')
+        self.sequence = itertools.count(1)
+        self.orders = {}  # client_id -> Order (당일 장부)
+        self.by_order_id = {}  # 주문번호 -> Order
+        self.by_code = {}  # code -> [Order]
+        self.listeners = []
+        self.unmatched = []  # 주문을 찾지 못한 체결 이벤트
+
+    def add_listener(self, listener):
+        """주문 상태가 바뀔 때마다 listener(order) 를 부른다."""
+        self.listeners.append(listener)
+
+    def roll(self, today=None):
+        """날짜가 바뀌었으면 장부를 비운다."""
+        today = today or datetime.now().strftime('%Y%m%d')
+        if today != self.day:
+            self.day = today
+            self.orders.clear()
+            self.by_order_id.clear()
+            self.by_code.clear()
+            self.unmatched.clear()
+
+    def place(self, code, name, side, quantity, message=''):
+        """주문을 내고 Order 를 반환한다. 연속 주문 제한이면 같은 client_id 로 한 번 더 낸다."""
+        self.roll()
+        order = Order(f'{self.day}-{next(self.sequence):05d}', code, name, side, quantity, message)
+        self.orders[order.client_id] = order
+        self.by_code.setdefault(code, []).append(order)
+
+        ret, order_id = self.request(order)
+        if ret == REQUEST_LIMITED:
+            # 제한에 걸린 주문은 나가지 않았으므로 다시 내도 중복 주문이 아니다.
+            if self.on_limited:
+                self.on_limited(order)
+            ret, order_id = self.request(order)
+
+        if ret != 0:
+            self.set_state(order, REJECTED)
+        elif order.state == PENDING:
+            if order_id and order_id not in self.by_order_id:
+                order.order_id = order_id
+                self.by_order_id[order_id] = order
+            self.set_state(order, SUBMITTED)
+        return order
+
+    def record(self, code, name, side, quantity, price):
+        """이 프로그램 밖에서(또는 재시작 전에) 체결된 당일 주문을 장부에 넣는다."""
+        self.roll()
+        order = Order(f'{self.day}-{next(self.sequence):05d}', code, name, side, quantity)
+        order.fills.append((quantity, price))
+        order.filled = quantity
+        order.amount = quantity * price
+        order.state = FILLED
+        self.orders[order.client_id] = order
+        self.by_code.setdefault(code, []).append(order)
+        return order
+
+    def request(self, order):
+        order.attempts += 1
+        return self.submit(order)
+
+    def set_state(self, order, state):
+        order.state = state
+        order.updated = time.time()
+        for listener in self.listeners:
+            listener(order)
+
+    def find(self, item):
+        """체결 이벤트의 주문을 찾는다. 주문번호를 모르면 같은 종목/매매구분의 진행 중인 주문으로 맞춘다."""
+        order_id = item.get('order_id')
+        order = self.by_order_id.get(order_id)
+        if order is None:
+            side = str(item.get('order'))
+            for candidate in self.by_code.get(item.get('code'), []):
+                if candidate.side == side and not candidate.done and candidate.order_id in (None, order_id):
+                    order = candidate
+                    break
+            if order is not None and order_id:
+                order.order_id = order_id
+                self.by_order_id[order_id] = order
+        return order
+
+    def on_conclusion(self, item):
+        """CpConclusion 이벤트(name, quantity, price, order_id, code, order, flag)로 주문 상태를 갱신한다."""
+        order = self.find(item)
+        if order is None:
+            self.unmatched.append(item)
+            return
+
+        flag = str(item.get('flag'))
+        if flag == FLAG_ACCEPTED:
+            if order.state == PENDING:
+                self.set_state(order, SUBMITTED)
+        elif flag == FLAG_FILLED:
+            quantity = int(item.get('quantity') or 0)
+            price = item.get('price') or 0
+            order.fills.append((quantity, price))
+            order.filled += quantity
+            order.amount += quantity * price
+            self.set_state(order, FILLED if order.quantity <= order.filled else PARTIALLY_FILLED)
+        elif flag == FLAG_REJECTED:
+            self.set_state(order, REJECTED)
+        elif flag == FLAG_CONFIRMED:
+            # IOC 미체결 잔량 취소 확인
+            if not order.done:
+                self.set_state(order, CANCELLED)
+
+    def replay(self, items):
+        """기록해 둔 체결 이벤트를 차례로 적용한다."""
+        for item in items:
+            self.on_conclusion(item)
+
+    def has_traded(self, code, side=None):
+        """당일 진행 중이거나 체결된 주문이 있는 종목인지 반환한다. (증권사 조회 없음)
+
+        거부됐거나 한 주도 체결되지 않고 끝난 주문(IOC 미체결 취소 등)은 다시 낼 수 있도록 세지 않는다.
+        """
+        self.roll()
+        return any((order.filled or not order.done) and (side is None or order.side == side)
+                   for order in self.by_code.get(code, []))
+
+    def get_orders(self, code=None):
+        """당일 주문 목록을 반환한다."""
+        if code is None:
+            return list(self.orders.values())
+        return list(self.by_code.get(code, []))
+
+    def stats(self):
+        states = {}
+        for order in self.orders.values():
+            states[order.state] = states.get(order.state, 0) + 1
+        return {'orders': len(self.orders), 'states': states, 'unmatched': len(self.unmatched)}
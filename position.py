@@ -0,0 +1,103 @@
+import time
+
+import broker
+
+__all__ = ['CpConclusionEvent', 'CpConclusion', 'PositionCache']
+
+
+# CpConclusionEvent: 실시간 주문 체결 이벤트 수신 클래스
+class CpConclusionEvent:
+    def set_params(self, client, listener):
+        self.client = client  # CP 실시간 통신 object
+        self.listener = listener
+
+    def OnReceived(self):
+        # 실시간 처리 - 주문 체결
+        item = {
+            'name': self.client.GetHeaderValue(2),  # 종목명
+            'quantity': self.client.GetHeaderValue(3),  # 체결수량
+            'price': self.client.GetHeaderValue(4),  # 체결가격
+            'order_id': self.client.GetHeaderValue(5),  # 주문번호
+            'code': self.client.GetHeaderValue(9),  # 종목코드
+            'order': self.client.GetHeaderValue(12),  # 매매구분 1: 매도, 2: 매수
+            'flag': self.client.GetHeaderValue(14),  # 체결구분 1: 체결, 2: 확인, 3: 거부, 4: 접수
+        }
+        self.listener(item)
+
+
+# CpConclusion: 계좌 주문 체결 실시간 구독
+class CpConclusion:
+    def __init__(self):
+        self.obj = broker.Dispatch('DsCbo1.CpConclusion')
+        self.listeners = []
+
+    def Subscribe(self):
+        handler = broker.WithEvents(self.obj, CpConclusionEvent)
+        handler.set_params(self.obj, self.on_received)
+        self.obj.Subscribe()
+
+    def Unsubscribe(self):
+        self.obj.Unsubscribe()
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def on_received(self, item):
+        for listener in self.listeners:
+            listener(item)
+
+
+class PositionCache:
+    """주식 잔고(CpTd6033) 조회 결과를 보관하고, 주기 시작/체결/주문 때만 다시 조회한다."""
+
+    def __init__(self, fetch, max_age=None, clock=time.monotonic):
+        self.fetch = fetch
+        self.max_age = max_age
+        self.clock = clock
+        self.positions = None
+        self.last = {}
+        self.updated = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self):
+        """유효한 잔고가 있으면 그대로, 없으면 조회해서 반환한다."""
+        if self.positions is not None \
+                and (self.max_age is None or self.clock() - self.updated <= self.max_age):
+            self.hits += 1
+            return self.positions
+
+        self.misses += 1
+        self.positions = self.last = self.fetch()
+        self.updated = self.clock()
+        return self.positions
+
+    def peek(self):
+        """조회 없이 마지막으로 받은 잔고를 반환한다."""
+        return self.last
+
+    def invalidate(self):
+        """다음 get() 에서 다시 조회하도록 표시한다."""
+        if self.positions is not None:
+            self.invalidations += 1
+        self.positions = None
+
+    def on_fill(self, item):
+        """체결/거부 이벤트를 받으면 잔고를 무효화한다. 매도 체결 수량은 peek() 잔고에서도 바로 뺀다."""
+        if item.get('flag') in (1, '1', 3, '3'):
+            self.invalidate()
+
+        # 1: 체결, 1: 매도. 다음 조회 전까지 peek() 가 판 종목을 계속 보유한 것으로 보이지 않게 한다.
+        if item.get('flag') in (1, '1') and item.get('order') in (1, '1'):
+            code = item.get('code')
+            stock = self.last.get(code)
+            if stock is None:
+                return
+            last = dict(self.last)  # 잔고를 돌고 있는 쪽이 있을 수 있으므로 새 dict 로 바꾼다.
+            shares = stock['shares'] - int(item.get('quantity') or 0)
+            if 0 < shares:
+                last[code] = dict(stock, shares=shares)
+            else:
+                del last[code]
+            self.last = last
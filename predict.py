@@ -1,41 +1,111 @@
-import csv
-import os
+import multiprocessing
 import sys
 import time
 import traceback
 from datetime import datetime
 
-import pandas as pd
 import schedule
-from fbprophet import Prophet
+
+from config import config
+from predtable import PredictionTable
+from tickstore import TickStore
+
+tick_store = TickStore('./curr', config.tick_retention_days)
+prediction_table = PredictionTable('./predict/predict.tbl', writable=True)
+pool = None
+
+
+def fit_predict(code, date):
+    """Prophet으로 종목의 당일 종가 가격을 예측하고 (종목코드, 예측가, 학습시간) 을 반환한다."""
+    from fbprophet import Prophet
+
+    t_start = time.perf_counter()
+    df = tick_store.read_frame(code, date)
+    if len(df) < 2:
+        return code, None, time.perf_counter() - t_start
+
+    model = Prophet()
+    model.fit(df)
+
+    future = model.make_future_dataframe(periods=1, freq='H')
+
+    forecast = model.predict(future)
+
+    price = forecast['yhat'].values[-1]
+    return code, price, time.perf_counter() - t_start
+
+
+def write_predicted_price(code, price):
+    """예측가를 예측 테이블에 쓴다. 레코드 단위 seqlock 으로 읽는 쪽이 쓰다 만 값을 보지 않는다."""
+    try:
+        prediction_table.put(code, price)
+    except Exception:
+        traceback.print_exc(file=sys.stdout)
+
+
+def get_pool():
+    global pool
+    if pool is None:
+        pool = multiprocessing.Pool(config.predict_workers)
+    return pool
+
+
+def reset_pool():
+    """시간 초과로 멈춘 작업이 있으면 작업 프로세스를 모두 종료하고 다음 회차에 다시 만든다."""
+    global pool
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+    pool = None
 
 
 def predict_price():
     """Prophet으로 당일 종가 가격 예측"""
-    path = './curr'
+    today = datetime.now().strftime('%Y-%m-%d')
+    codes = tick_store.codes(today)
 
-    for file_path in os.listdir(path):
-        df = pd.read_csv(path + '/' + file_path)
+    t_start = time.perf_counter()
+    fit_times = {}
+    timeouts = []
 
-        model = Prophet()
-        model.fit(df)
+    if config.predict_workers <= 1:
+        results = []
+        for code in codes:
+            try:
+                results.append(fit_predict(code, today))
+            except Exception:
+                traceback.print_exc(file=sys.stdout)
+    else:
+        jobs = [(code, get_pool().apply_async(fit_predict, (code, today))) for code in codes]
 
-        future = model.make_future_dataframe(periods=1, freq='H')
+        results = []
+        for code, job in jobs:
+            try:
+                # 앞 종목이 끝난 뒤 종목당 최대 predict_timeout 초까지 기다린다.
+                results.append(job.get(timeout=config.predict_timeout))
+            except multiprocessing.TimeoutError:
+                timeouts.append(code)
+            except Exception:
+                traceback.print_exc(file=sys.stdout)
 
-        forecast = model.predict(future)
+        if timeouts:
+            reset_pool()
 
-        code = file_path.split('-')[0]
-        price = forecast['yhat'].values[-1]
+    for code, price, fit_time in results:
+        fit_times[code] = fit_time
+        if price is not None:
+            write_predicted_price(code, price)
+    prediction_table.flush()
 
-        try:
-            os.makedirs('./predict', exist_ok=True)
+    wall_time = time.perf_counter() - t_start
+    slowest = sorted(fit_times.items(), key=lambda x: x[1], reverse=True)[:5]
+    print(datetime.now().strftime('[%Y-%m-%d %H:%M:%S]'),
+          f'predict_price(): {len(fit_times)}/{len(codes)} codes, workers {config.predict_workers}, '
+          f'wall {wall_time:.1f}s, fit {sum(fit_times.values()):.1f}s, timeout {len(timeouts)}')
+    for code, fit_time in slowest:
+        print(f'  {code}\t{fit_time:.1f}s')
 
-            with open('./predict/' + code + '.csv', 'a', encoding="utf-8", newline='\n') as f:
-                csv_writer = csv.writer(f)
-                row = [code, price]
-                csv_writer.writerow(row)
-        except Exception:
-            traceback.print_exc(file=sys.stdout)
+    return wall_time, fit_times
 
 
 if __name__ == '__main__':
@@ -0,0 +1,125 @@
+import os
+import time
+
+import numpy as np
+
+__all__ = ['RECORD_DTYPE', 'PredictionTable']
+
+MAGIC = b'PRDTBL01'
+HEADER_SIZE = 64
+
+# seq 가 홀수면 쓰는 중이다. (seqlock)
+RECORD_DTYPE = np.dtype([
+    ('seq', '<u8'),
+    ('code', 'S12'),
+    ('timestamp', '<f8'),  # 예측 시각 (epoch 초)
+    ('price', '<f8'),  # 예측가
+    ('version', '<u8'),  # 갱신 횟수
+])
+
+
+class PredictionTable:
+    """종목별 최신 예측가를 담는 고정 크기 메모리 맵 테이블.
+
+    predict.py 한 프로세스만 쓰고 trade.py 는 읽기만 한다. 레코드마다 seqlock 을 두어
+    읽는 쪽은 쓰는 중이거나 읽는 동안 바뀐 레코드를 다시 읽으므로 반쯤 쓰인 값을 보지 않는다.
+    """
+
+    def __init__(self, path='./predict/predict.tbl', capacity=4096, writable=False):
+        self.path = path
+        self.capacity = capacity
+        self.writable = writable
+        self.table = None
+        self.header = None
+        self.slots = {}  # code -> 레코드 번호
+        self.used = 0
+
+    def create(self):
+        """빈 테이블 파일을 만든다. 다 만든 뒤 교체하므로 읽는 쪽이 덜 만든 파일을 열지 않는다."""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_path = self.path + '.tmp'
+        header = np.zeros(HEADER_SIZE, dtype=np.uint8)
+        header[:len(MAGIC)] = np.frombuffer(MAGIC, dtype=np.uint8)
+        header[8:12] = np.frombuffer(np.uint32(self.capacity).tobytes(), dtype=np.uint8)
+        with open(temp_path, 'wb') as f:
+            header.tofile(f)
+            np.zeros(self.capacity, dtype=RECORD_DTYPE).tofile(f)
+        os.replace(temp_path, self.path)
+
+    def open(self):
+        """테이블 파일을 메모리 맵으로 연다. 읽기 모드에서 파일이 없으면 False 를 반환한다."""
+        if self.table is not None:
+            return True
+        if not os.path.isfile(self.path):
+            if not self.writable:
+                return False
+            self.create()
+
+        with open(self.path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        if header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{self.path}: not a prediction table')
+        self.capacity = int(np.frombuffer(header[8:12], dtype=np.uint32)[0])
+
+        mode = 'r+' if self.writable else 'r'
+        self.header = np.memmap(self.path, dtype='<u4', mode=mode, shape=(HEADER_SIZE // 4,))
+        self.table = np.memmap(self.path, dtype=RECORD_DTYPE, mode=mode, offset=HEADER_SIZE, shape=(self.capacity,))
+        self.load_index()
+        return True
+
+    def load_index(self):
+        """헤더의 사용 레코드 수가 늘었으면 종목 코드 색인을 이어서 만든다."""
+        used = int(self.header[3])  # 12~16 바이트: 사용 중인 레코드 수
+        for i in range(len(self.slots), used):
+            self.slots[self.table['code'][i].decode()] = i
+        self.used = used
+
+    def put(self, code, price, timestamp=None):
+        """종목의 예측가를 쓴다."""
+        self.open()
+        slot = self.slots.get(code)
+        is_new = slot is None
+        if is_new:
+            if self.capacity <= self.used:
+                raise IndexError(f'{self.path}: prediction table is full ({self.capacity})')
+            slot = self.used
+            self.used += 1
+
+        table = self.table
+        seq = int(table['seq'][slot])
+        table['seq'][slot] = seq + 1  # 쓰기 시작
+        table['timestamp'][slot] = time.time() if timestamp is None else timestamp
+        table['price'][slot] = price
+        table['version'][slot] += 1
+        table['code'][slot] = code.encode()
+        table['seq'][slot] = seq + 2  # 쓰기 끝
+
+        if is_new:
+            self.slots[code] = slot
+            self.header[3] = self.used  # 레코드를 다 쓴 뒤 읽는 쪽에 보이게 한다.
+
+    def flush(self):
+        if self.table is not None:
+            self.table.flush()
+
+    def get(self, code, retry=100):
+        """종목의 (예측가, 예측 시각, 갱신 횟수) 를 반환한다. 없으면 None."""
+        if not self.open():
+            return None
+
+        slot = self.slots.get(code)
+        if slot is None:
+            self.load_index()  # 다른 프로세스가 새 종목을 추가했을 수 있다. (헤더만 확인)
+            slot = self.slots.get(code)
+            if slot is None:
+                return None
+
+        table = self.table
+        for _ in range(retry):
+            seq = int(table['seq'][slot])
+            if seq % 2:
+                continue
+            record = (float(table['price'][slot]), float(table['timestamp'][slot]), int(table['version'][slot]))
+            if seq == int(table['seq'][slot]):
+                return record
+        return None
@@ -0,0 +1,159 @@
+import time
+from collections import deque
+
+__all__ = ['QUOTA_ORDER', 'QUOTA_QUOTE', 'QUOTA_REALTIME', 'QUOTA_LIMITS',
+           'PRIORITY_EXIT', 'PRIORITY_ORDER', 'PRIORITY_ACCOUNT', 'PRIORITY_QUOTE', 'PRIORITY_UNIVERSE',
+           'TokenBucket', 'RequestScheduler']
+
+# 요청 제한 종류: 0: 주문 관련 1: 시세 요청 관련 2: 실시간 요청 관련
+QUOTA_ORDER = 0
+QUOTA_QUOTE = 1
+QUOTA_REALTIME = 2
+
+# 요청 제한 (건수, 초)
+QUOTA_LIMITS = {
+    QUOTA_ORDER: (20, 15.0),
+    QUOTA_QUOTE: (60, 15.0),
+}
+
+# 우선순위: 작을수록 먼저
+PRIORITY_EXIT = 0  # 손절/익절 매도
+PRIORITY_ORDER = 1  # 매수 주문
+PRIORITY_ACCOUNT = 2  # 잔고, 주문 가능 금액, 체결 내역
+PRIORITY_QUOTE = 3  # 매수 후보 시세
+PRIORITY_UNIVERSE = 4  # 종목 코드 갱신
+
+# 우선순위 별로 남겨 두어야 하는 토큰 비율 - 낮은 우선순위 요청이 버킷을 비우지 못하게 한다.
+RESERVES = {
+    PRIORITY_EXIT: 0.0,
+    PRIORITY_ORDER: 0.0,
+    PRIORITY_ACCOUNT: 0.1,
+    PRIORITY_QUOTE: 0.2,
+    PRIORITY_UNIVERSE: 0.5,
+}
+
+
+class TokenBucket:
+    """period 초마다 capacity 개가 채워지는 요청 제한 버킷"""
+
+    def __init__(self, capacity, period, clock=time.monotonic):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.period = period
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+        self.granted = deque()  # 최근 period 초 동안 허용한 시각
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        while self.granted and self.granted[0] <= now - self.period:
+            self.granted.popleft()
+
+    def available(self):
+        self.refill()
+        return self.tokens
+
+    def take(self):
+        self.tokens -= 1
+        self.granted.append(self.clock())
+
+    def time_until(self, tokens):
+        """tokens 개가 모일 때까지 남은 시간(초)을 반환한다."""
+        self.refill()
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+    def utilization(self):
+        """최근 period 초 동안 사용한 비율을 반환한다."""
+        self.refill()
+        return len(self.granted) / self.capacity
+
+
+class RequestScheduler:
+    """요청 제한 버킷 별 토큰 버킷으로 크레온 요청을 배분한다.
+
+    낮은 우선순위 요청은 버킷에 우선순위 별 예약분(RESERVES)을 남기고 기다리므로 매도/주문 요청이 밀리지 않는다.
+    실행 순서는 Runtime 의 BrokerExecutor 가 우선순위로 정한다.
+
+    status 는 GetLimitRemainCount/LimitRequestRemainTime 을 제공하는 CpCybos 객체(또는 가짜 객체)이고,
+    서버의 남은 건수가 0 이면 로컬 버킷에 토큰이 있어도 기다린다.
+    """
+
+    def __init__(self, status=None, clock=time.monotonic, sleep=time.sleep, limits=None, reserves=None):
+        self.status = status
+        self.clock = clock
+        self.sleep = sleep
+        self.reserves = RESERVES if reserves is None else reserves
+        self.buckets = {check_type: TokenBucket(count, period, clock)
+                        for check_type, (count, period) in (limits or QUOTA_LIMITS).items()}
+        self.stats_data = {check_type: {'requests': 0, 'waits': 0, 'wait_time': 0.0, 'deferred': 0}
+                           for check_type in self.buckets}
+
+    def _floor(self, check_type, priority):
+        bucket = self.buckets[check_type]
+        return bucket.capacity * self.reserves.get(priority, 0.0)
+
+    def _remote_wait(self, check_type):
+        """서버 기준 요청 제한이 걸려 있으면 남은 시간(초)을 반환한다."""
+        if self.status is None or 0 < self.status.GetLimitRemainCount(check_type):
+            return 0.0
+        return max(self.status.LimitRequestRemainTime / 1000, 0.001)
+
+    def can_acquire(self, check_type, priority=PRIORITY_QUOTE, count=1):
+        """예약분을 남기고 count 개의 토큰을 바로 쓸 수 있는지 반환한다."""
+        bucket = self.buckets.get(check_type)
+        if bucket is None:
+            return True
+        return self._floor(check_type, priority) + count <= bucket.available() and not self._remote_wait(check_type)
+
+    def try_acquire(self, check_type, priority=PRIORITY_QUOTE):
+        """기다리지 않고 요청 토큰을 얻으면 True, 아니면 False 를 반환한다."""
+        bucket = self.buckets.get(check_type)
+        if bucket is None:
+            return True
+
+        if not self.can_acquire(check_type, priority):
+            self.stats_data[check_type]['deferred'] += 1
+            return False
+
+        bucket.take()
+        self.stats_data[check_type]['requests'] += 1
+        return True
+
+    def time_until(self, check_type, priority=PRIORITY_QUOTE):
+        """예약분을 남기고 토큰 하나를 쓸 수 있을 때까지 남은 시간(초)을 반환한다."""
+        bucket = self.buckets.get(check_type)
+        if bucket is None:
+            return 0.0
+        return max(bucket.time_until(self._floor(check_type, priority) + 1), self._remote_wait(check_type))
+
+    def acquire(self, check_type, priority=PRIORITY_QUOTE):
+        """요청 토큰을 얻을 때까지 기다린다. 낮은 우선순위는 예약분을 남기고 기다린다."""
+        bucket = self.buckets.get(check_type)
+        if bucket is None:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            remain = self.time_until(check_type, priority)
+            if remain <= 0:
+                break
+            self.sleep(remain)
+            waited += remain
+
+        bucket.take()
+        stats = self.stats_data[check_type]
+        stats['requests'] += 1
+        if waited:
+            stats['waits'] += 1
+            stats['wait_time'] += waited
+        return waited
+
+    def stats(self):
+        """버킷 별 요청 수, 대기 횟수/시간, 보류 횟수, 사용률을 반환한다."""
+        return {check_type: dict(self.stats_data[check_type],
+                                 tokens=bucket.available(),
+                                 utilization=bucket.utilization())
+                for check_type, bucket in self.buckets.items()}
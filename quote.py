@@ -0,0 +1,75 @@
+import time
+
+__all__ = ['QuoteSnapshot']
+
+# MarketEye 한 번에 요청 가능한 최대 종목 수
+MARKET_EYE_LIMIT = 200
+
+
+class QuoteSnapshot:
+    """MarketEye 로 여러 종목의 현재가, 고가, 저가, 거래량을 한 번에 받아 보관한다."""
+    # 0: 종목코드 4: 현재가 6: 고가 7: 저가 10: 거래량
+    FIELDS = [0, 4, 6, 7, 10]
+
+    def __init__(self, market_eye, wait=None, max_age=1.0, clock=time.monotonic):
+        self.market_eye = market_eye
+        self.wait = wait
+        self.max_age = max_age
+        self.clock = clock
+        self.quotes = {}  # code -> (현재가, 고가, 저가, 거래량, 수신 시각)
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+
+    def refresh(self, codes):
+        """종목 코드 목록의 시세를 MARKET_EYE_LIMIT 개씩 나눠 요청한다."""
+        codes = list(codes)
+        for start in range(0, len(codes), MARKET_EYE_LIMIT):
+            chunk = codes[start:start + MARKET_EYE_LIMIT]
+            self.market_eye.SetInputValue(0, self.FIELDS)
+            self.market_eye.SetInputValue(1, chunk)
+
+            if self.wait:
+                self.wait()
+            self.market_eye.BlockRequest()
+            self.requests += 1
+
+            now = self.clock()
+            for i in range(self.market_eye.GetHeaderValue(2)):  # 2: 종목 수
+                code = self.market_eye.GetDataValue(0, i)
+                self.quotes[code] = (self.market_eye.GetDataValue(1, i),  # 현재가
+                                     self.market_eye.GetDataValue(2, i),  # 고가
+                                     self.market_eye.GetDataValue(3, i),  # 저가
+                                     self.market_eye.GetDataValue(4, i),  # 거래량
+                                     now)
+
+    def refresh_stale(self, codes):
+        """max_age 보다 오래된 종목만 다시 요청한다."""
+        now = self.clock()
+        stale = [code for code in codes
+                 if code not in self.quotes or self.max_age < now - self.quotes[code][4]]
+        if stale:
+            self.refresh(stale)
+
+    def get(self, code):
+        """max_age 안의 (현재가, 고가, 저가) 를 반환한다. 없거나 오래됐으면 None."""
+        quote = self.quotes.get(code)
+        if quote is None or self.max_age < self.clock() - quote[4]:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return quote[0], quote[1], quote[2]
+
+    def update(self, code, current_price, high=None, low=None):
+        """실시간 체결 등으로 받은 가격을 반영한다."""
+        quote = self.quotes.get(code)
+        if quote is None:
+            high = current_price if high is None else high
+            low = current_price if low is None else low
+            volume = 0
+        else:
+            high = max(quote[1], current_price) if high is None else high
+            low = min(quote[2], current_price) if low is None else low
+            volume = quote[3]
+        self.quotes[code] = (current_price, high, low, volume, self.clock())
@@ -0,0 +1,120 @@
+import time
+
+import broker
+
+__all__ = ['CpStockCurEvent', 'CpStockCur', 'RealtimeManager']
+
+# 구독 우선순위: 작을수록 먼저
+PRIORITY_HOLDING = 0  # 보유 종목
+PRIORITY_CANDIDATE = 1  # 매수 후보 (code_list, 특징주)
+
+
+# CpStockCurEvent: 실시간 체결 이벤트 수신 클래스
+class CpStockCurEvent:
+    def set_params(self, client, manager):
+        self.client = client  # CP 실시간 통신 object
+        self.manager = manager
+
+    def OnReceived(self):
+        # 실시간 처리 - 현재가 체결
+        code = self.client.GetHeaderValue(0)  # 종목코드
+        current_price = self.client.GetHeaderValue(13)  # 현재가
+        high = self.client.GetHeaderValue(5)  # 고가
+        low = self.client.GetHeaderValue(6)  # 저가
+        self.manager.on_tick(code, current_price, high, low)
+
+
+# CpStockCur: 종목 하나의 실시간 체결 구독 (종목마다 객체 하나)
+class CpStockCur:
+    def __init__(self):
+        self.obj = broker.Dispatch('DsCbo1.StockCur')
+        self.code = ''
+
+    def Subscribe(self, code, manager):
+        self.code = code
+        self.obj.SetInputValue(0, code)
+
+        handler = broker.WithEvents(self.obj, CpStockCurEvent)
+        handler.set_params(self.obj, manager)
+        self.obj.Subscribe()
+
+    def Unsubscribe(self):
+        self.obj.Unsubscribe()
+
+
+class RealtimeManager:
+    """보유 종목과 매수 후보의 실시간 체결을 구독하고 최신 체결가를 보관한다.
+
+    실시간 구독 한도(요청 제한 2)를 넘으면 보유 종목을 먼저 구독하고, 남은 자리는
+    rotate() 할 때마다 매수 후보를 돌아가며 구독한다.
+    """
+
+    def __init__(self, on_price=None, limit=200, status=None, create=CpStockCur, clock=time.monotonic):
+        self.on_price = on_price
+        self.limit = limit
+        self.status = status
+        self.create = create
+        self.clock = clock
+        self.subscriptions = {}  # code -> CpStockCur
+        self.prices = {}  # code -> (현재가, 고가, 저가, 수신 시각)
+        self.priorities = {}  # code -> 우선순위
+        self.offset = 0
+        self.ticks = 0
+        self.rotations = 0
+
+    def get_limit(self):
+        """동시에 구독할 수 있는 종목 수를 반환한다."""
+        if self.status is None:
+            return self.limit
+        return min(self.limit, len(self.subscriptions) + self.status.GetLimitRemainCount(2))
+
+    def set_targets(self, priorities):
+        """구독 대상 종목과 우선순위({code: priority})를 바꾸고 구독을 맞춘다."""
+        self.priorities = dict(priorities)
+        self.rotate()
+
+    def rotate(self):
+        """우선순위가 높은 종목부터 구독하고, 한도를 넘는 후보는 돌아가며 구독한다."""
+        limit = self.get_limit()
+        codes = sorted(self.priorities, key=lambda code: self.priorities[code])
+        fixed = [code for code in codes if self.priorities[code] == PRIORITY_HOLDING][:limit]
+        rest = [code for code in codes if self.priorities[code] != PRIORITY_HOLDING]
+        slots = limit - len(fixed)
+
+        if len(rest) <= slots:
+            chosen = rest
+        else:
+            self.offset %= len(rest)
+            chosen = (rest[self.offset:] + rest[:self.offset])[:slots]
+            self.offset += slots
+            self.rotations += 1
+
+        wanted = set(fixed) | set(chosen)
+        for code in [code for code in self.subscriptions if code not in wanted]:
+            self.subscriptions.pop(code).Unsubscribe()
+        for code in fixed + chosen:
+            if code not in self.subscriptions:
+                subscription = self.create()
+                subscription.Subscribe(code, self)
+                self.subscriptions[code] = subscription
+
+    def unsubscribe_all(self):
+        for subscription in self.subscriptions.values():
+            subscription.Unsubscribe()
+        self.subscriptions.clear()
+
+    def on_tick(self, code, current_price, high=None, low=None):
+        """체결 이벤트로 최신 체결가를 갱신하고 전략 평가를 호출한다."""
+        self.ticks += 1
+        self.prices[code] = (current_price, high, low, self.clock())
+        if self.on_price is not None:
+            self.on_price(code, current_price, high, low)
+
+    def get_price(self, code, max_age=None):
+        """구독 중인 종목의 최신 체결가를 반환한다. 없거나 max_age 보다 오래됐으면 None."""
+        price = self.prices.get(code)
+        if price is None or code not in self.subscriptions:
+            return None
+        if max_age is not None and max_age < self.clock() - price[3]:
+            return None
+        return price[0]
@@ -0,0 +1,202 @@
+import asyncio
+import itertools
+import queue
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+
+__all__ = ['SKIP', 'COALESCE', 'BrokerExecutor', 'Job', 'Runtime']
+
+# 주기를 넘겨 끝났을 때: 놓친 회차를 건너뛰고 다음 주기에 실행 / 놓친 회차를 한 번으로 합쳐 바로 실행
+SKIP = 'skip'
+COALESCE = 'coalesce'
+
+
+class BrokerExecutor:
+    """브로커 COM 호출을 전담하는 스레드 하나. 대기 중인 작업은 priority 가 작은 것부터 실행한다.
+
+    COM 객체는 만든 스레드에서만 쓰고 이벤트도 그 스레드에서 받아야 하므로
+    객체 생성, 요청, 이벤트 처리를 모두 이 스레드에서 한다.
+    """
+
+    def __init__(self, initializer=None, name='broker'):
+        self.initializer = initializer
+        self.queue = queue.PriorityQueue()
+        self.counter = itertools.count()  # 같은 priority 는 들어온 순서대로
+        self.thread = threading.Thread(target=self.worker, name=name, daemon=True)
+        self.thread.start()
+
+    def worker(self):
+        if self.initializer:
+            self.initializer()
+
+        while True:
+            _, _, future, func, args = self.queue.get()
+            if future is None:
+                break
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def submit(self, priority, func, *args):
+        future = Future()
+        self.queue.put((priority, next(self.counter), future, func, args))
+        return future
+
+    def shutdown(self, wait=True):
+        self.queue.put((float('inf'), next(self.counter), None, None, ()))
+        if wait:
+            self.thread.join()
+
+
+class Job:
+    """주기 작업 하나와 그 실행 통계"""
+
+    def __init__(self, name, func, period, priority=0, deadline=None, policy=SKIP, blocking=True):
+        self.name = name
+        self.func = func
+        self.period = period
+        self.priority = priority
+        self.deadline = period if deadline is None else deadline  # 예정 시각부터 끝날 때까지 허용 시간
+        self.policy = policy
+        self.blocking = blocking  # True 면 브로커 스레드에서 실행한다.
+
+        self.runs = 0
+        self.errors = 0
+        self.skipped = 0  # 건너뛴 회차
+        self.coalesced = 0  # 합쳐진 회차
+        self.deadline_misses = 0
+        self.latency = 0.0  # 마지막 실행 시간
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.lateness = 0.0  # 마지막 실행이 예정 시각보다 늦게 시작한 시간
+        self.lateness_total = 0.0
+        self.lateness_max = 0.0
+
+    def record(self, lateness, latency):
+        self.runs += 1
+        self.lateness = lateness
+        self.lateness_total += lateness
+        self.lateness_max = max(self.lateness_max, lateness)
+        self.latency = latency
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        if self.deadline < lateness + latency:
+            self.deadline_misses += 1
+
+    def stats(self):
+        runs = max(self.runs, 1)
+        return {
+            'runs': self.runs,
+            'errors': self.errors,
+            'skipped': self.skipped,
+            'coalesced': self.coalesced,
+            'deadline_misses': self.deadline_misses,
+            'latency': self.latency,
+            'latency_avg': self.latency_total / runs,
+            'latency_max': self.latency_max,
+            'lateness': self.lateness,
+            'lateness_avg': self.lateness_total / runs,
+            'lateness_max': self.lateness_max,
+        }
+
+
+class Runtime:
+    """asyncio 이벤트 루프에서 작업마다 태스크 하나로 주기, 마감 시간, 밀림 정책을 지킨다.
+
+    blocking 작업은 BrokerExecutor 에서 실행하므로 느린 작업이 있어도 다른 작업의 예정 시각 계산은 밀리지 않고,
+    브로커 스레드가 비면 priority 가 작은 작업부터 실행한다. 작업마다 실행 시간(latency)과
+    예정 시각 대비 시작 지연(lateness)을 기록한다.
+    """
+
+    def __init__(self, executor, clock=time.monotonic, on_error=None):
+        self.executor = executor
+        self.clock = clock
+        self.on_error = on_error
+        self.jobs = []
+
+    def every(self, period, func, name=None, priority=0, deadline=None, policy=SKIP, blocking=True):
+        job = Job(name or func.__name__, func, period, priority, deadline, policy, blocking)
+        self.jobs.append(job)
+        return job
+
+    async def call(self, priority, func, *args):
+        """func 를 브로커 스레드에서 실행하고 결과를 기다린다."""
+        return await asyncio.wrap_future(self.executor.submit(priority, func, *args))
+
+    async def run_job(self, job):
+        scheduled = self.clock() + job.period  # 첫 실행은 한 주기 뒤 (start 에서 이미 한 번 실행)
+        while True:
+            delay = scheduled - self.clock()
+            if 0 < delay:
+                await asyncio.sleep(delay)
+
+            def timed():
+                start = self.clock()
+                try:
+                    job.func()
+                finally:
+                    job.record(start - scheduled, self.clock() - start)
+
+            try:
+                if job.blocking:
+                    await self.call(job.priority, timed)
+                else:
+                    timed()
+            except (SystemExit, KeyboardInterrupt):
+                raise
+            except Exception as e:
+                job.errors += 1
+                traceback.print_exc(file=sys.stdout)
+                if self.on_error:
+                    self.on_error(job, e)
+
+            scheduled += job.period
+            now = self.clock()
+            if scheduled < now:
+                # 주기를 넘겨 끝났다.
+                missed = int((now - scheduled) // job.period) + 1
+                if job.policy == COALESCE:
+                    job.coalesced += missed
+                    scheduled = now
+                else:
+                    job.skipped += missed
+                    scheduled += missed * job.period
+
+    async def main(self, start=None):
+        if start:
+            await self.call(-1, start)
+
+        tasks = [asyncio.ensure_future(self.run_job(job)) for job in self.jobs]
+        try:
+            # 작업 하나라도 끝나면(예외, 종료) 나머지도 멈춘다.
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def run(self, start=None):
+        """start 를 브로커 스레드에서 먼저 실행한 뒤 작업들을 시작한다."""
+        try:
+            asyncio.run(self.main(start))
+        finally:
+            self.executor.shutdown(wait=False)
+
+    def stats(self):
+        return {job.name: job.stats() for job in self.jobs}
+
+    def report(self):
+        """작업별 실행 통계를 문자열로 반환한다."""
+        message = '\n작업\t\t실행\t건너뜀\t합침\t마감초과\t실행시간(평균/최대)\t시작지연(평균/최대)\n'
+        for name, s in self.stats().items():
+            message += f"{name:16}{s['runs']}\t{s['skipped']}\t{s['coalesced']}\t{s['deadline_misses']}\t" \
+                       f"{s['latency_avg'] * 1000:.1f}/{s['latency_max'] * 1000:.1f}ms\t\t" \
+                       f"{s['lateness_avg'] * 1000:.1f}/{s['lateness_max'] * 1000:.1f}ms\n"
+        return message
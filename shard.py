@@ -0,0 +1,141 @@
+import math
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from indicators import compute_indicators
+
+__all__ = ['evaluate_shard', 'ShardedEvaluator']
+
+# 작업 프로세스가 붙어 있는 공유 메모리: name -> (SharedMemory, 배열)
+_attached = {}
+
+
+def attach(name, shape):
+    """작업 프로세스에서 공유 메모리 스냅샷을 배열로 연다. 같은 이름은 다시 열지 않는다."""
+    entry = _attached.get(name)
+    if entry is None:
+        for old_name in list(_attached):
+            _attached.pop(old_name)[0].close()
+        shm = shared_memory.SharedMemory(name=name)
+        if multiprocessing.get_start_method() != 'fork':
+            # 만든 쪽(메인 프로세스)이 지우므로 작업 프로세스 종료 때 지우지 않게 한다.
+            # (fork 면 메인 프로세스의 resource_tracker 를 같이 쓰므로 건드리지 않는다.)
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        entry = _attached[name] = (shm, np.ndarray(shape, dtype='<f8', buffer=shm.buf))
+    return entry[1]
+
+
+def split_snapshot(block, days):
+    """스냅샷 행 묶음을 (open, high, low, close, 현재가, 대비율, 예상가) 로 나눈다."""
+    bars = tuple(block[:, i * days:(i + 1) * days] for i in range(4))
+    return bars + (block[:, 4 * days], block[:, 4 * days + 1], block[:, 4 * days + 2])
+
+
+def evaluate_rows(block, days, windows, ks, profit_rate):
+    """지표를 계산하고 buy_code() 의 매수 조건을 만족하는 행 번호를 반환한다."""
+    opens, highs, lows, closes, prices, percents, predicted = split_snapshot(block, days)
+    results = compute_indicators(opens, highs, lows, closes, windows, ks)
+
+    rate = profit_rate / 100
+    target = results['target']
+    with np.errstate(invalid='ignore'):
+        buy = (target < prices) & (prices < target + target * rate) \
+            & (prices + prices * rate < predicted) & (0 < percents)
+        for window in windows:
+            buy &= results[f'ma{window}'] < prices
+    return results, np.flatnonzero(buy)
+
+
+def evaluate_shard(name, shape, start, stop, days, windows, ks, profit_rate):
+    """작업 프로세스에서 스냅샷의 start:stop 행을 평가하고 (start, 지표, 매수 행 번호) 를 반환한다."""
+    block = attach(name, shape)[start:stop]
+    results, buy = evaluate_rows(block, days, windows, ks, profit_rate)
+    return start, results, buy + start
+
+
+class ShardedEvaluator:
+    """매수 후보 평가(지표, K 탐색, 매수 조건)를 종목 구간별로 작업 프로세스에 나눠 맡긴다.
+
+    메인 프로세스가 일봉과 시세를 공유 메모리 스냅샷 한 장에 쓰면 작업 프로세스는 복사 없이 읽고,
+    지표와 매수 의도(행 번호)만 돌려준다. 주문은 메인 프로세스에서만 낸다.
+    """
+
+    def __init__(self, workers=4, days=10, windows=(5, 10), ks=None, profit_rate=1.3, min_shard=64):
+        self.workers = workers
+        self.days = days
+        self.windows = tuple(windows)
+        self.ks = ks
+        self.profit_rate = profit_rate
+        self.min_shard = min_shard
+        self.columns = 4 * days + 3
+        self.pool = None
+        self.shm = None
+        self.capacity = 0
+
+    def get_pool(self):
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.workers)
+        return self.pool
+
+    def ensure(self, rows):
+        """rows 행을 담을 공유 메모리를 준비한다. 모자라면 두 배로 새로 만든다."""
+        if rows <= self.capacity:
+            return
+        self.release()
+        self.capacity = max(rows, self.capacity * 2, self.min_shard)
+        self.shm = shared_memory.SharedMemory(create=True, size=self.capacity * self.columns * 8)
+
+    def release(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def write_snapshot(self, bars, prices, percents, predicted):
+        rows = len(prices)
+        self.ensure(rows)
+        snapshot = np.ndarray((self.capacity, self.columns), dtype='<f8', buffer=self.shm.buf)[:rows]
+        days = self.days
+        for i, array in enumerate(bars):
+            snapshot[:, i * days:(i + 1) * days] = array
+        snapshot[:, 4 * days] = prices
+        snapshot[:, 4 * days + 1] = percents
+        snapshot[:, 4 * days + 2] = predicted
+        return snapshot
+
+    def evaluate(self, bars, prices, percents, predicted):
+        """(open, high, low, close) 과거순 배열과 종목별 현재가/대비율/예상가로 (지표, 매수 행 번호) 를 반환한다."""
+        rows = len(prices)
+        if not rows:
+            return {}, np.empty(0, dtype=int)
+
+        snapshot = self.write_snapshot(bars, prices, percents, predicted)
+        shards = min(self.workers, math.ceil(rows / self.min_shard))
+        if shards <= 1:
+            return evaluate_rows(snapshot, self.days, self.windows, self.ks, self.profit_rate)
+
+        size = math.ceil(rows / shards)
+        shape = (self.capacity, self.columns)
+        jobs = [self.get_pool().apply_async(evaluate_shard, (self.shm.name, shape, start, min(start + size, rows),
+                                                             self.days, self.windows, self.ks, self.profit_rate))
+                for start in range(0, rows, size)]
+
+        results = {}
+        buys = []
+        for job in jobs:
+            start, shard_results, buy = job.get()
+            for name, values in shard_results.items():
+                results.setdefault(name, np.empty(rows))[start:start + len(values)] = values
+            buys.append(buy)
+        return results, np.concatenate(buys)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        self.release()
+        self.capacity = 0
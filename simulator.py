@@ -0,0 +1,572 @@
+import random
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+
+from config import config
+from quota import QUOTA_LIMITS, QUOTA_ORDER, QUOTA_QUOTE, QUOTA_REALTIME
+
+__all__ = ['SimClock', 'SimMarket', 'Dispatch', 'WithEvents', 'get_market', 'set_market']
+
+# 실시간 요청 관련 요청 제한: 동시 구독 건수
+REALTIME_LIMIT = 400
+
+# 시뮬레이션에서 발생시키는 특징주 포착 신호
+WATCH_INDICATORS = [12, 13, 24, 29, 44, 45, 46, 47, 48, 49, 50, 51]
+
+
+class SimClock:
+    """sleep 할 때 실제로 기다리지 않고 시간만 진행하는 가상 시계"""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+
+class SimStock:
+    """시뮬레이션 종목의 시세와 일봉을 보관한다."""
+
+    def __init__(self, code, seed, days=260):
+        rnd = random.Random(f'{seed}-{code}')
+        self.code = code
+        self.name = f'SIM{code[1:]}'
+        self.section_kind = 10 if rnd.random() < 0.05 else 1  # 10: ETF, 1: 주권
+        self.big_listing = rnd.random() < 0.3
+        self.listed_shares = rnd.randrange(1000000, 500000000, 1000)
+        self.rnd = rnd
+
+        price = rnd.randrange(2000, 200000, 10)
+        self.bars = []  # (날짜, 시가, 고가, 저가, 종가, 거래량) - 과거순
+        date = datetime.now() - timedelta(days=days * 7 // 5 + 7)
+        while len(self.bars) < days:
+            date += timedelta(days=1)
+            if 5 <= date.weekday():
+                continue
+            open_price = max(100, int(price * (1 + rnd.gauss(0, 0.01))))
+            close = max(100, int(open_price * (1 + rnd.gauss(0, 0.02))))
+            high = int(max(open_price, close) * (1 + abs(rnd.gauss(0, 0.01))))
+            low = int(min(open_price, close) * (1 - abs(rnd.gauss(0, 0.01))))
+            volume = rnd.randrange(10000, 5000000)
+            self.bars.append((int(date.strftime('%Y%m%d')), open_price, high, low, close, volume))
+            price = close
+
+        self.prev_close = price
+        self.open = max(100, int(price * (1 + rnd.gauss(0, 0.01))))
+        self.price = self.high = self.low = self.open
+        self.volume = 0
+        self.ticks = deque(maxlen=80)  # (시각 hhmmss, 체결가, 체결량) - 최신순
+        self.clock = 0
+
+    def move(self, clock):
+        """마지막 갱신 이후 경과한 틱만큼 가격을 움직인다."""
+        steps = clock - self.clock
+        if steps <= 0:
+            return
+        self.clock = clock
+
+        change = self.rnd.gauss(0, 0.002 * min(steps, 100) ** 0.5)
+        self.price = max(100, int(self.price * (1 + change)))
+        self.high = max(self.high, self.price)
+        self.low = min(self.low, self.price)
+        qty = self.rnd.randrange(1, 1000)
+        self.volume += qty
+        self.ticks.appendleft((int(datetime.now().strftime('%H%M%S')), self.price, qty))
+
+    @property
+    def percent(self):
+        return (self.price - self.prev_close) / self.prev_close * 100
+
+
+class SimMarket:
+    """시뮬레이션 시장, 계좌, 요청 제한을 하나로 관리한다."""
+
+    def __init__(self, codes=None, latency=None, seed=0, cash=10000000,
+                 clock=time.monotonic, sleep=time.sleep):
+        if codes is None:
+            codes = config.sim_codes
+        if latency is None:
+            latency = config.sim_latency
+
+        self.seed = seed
+        self.latency = latency
+        self.clock = clock
+        self.sleep = sleep
+        self.rnd = random.Random(seed)
+        self.codes = [f'A{i:06d}' for i in range(1, codes + 1)]
+        self.stocks = {}
+        self.ticks = 0
+
+        self.cash = cash
+        self.positions = {}  # code -> [수량, 장부가]
+        self.history = []  # 금일 주문/체결 내역
+        self.order_id = 0
+        self.signals = []  # (시각 hhmm, 종목코드, 지표)
+
+        self.waited = 0.0  # 요청 제한으로 대기한 시간(초)
+        self.requests = Counter()  # prog_id 별 BlockRequest 횟수
+        self.rejects = Counter()  # prog_id 별 요청 제한 거절 횟수
+        self.quota_log = {t: deque() for t in QUOTA_LIMITS}
+        self.publishers = []  # 구독 중인 실시간 객체
+        self.events = deque(maxlen=10000)  # pump() 때 전달할 실시간 이벤트
+
+    def stock(self, code):
+        stock = self.stocks.get(code)
+        if stock is None:
+            stock = self.stocks[code] = SimStock(code, self.seed)
+        stock.move(self.ticks)
+        return stock
+
+    def tick(self):
+        """시장 시간을 한 틱 진행하고, 확률적으로 특징주 신호를 발생시킨다."""
+        self.ticks += 1
+        if self.rnd.random() < 0.05:
+            code = self.rnd.choice(self.codes)
+            signal = (int(datetime.now().strftime('%H%M')), code, self.rnd.choice(WATCH_INDICATORS))
+            self.signals.append(signal)
+            for publisher in list(self.publishers):
+                publisher.on_signal(signal)
+        for publisher in list(self.publishers):
+            publisher.on_tick()
+
+    def pump(self):
+        """쌓인 실시간 이벤트를 OnReceived 로 전달한다. (PumpWaitingMessages)"""
+        while self.events:
+            publisher, header, data = self.events.popleft()
+            publisher.header = header
+            publisher.data = data
+            for handler in list(publisher.handlers):
+                handler.OnReceived()
+
+    # 요청 제한
+    def wait(self, seconds):
+        """요청 제한 해제를 기다린다."""
+        self.waited += seconds
+        self.sleep(seconds)
+
+    def _expire(self, check_type):
+        count, period = QUOTA_LIMITS[check_type]
+        log = self.quota_log[check_type]
+        now = self.clock()
+        while log and log[0] <= now - period:
+            log.popleft()
+        return log
+
+    def remain_count(self, check_type):
+        if check_type == QUOTA_REALTIME:
+            return REALTIME_LIMIT - sum(len(p.codes) for p in self.publishers)
+        return QUOTA_LIMITS[check_type][0] - len(self._expire(check_type))
+
+    def remain_time(self):
+        """요청 제한이 해제될 때까지 남은 시간(ms)을 반환한다."""
+        remain = 0
+        now = self.clock()
+        for check_type, (count, period) in QUOTA_LIMITS.items():
+            log = self._expire(check_type)
+            if count <= len(log):
+                remain = max(remain, (log[0] + period - now) * 1000)
+        return int(remain)
+
+    def consume(self, check_type):
+        if self.remain_count(check_type) <= 0:
+            return False
+        self.quota_log[check_type].append(self.clock())
+        return True
+
+    # 계좌
+    def order(self, order_type, code, shares):
+        """최유리 IOC 주문을 현재가로 즉시 체결하고 주문번호를 반환한다."""
+        self.order_id += 1
+        stock = self.stock(code)
+        price = stock.price
+        name = stock.name
+        self.conclude(code, name, shares, price, order_type, '4')
+        if order_type == '2':
+            if self.cash < price * shares:
+                self.conclude(code, name, 0, price, order_type, '3')
+                return self.order_id
+            self.cash -= price * shares
+            qty, book = self.positions.get(code, [0, 0])
+            self.positions[code] = [qty + shares, (qty * book + shares * price) / (qty + shares)]
+        else:
+            qty, book = self.positions.get(code, [0, 0])
+            shares = min(shares, qty)
+            if shares <= 0:
+                self.conclude(code, name, 0, price, order_type, '3')
+                return self.order_id
+            self.cash += price * shares
+            if qty - shares:
+                self.positions[code] = [qty - shares, book]
+            else:
+                del self.positions[code]
+        self.history.append({
+            'code': code,
+            'name': name,
+            'quantity': shares,
+            'price': price,
+            'state': '정상주문',
+            'order': order_type
+        })
+        self.conclude(code, name, shares, price, order_type, '1')
+        return self.order_id
+
+    def conclude(self, code, name, shares, price, order_type, flag):
+        """주문 체결 실시간 이벤트를 보낸다. flag 1: 체결, 2: 확인, 3: 거부, 4: 접수"""
+        header = {2: name, 3: shares, 4: price, 5: self.order_id, 9: code, 12: order_type, 14: flag}
+        for publisher in list(self.publishers):
+            if isinstance(publisher, SimConclusion):
+                publisher.fire(header, [])
+
+
+class SimObject:
+    """크레온 플러스 COM 객체의 SetInputValue/BlockRequest/GetHeaderValue/GetDataValue 인터페이스."""
+    prog_id = ''
+    quota_type = None
+    Continue = 0  # 1 이면 BlockRequest() 를 다시 불러 다음 데이터를 받는다.
+
+    def __init__(self, market):
+        self.market = market
+        self.inputs = {}
+        self.header = {}
+        self.data = []  # 행 별 {필드: 값}
+
+    def SetInputValue(self, field, value):
+        self.inputs[field] = value
+
+    def GetHeaderValue(self, field):
+        return self.header.get(field, 0)
+
+    def GetDataValue(self, field, index):
+        return self.data[index][field]
+
+    def GetDibStatus(self):
+        return 0
+
+    def GetDibMsg1(self):
+        return ''
+
+    def BlockRequest(self):
+        market = self.market
+        market.tick()
+        if self.quota_type is not None and not market.consume(self.quota_type):
+            market.rejects[self.prog_id] += 1
+            return 4  # 요청 제한
+
+        market.requests[self.prog_id] += 1
+        if market.latency:
+            market.sleep(market.latency)
+
+        self.header = {}
+        self.data = []
+        self.request()
+        return 0
+
+    def Request(self):
+        return self.BlockRequest()
+
+    def request(self):
+        pass
+
+    def _fields(self, fields, values):
+        """요청 필드 목록 순서대로 값을 배치한다."""
+        return {i: values.get(field, 0) for i, field in enumerate(fields)}
+
+
+class SimCybos(SimObject):
+    prog_id = 'CpUtil.CpCybos'
+    IsConnect = 1
+
+    def GetLimitRemainCount(self, check_type):
+        return self.market.remain_count(check_type)
+
+    @property
+    def LimitRequestRemainTime(self):
+        return self.market.remain_time()
+
+
+class SimTdUtil(SimObject):
+    prog_id = 'CpTrade.CpTdUtil'
+    AccountNumber = ['000000000']
+
+    def TradeInit(self, *args):
+        return 0
+
+    def GoodsList(self, acc, flag):
+        return ['01']
+
+
+class SimCodeMgr(SimObject):
+    prog_id = 'CpUtil.CpCodeMgr'
+
+    def GetStockSectionKind(self, code):
+        return self.market.stock(code).section_kind
+
+    def IsBigListingStock(self, code):
+        return int(self.market.stock(code).big_listing)
+
+    def CodeToName(self, code):
+        return self.market.stock(code).name
+
+
+class SimStockCode(SimCodeMgr):
+    prog_id = 'CpUtil.CpStockCode'
+
+
+class SimSvr7049(SimObject):
+    """거래량 상위 종목"""
+    prog_id = 'CpSysDib.CpSvr7049'
+    quota_type = QUOTA_QUOTE
+
+    def request(self):
+        stocks = sorted((self.market.stock(code) for code in self.market.codes),
+                        key=lambda s: s.volume, reverse=True)[:200]
+        self.header[0] = len(stocks)
+        for s in stocks:
+            self.data.append({1: s.code, 2: s.name, 3: s.price, 5: s.percent, 6: s.volume})
+
+
+class SimSvrNew7043(SimObject):
+    """상승 상위 종목"""
+    prog_id = 'CpSysDib.CpSvrNew7043'
+    quota_type = QUOTA_QUOTE
+
+    def request(self):
+        stop = self.inputs.get(8, 20)
+        stocks = [self.market.stock(code) for code in self.market.codes]
+        stocks = sorted((s for s in stocks if 0 <= s.percent <= stop),
+                        key=lambda s: s.percent, reverse=True)[:200]
+        self.header[0] = len(stocks)
+        for s in stocks:
+            self.data.append({0: s.code, 1: s.name, 2: s.price, 4: s.percent, 6: s.volume})
+
+
+class SimMarketEye(SimObject):
+    """복수 종목 시세"""
+    prog_id = 'CpSysDib.MarketEye'
+    quota_type = QUOTA_QUOTE
+
+    def request(self):
+        fields = self.inputs.get(0, [])
+        codes = self.inputs.get(1, [])
+        if isinstance(codes, str):
+            codes = [codes]
+        codes = list(codes)[:200]
+        self.header[0] = len(fields)
+        self.header[2] = len(codes)
+        for code in codes:
+            s = self.market.stock(code)
+            values = {0: s.code, 4: s.price, 5: s.open, 6: s.high, 7: s.low, 10: s.volume,
+                      20: s.listed_shares, 23: s.prev_close}
+            self.data.append(self._fields(fields, values))
+
+
+class SimStockMst(SimObject):
+    """현재가"""
+    prog_id = 'DsCbo1.StockMst'
+    quota_type = QUOTA_QUOTE
+
+    def request(self):
+        s = self.market.stock(self.inputs[0])
+        self.header.update({0: s.code, 1: s.name, 10: s.prev_close, 11: s.price,
+                            13: s.open, 14: s.high, 15: s.low, 18: s.volume})
+
+
+class SimStockBid(SimObject):
+    """시간대별 체결"""
+    prog_id = 'Dscbo1.StockBid'
+    quota_type = QUOTA_QUOTE
+
+    def request(self):
+        s = self.market.stock(self.inputs[0])
+        ticks = list(s.ticks)[:self.inputs.get(2, 80)]
+        self.header[2] = len(ticks)
+        for hms, price, qty in ticks:
+            self.data.append({4: price, 9: hms, 10: qty})
+
+
+class SimStockChart(SimObject):
+    """차트 (일봉)"""
+    prog_id = 'CpSysDib.StockChart'
+    quota_type = QUOTA_QUOTE
+
+    def request(self):
+        s = self.market.stock(self.inputs[0])
+        fields = self.inputs.get(5, [0, 2, 3, 4, 5])
+        bars = s.bars
+        if self.inputs.get(1) == ord('1'):  # 기간
+            start, end = self.inputs.get(3, 0), self.inputs.get(2, 99999999)
+            bars = [bar for bar in bars if start <= bar[0] <= end]
+        else:
+            bars = bars[-self.inputs.get(4, 10):]
+        self.header[3] = len(bars)
+        for date, open_price, high, low, close, volume in reversed(bars):
+            values = {0: date, 1: 0, 2: open_price, 3: high, 4: low, 5: close, 8: volume}
+            self.data.append(self._fields(fields, values))
+
+
+class SimTd0311(SimObject):
+    """주문"""
+    prog_id = 'CpTrade.CpTd0311'
+    quota_type = QUOTA_ORDER
+
+    def request(self):
+        self.header[8] = self.market.order(str(self.inputs[0]), self.inputs[3], int(self.inputs[4]))  # 주문번호
+
+
+class SimTd6033(SimObject):
+    """주식 잔고"""
+    prog_id = 'CpTrade.CpTd6033'
+    quota_type = QUOTA_ORDER
+
+    def request(self):
+        positions = list(self.market.positions.items())[:self.inputs.get(2, 50)]
+        self.header[7] = len(positions)
+        for code, (qty, book) in positions:
+            s = self.market.stock(code)
+            self.data.append({0: s.name, 11: (s.price - book) / book * 100, 12: code, 15: qty, 17: book})
+
+
+class SimTdNew5331A(SimObject):
+    """주문 가능 금액"""
+    prog_id = 'CpTrade.CpTdNew5331A'
+    quota_type = QUOTA_ORDER
+
+    def request(self):
+        self.header[9] = self.market.cash
+
+
+class SimTd5341(SimObject):
+    """금일 주문/체결 내역"""
+    prog_id = 'CpTrade.CpTd5341'
+    quota_type = QUOTA_ORDER
+
+    def request(self):
+        if not self.Continue:
+            code = self.inputs.get(2, '')
+            self.pending = [h for h in self.market.history if not code or h['code'] == code]
+        count = self.inputs.get(5, 20)  # 요청건수
+        history, self.pending = self.pending[:count], self.pending[count:]
+        self.Continue = 1 if self.pending else 0
+        self.header[6] = len(history)
+        for h in history:
+            self.data.append({3: h['code'], 4: h['name'], 9: h['quantity'], 11: h['price'],
+                              13: h['state'], 35: h['order']})
+
+
+class SimTd6032(SimObject):
+    """잔고 평가"""
+    prog_id = 'CpTrade.CpTd6032'
+    quota_type = QUOTA_ORDER
+
+    def request(self):
+        self.header[3] = '0.0'
+
+
+class SimMarketWatch(SimObject):
+    """특징주 포착"""
+    prog_id = 'CpSysDib.CpMarketWatch'
+    quota_type = QUOTA_QUOTE
+
+    def request(self):
+        code = self.inputs.get(0, '*')
+        start = self.inputs.get(2, 0)
+        signals = [s for s in self.market.signals if (code == '*' or s[1] == code) and start <= s[0]]
+        self.header[2] = len(signals)
+        for hm, code, indicator in signals:
+            self.data.append({0: hm, 1: code, 3: indicator})
+
+
+class SimPublish(SimObject):
+    """실시간 구독 객체"""
+
+    def __init__(self, market):
+        super().__init__(market)
+        self.handlers = []
+        self.codes = set()
+
+    def Subscribe(self):
+        self.codes.add(self.inputs.get(0, '*'))
+        if self not in self.market.publishers:
+            self.market.publishers.append(self)
+
+    def Unsubscribe(self):
+        self.codes.clear()
+        self.handlers.clear()
+        if self in self.market.publishers:
+            self.market.publishers.remove(self)
+
+    def fire(self, header, data):
+        self.market.events.append((self, header, data))
+
+    def on_signal(self, signal):
+        pass
+
+    def on_tick(self):
+        pass
+
+
+class SimMarketWatchS(SimPublish):
+    """특징주 포착 실시간"""
+    prog_id = 'CpSysDib.CpMarketWatchS'
+
+    def on_signal(self, signal):
+        hm, code, indicator = signal
+        if '*' in self.codes or code in self.codes:
+            self.fire({0: code, 2: 1}, [{0: hm, 1: ord('a'), 2: indicator}])
+
+
+class SimStockCur(SimPublish):
+    """현재가 실시간 체결"""
+    prog_id = 'DsCbo1.StockCur'
+
+    def on_tick(self):
+        for code in list(self.codes):
+            if self.market.rnd.random() < 0.2:
+                s = self.market.stock(code)
+                self.fire({0: s.code, 1: s.name, 4: s.open, 5: s.high, 6: s.low, 9: s.volume, 13: s.price,
+                           18: int(datetime.now().strftime('%H%M%S'))}, [])
+
+
+class SimConclusion(SimPublish):
+    """주문 체결 실시간"""
+    prog_id = 'DsCbo1.CpConclusion'
+
+
+SIM_CLASSES = {cls.prog_id.lower(): cls for cls in [
+    SimCybos, SimTdUtil, SimCodeMgr, SimStockCode, SimSvr7049, SimSvrNew7043, SimMarketEye,
+    SimStockMst, SimStockBid, SimStockChart, SimTd0311, SimTd6033, SimTdNew5331A, SimTd5341,
+    SimTd6032, SimMarketWatch, SimMarketWatchS, SimStockCur, SimConclusion,
+]}
+
+_market = None
+
+
+def get_market():
+    """프로세스 공용 시뮬레이션 시장을 반환한다."""
+    global _market
+    if _market is None:
+        _market = SimMarket()
+    return _market
+
+
+def set_market(market):
+    """프로세스 공용 시뮬레이션 시장을 교체한다."""
+    global _market
+    _market = market
+
+
+def Dispatch(prog_id):
+    cls = SIM_CLASSES.get(prog_id.lower())
+    if cls is None:
+        raise ValueError(f'simulator: unsupported prog_id {prog_id}')
+    return cls(get_market())
+
+
+def WithEvents(obj, handler_class):
+    handler = handler_class()
+    obj.handlers.append(handler)
+    return handler
@@ -0,0 +1,50 @@
+import os
+import pickle
+import sys
+import time
+import traceback
+
+__all__ = ['StateStore']
+
+# 저장 형식이 바뀌면 올린다. 다른 버전의 파일은 읽지 않는다.
+VERSION = 1
+
+
+class StateStore:
+    """장중 매매 상태(dict)를 로컬 파일 하나에 저장하고, 재시작할 때 되살린다.
+
+    임시 파일에 다 쓴 뒤 교체하므로 저장 도중 프로세스가 죽어도 지난번 파일이 남는다.
+    """
+
+    def __init__(self, path='./state/trade.pkl'):
+        self.path = path
+        self.saves = 0
+        self.size = 0  # 마지막 저장 크기(바이트)
+        self.save_time = 0.0  # 마지막 저장에 걸린 시간(초)
+
+    def save(self, state):
+        t_start = time.perf_counter()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump({'version': VERSION, 'saved': time.time(), 'state': state}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.path)
+
+        self.saves += 1
+        self.size = os.path.getsize(self.path)
+        self.save_time = time.perf_counter() - t_start
+
+    def load(self):
+        """(상태, 저장 시각 epoch 초) 를 반환한다. 파일이 없거나 읽을 수 없으면 (None, None)."""
+        if not os.path.isfile(self.path):
+            return None, None
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+        except Exception:
+            traceback.print_exc(file=sys.stdout)
+            return None, None
+        if data.get('version') != VERSION:
+            return None, None
+        return data['state'], data['saved']
@@ -0,0 +1,29 @@
+from barstore import BarStore
+
+
+def make_bars(days):
+    return [(day, day % 100, day % 100 + 1, day % 100 - 1, day % 100, 1000) for day in days]
+
+
+def test_older_bars_of_later_codes_are_kept(tmp_path):
+    store = BarStore(str(tmp_path), max_codes=4, max_days=10)
+    store.write_bars('A000001', make_bars([20260105, 20260106]))  # 상장한 지 얼마 안 된 종목
+    store.write_bars('A000002', make_bars([20260101, 20260102, 20260105, 20260106]))
+    store.write_bars('A000003', make_bars([20260101, 20260104, 20260106]))
+
+    assert store.dates == [20260101, 20260102, 20260104, 20260105, 20260106]
+    assert list(store.get_ohlc('A000002', 10)['close']) == [6, 5, 2, 1]
+    assert list(store.get_ohlc('A000003', 10)['close']) == [6, 4, 1]
+    assert list(store.get_ohlc('A000001', 10)['close']) == [6, 5]  # 먼저 쓴 종목은 열만 밀린다.
+    assert list(store.window('A000001', 'close', 3)) == [0, 5, 6]
+
+
+def test_insert_into_full_axis_drops_oldest(tmp_path):
+    store = BarStore(str(tmp_path), max_codes=4, max_days=3)
+    store.write_bars('A000001', make_bars([20260103, 20260105, 20260106]))
+    store.write_bars('A000002', make_bars([20260101, 20260104, 20260106]))
+
+    # 축에 남는 최근 3 일보다 오래된 일봉은 들어가지 않는다.
+    assert store.dates == [20260104, 20260105, 20260106]
+    assert list(store.get_ohlc('A000001', 3)['close']) == [6, 5]
+    assert list(store.get_ohlc('A000002', 3)['close']) == [6, 4]
@@ -0,0 +1,243 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from gateway import Connection, GatewayClient, GatewayServer
+from quota import PRIORITY_EXIT, PRIORITY_ORDER, PRIORITY_QUOTE, QUOTA_QUOTE
+
+QUOTE = 'DsCbo1.StockMst'
+ACCOUNT = 'CpTrade.CpTd6032'
+ORDER = 'CpTrade.CpTd0311'
+REALTIME = 'DsCbo1.StockCur'
+
+
+class FakeObject:
+    """크레온 COM 객체 흉내. BlockRequest 마다 값이 바뀌고, backend.gate 가 있으면 열릴 때까지 막힌다."""
+    LimitRequestRemainTime = 0
+
+    def __init__(self, backend, prog_id):
+        self.backend = backend
+        self.prog_id = prog_id
+        self.inputs = {}
+        self.header = {}
+        self.handler = None
+        self.subscribed = False
+
+    def SetInputValue(self, field, value):
+        self.inputs[field] = value
+
+    def BlockRequest(self):
+        backend = self.backend
+        backend.requests.append((self.prog_id, dict(self.inputs)))
+        if backend.gate is not None:
+            backend.gate.wait(5)
+        if backend.error is not None:
+            raise backend.error
+        count = len(backend.requests)
+        self.header = {3: str(count), 11: count, 14: count, 15: count}
+        return 0
+
+    def GetHeaderValue(self, field):
+        return self.header.get(field, 0)
+
+    def GetDataValue(self, field, index):
+        return 0
+
+    def GetDibStatus(self):
+        return 0
+
+    def GetDibMsg1(self):
+        return ''
+
+    def GetLimitRemainCount(self, check_type):
+        return 60
+
+    def Subscribe(self):
+        self.subscribed = True
+
+    def Unsubscribe(self):
+        self.subscribed = False
+
+
+class FakeBackend:
+    """GatewayServer 가 쓰는 broker 모듈 흉내"""
+
+    def __init__(self):
+        self.objects = []
+        self.requests = []
+        self.gate = None
+        self.error = None
+
+    def Dispatch(self, prog_id):
+        obj = FakeObject(self, prog_id)
+        self.objects.append(obj)
+        return obj
+
+    def WithEvents(self, obj, handler_class):
+        obj.handler = handler_class()
+        return obj.handler
+
+    def init_thread(self):
+        pass
+
+    def pump_events(self, timeout=0):
+        pass
+
+    def clock(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def count(self, prog_id):
+        return sum(1 for requested, _ in self.requests if requested == prog_id)
+
+
+class FakeConn:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def backend():
+    return FakeBackend()
+
+
+@pytest.fixture
+def server(backend):
+    server = GatewayServer('unused', backend, cache_ttl=0.2)
+    yield server
+    server.close()
+
+
+def wait_until(condition, timeout=5.0):
+    t_end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < t_end
+        time.sleep(0.01)
+
+
+def test_quote_is_cached_until_ttl(server, backend):
+    first = server.request(QUOTE, [(0, 'A005930')], PRIORITY_QUOTE, None)
+    assert server.request(QUOTE, [(0, 'A005930')], PRIORITY_QUOTE, None) == first
+    assert backend.count(QUOTE) == 1
+    assert server.stats()['hits'] == 1
+
+    # 입력이 다르면 다른 요청이다.
+    server.request(QUOTE, [(0, 'A000660')], PRIORITY_QUOTE, None)
+    assert backend.count(QUOTE) == 2
+
+    time.sleep(0.25)
+    assert server.request(QUOTE, [(0, 'A005930')], PRIORITY_QUOTE, None) != first
+    assert backend.count(QUOTE) == 3
+
+
+def test_identical_inflight_requests_share_one_call(server, backend):
+    backend.gate = threading.Event()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        server.request(QUOTE, [(0, 'A005930')], PRIORITY_QUOTE, None))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+
+    wait_until(lambda: server.stats()['deduped'] == 2)
+    backend.gate.set()
+    for thread in threads:
+        thread.join()
+
+    assert backend.count(QUOTE) == 1
+    assert len(results) == 3 and results[0] == results[1] == results[2]
+    assert not server.inflight
+
+
+def test_order_and_account_requests_are_not_cached(server, backend):
+    first = server.request(ACCOUNT, [(0, '12345678'), (1, '01')], PRIORITY_ORDER, None)
+    second = server.request(ACCOUNT, [(0, '12345678'), (1, '01')], PRIORITY_ORDER, 60)
+    assert first != second
+    assert backend.count(ACCOUNT) == 2
+    stats = server.stats()
+    assert stats['hits'] == 0 and stats['cache'] == 0
+
+
+def test_order_runs_while_quote_waits_for_quota(server, backend):
+    now = [0.0]
+    backend.clock = lambda: now[0]  # 시계를 멈춰 시세 요청 제한이 풀리지 않게 한다.
+    backend.sleep = lambda seconds: time.sleep(0.01)
+
+    # 한 클라이언트가 시세 요청을 예약분(20%)만 남기고 다 쓴다.
+    for i in range(48):
+        server.request(QUOTE, [(0, f'A{i:06d}')], PRIORITY_QUOTE, None)
+    quote = threading.Thread(target=server.request, args=(QUOTE, [(0, 'A999999')], PRIORITY_QUOTE, None),
+                             daemon=True)
+    quote.start()
+    wait_until(lambda: 2 <= server.scheduler.stats_data[QUOTA_QUOTE]['deferred'])
+
+    # 다른 클라이언트의 매도 주문은 시세 요청이 토큰을 기다리는 동안에도 바로 나간다.
+    done = threading.Event()
+    threading.Thread(target=lambda: (server.request(ORDER, [(0, '1')], PRIORITY_EXIT, None), done.set()),
+                     daemon=True).start()
+    assert done.wait(1.0)
+    assert backend.count(ORDER) == 1
+    assert quote.is_alive() and backend.count(QUOTE) == 48
+
+    now[0] = 15.0
+    quote.join(5)
+    assert not quote.is_alive() and backend.count(QUOTE) == 49
+
+
+def test_subscription_fans_out_and_unsubscribes_after_last(server, backend):
+    clients = [Connection(FakeConn()), Connection(FakeConn())]
+    for topic_id, connection in enumerate(clients, 1):
+        server.handle(connection, ('subscribe', topic_id, REALTIME, [(0, 'A005930')]))
+        assert connection.conn.sent == [('reply', topic_id, None)]
+
+    # 같은 객체/입력은 한 번만 구독한다.
+    realtime = [obj for obj in backend.objects if obj.prog_id == REALTIME]
+    assert len(realtime) == 1 and realtime[0].subscribed
+    assert server.stats()['subscribers'] == 2
+
+    realtime[0].header = {0: 'A005930', 13: 70000}
+    realtime[0].handler.OnReceived()
+    for topic_id, connection in enumerate(clients, 1):
+        assert connection.conn.sent[-1][:2] == ('event', topic_id)
+        assert connection.conn.sent[-1][2][13] == 70000
+
+    server.handle(clients[0], ('unsubscribe', 3, 1))
+    assert realtime[0].subscribed
+    realtime[0].handler.OnReceived()
+    assert clients[0].conn.sent[-1] == ('reply', 3, None)  # 구독을 끊은 쪽은 이벤트를 받지 않는다.
+
+    server.handle(clients[1], ('unsubscribe', 4, 2))
+    assert not realtime[0].subscribed
+    assert server.stats()['topics'] == 0
+
+
+def test_errors_propagate_to_client(backend, tmp_path):
+    address = r'\\.\pipe\auto-stock-gateway-test' if sys.platform == 'win32' else str(tmp_path / 'gateway.sock')
+    server = GatewayServer(address, backend, cache_ttl=0.2).start()
+    client = GatewayClient(address)
+    try:
+        obj = client.Dispatch(QUOTE)
+        obj.SetInputValue(0, 'A005930')
+        backend.error = RuntimeError('boom')
+        with pytest.raises(RuntimeError, match='boom'):
+            obj.BlockRequest()
+        assert client.stats()['errors'] == 1
+
+        # 실패한 요청은 캐시에도, 처리 중 목록에도 남지 않는다.
+        backend.error = None
+        assert obj.BlockRequest() == 0
+        assert obj.GetHeaderValue(11) == 2
+        with pytest.raises(KeyError, match='not in SCHEMAS'):
+            obj.GetHeaderValue(99)
+    finally:
+        client.close()
+        server.close()
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from notifier import BLOCK, DROP_NEW, DROP_OLDEST, MemorySink, Notifier
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class GatedSink(MemorySink):
+    """gate 가 열릴 때까지 post() 에서 멈춰, 그동안 큐가 차게 한다."""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+
+    def post(self, channel, text):
+        self.entered.set()
+        self.gate.wait(5)
+        super().post(channel, text)
+
+
+def wait_until(condition, timeout=5.0):
+    t_end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < t_end
+        time.sleep(0.01)
+
+
+def get_text(sink):
+    return '\n'.join(text for _, text in sink.messages)
+
+
+def test_repeats_are_coalesced_and_expire_with_count():
+    clock, sink = FakeClock(), MemorySink()
+    notifier = Notifier(sink, batch_interval=0.01, coalesce_window=60.0, clock=clock)
+    try:
+        assert notifier.send('a')
+        assert not notifier.send('a')
+        assert not notifier.send('a')
+        assert notifier.send('b', key='x')
+        assert not notifier.send('c', key='x')  # 같은 key 면 마지막 메시지를 남긴다.
+        wait_until(lambda: notifier.stats()['sent'] == 2)
+        assert get_text(sink).split('\n') == ['a', 'b']
+        assert notifier.stats()['coalesced'] == 3
+
+        clock.now = 60.0
+        wait_until(lambda: notifier.stats()['sent'] == 4)
+        text = get_text(sink)
+        assert 'a\n(같은 메시지 2회 더)' in text and 'c\n(같은 메시지 1회 더)' in text
+
+        # 창이 끝났으므로 다시 바로 보낸다.
+        assert notifier.send('a')
+    finally:
+        notifier.close()
+
+
+@pytest.mark.parametrize('policy, accepted, queued', [
+    (DROP_OLDEST, [True, True, True], ['m2', 'm3']),
+    (DROP_NEW, [True, True, False], ['m1', 'm2']),
+    (BLOCK, [True, True, False], ['m1', 'm2']),
+])
+def test_overflow_policies(policy, accepted, queued):
+    sink = GatedSink()
+    notifier = Notifier(sink, maxsize=2, batch_size=1, batch_interval=0.01, coalesce_window=0.0,
+                        policy=policy, block_timeout=0.05, clock=FakeClock())
+    try:
+        notifier.send('m0')
+        assert sink.entered.wait(5)  # 스레드가 m0 을 보내는 중에 막혀 있다.
+
+        t_start = time.monotonic()
+        assert [notifier.send(message) for message in ('m1', 'm2', 'm3')] == accepted
+        if policy == BLOCK:
+            assert 0.05 <= time.monotonic() - t_start
+        assert list(notifier.queue) == queued
+        assert notifier.stats()['dropped'] == 1
+    finally:
+        sink.gate.set()
+        notifier.close()
+    assert get_text(sink).split('\n') == ['m0'] + queued
+
+
+def test_block_waits_for_room():
+    sink = GatedSink()
+    notifier = Notifier(sink, maxsize=1, batch_size=1, batch_interval=0.01, coalesce_window=0.0,
+                        policy=BLOCK, block_timeout=5.0, clock=FakeClock())
+    try:
+        notifier.send('m0')
+        assert sink.entered.wait(5)
+        assert notifier.send('m1')
+        threading.Timer(0.05, sink.gate.set).start()
+        assert notifier.send('m2')  # 스레드가 m1 을 꺼내면 자리가 난다.
+        assert notifier.stats()['dropped'] == 0
+    finally:
+        sink.gate.set()
+        notifier.close()
+    assert get_text(sink).split('\n') == ['m0', 'm1', 'm2']
+
+
+def test_close_flushes_queue_and_coalesced():
+    sink = MemorySink()
+    notifier = Notifier(sink, batch_size=20, batch_interval=10.0, coalesce_window=60.0, clock=FakeClock())
+    notifier.send('a')
+    notifier.send('a')
+    notifier.send('b')
+    notifier.close()
+
+    assert not notifier.thread.is_alive()
+    assert get_text(sink).split('\n') == ['a', 'b', 'a', '(같은 메시지 1회 더)']
+    assert notifier.stats()['queued'] == 0 and notifier.stats()['sent'] == 3
+    assert notifier.recent == {}
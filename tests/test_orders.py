@@ -0,0 +1,143 @@
+import pytest
+
+import position
+from orders import BUY, CANCELLED, FILLED, PARTIALLY_FILLED, REJECTED, SELL, SUBMITTED, OrderManager
+from position import CpConclusion
+
+DAY = '20261018'
+
+
+class FakeConclusionObject:
+    """DsCbo1.CpConclusion 흉내. fire() 로 체결 이벤트 헤더를 스크립트대로 보낸다."""
+
+    def __init__(self):
+        self.header = {}
+        self.handler = None
+        self.subscribed = False
+
+    def Subscribe(self):
+        self.subscribed = True
+
+    def Unsubscribe(self):
+        self.subscribed = False
+
+    def GetHeaderValue(self, field):
+        return self.header.get(field)
+
+    def fire(self, code, order, flag, quantity=0, price=0, order_id=0, name='종목'):
+        self.header = {2: name, 3: quantity, 4: price, 5: order_id, 9: code, 12: order, 14: flag}
+        self.handler.OnReceived()
+
+
+class FakeBroker:
+    def __init__(self):
+        self.obj = FakeConclusionObject()
+
+    def Dispatch(self, prog_id):
+        return self.obj
+
+    def WithEvents(self, obj, handler_class):
+        obj.handler = handler_class()
+        return obj.handler
+
+
+@pytest.fixture
+def source(monkeypatch):
+    fake = FakeBroker()
+    monkeypatch.setattr(position, 'broker', fake)
+    return fake.obj
+
+
+def make_manager(source, results=None):
+    """results 의 (BlockRequest 반환값, 주문번호) 를 차례로 돌려주는 주문 함수로 OrderManager 를 만든다."""
+    results = iter(results or [])
+    manager = OrderManager(lambda order: next(results, (0, 0)), today=DAY)
+    manager.roll = lambda today=None: None  # 시험 중에 날짜가 바뀌지 않게 한다.
+    conclusion = CpConclusion()
+    conclusion.add_listener(manager.on_conclusion)
+    conclusion.Subscribe()
+    return manager
+
+
+def test_fills_move_order_to_partial_then_filled(source):
+    manager = make_manager(source, [(0, 101)])
+    states = []
+    manager.add_listener(lambda order: states.append(order.state))
+
+    order = manager.place('A000001', '종목', BUY, 10)
+    assert order.state == SUBMITTED and order.order_id == 101
+
+    source.fire('A000001', '2', '4', order_id=101)  # 접수는 상태를 되돌리지 않는다.
+    source.fire('A000001', '2', '1', 4, 1000, 101)
+    assert order.state == PARTIALLY_FILLED and order.filled == 4
+    source.fire('A000001', '2', '1', 6, 1100, 101)
+    assert order.state == FILLED and order.filled == 10
+    assert order.price == 1060
+    assert states == [SUBMITTED, PARTIALLY_FILLED, FILLED]
+
+    source.fire('A000001', '2', '2', order_id=101)  # 끝난 주문의 확인은 취소로 바꾸지 않는다.
+    assert order.state == FILLED
+    assert manager.has_traded('A000001', BUY)
+
+
+def test_unfilled_ioc_cancel_does_not_block_reentry(source):
+    manager = make_manager(source, [(0, 201), (0, 202)])
+    order = manager.place('A000002', '종목', BUY, 10)
+    assert manager.has_traded('A000002')
+
+    source.fire('A000002', '2', '2', order_id=201)
+    assert order.state == CANCELLED
+    assert not manager.has_traded('A000002')
+
+    # 다시 사서 일부만 체결되고 잔량이 취소되면 거래한 것으로 센다.
+    order = manager.place('A000002', '종목', BUY, 10)
+    source.fire('A000002', '2', '1', 3, 1000, 202)
+    source.fire('A000002', '2', '2', order_id=202)
+    assert order.state == CANCELLED and order.filled == 3
+    assert manager.has_traded('A000002', BUY)
+    assert not manager.has_traded('A000002', SELL)
+
+
+def test_rejected_orders_do_not_count(source):
+    manager = make_manager(source, [(1, 0), (0, 301)])
+    assert manager.place('A000003', '종목', SELL, 5).state == REJECTED
+    assert not manager.has_traded('A000003')
+
+    order = manager.place('A000003', '종목', SELL, 5)
+    source.fire('A000003', '1', '3', order_id=301)
+    assert order.state == REJECTED
+    assert not manager.has_traded('A000003')
+
+
+def test_limited_order_is_sent_again_with_same_client_id(source):
+    limited = []
+    manager = make_manager(source, [(4, 0), (0, 401)])
+    manager.on_limited = limited.append
+    order = manager.place('A000004', '종목', BUY, 1)
+    assert limited == [order] and order.attempts == 2
+    assert order.state == SUBMITTED and order.order_id == 401
+    assert len(manager.get_orders()) == 1
+
+
+def test_replay_matches_events_without_order_id(source):
+    manager = make_manager(source)
+    order = manager.place('A000005', '종목', SELL, 5)  # 주문번호를 받지 못한 주문
+    other = manager.place('A000006', '종목', SELL, 5)
+
+    manager.replay([
+        {'code': 'A000005', 'order': '1', 'flag': '4', 'order_id': 501},
+        {'code': 'A000005', 'order': '1', 'flag': '1', 'order_id': 501, 'quantity': 5, 'price': 900},
+        {'code': 'A000007', 'order': '1', 'flag': '1', 'order_id': 701, 'quantity': 1, 'price': 100},
+    ])
+    assert order.order_id == 501 and order.state == FILLED and order.price == 900
+    assert other.state == SUBMITTED and other.order_id is None
+    assert [item['code'] for item in manager.unmatched] == ['A000007']
+    assert manager.stats() == {'orders': 2, 'states': {FILLED: 1, SUBMITTED: 1}, 'unmatched': 1}
+
+
+def test_record_counts_as_traded(source):
+    manager = make_manager(source)
+    order = manager.record('A000008', '종목', BUY, 7, 1200)
+    assert order.state == FILLED and order.price == 1200
+    assert manager.has_traded('A000008', BUY)
+    assert manager.get_orders('A000008') == [order]
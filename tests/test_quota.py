@@ -0,0 +1,114 @@
+import pytest
+
+from quota import (QUOTA_ORDER, QUOTA_QUOTE, PRIORITY_EXIT, PRIORITY_QUOTE, PRIORITY_UNIVERSE, RequestScheduler,
+                   TokenBucket)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class FakeStatus:
+    """CpCybos 흉내: remain 이 0 이면 remain_time(ms) 동안 막힌다."""
+
+    def __init__(self):
+        self.remain = 60
+        self.LimitRequestRemainTime = 0
+
+    def GetLimitRemainCount(self, check_type):
+        return self.remain
+
+
+def test_bucket_refills_at_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(60, 15.0, clock)
+    for _ in range(60):
+        bucket.take()
+    assert bucket.available() == pytest.approx(0)
+    assert bucket.time_until(1) == pytest.approx(0.25)
+
+    clock.now = 7.5
+    assert bucket.available() == pytest.approx(30)
+    clock.now = 100
+    assert bucket.available() == 60  # capacity 를 넘지 않는다.
+
+
+def test_bucket_utilization_window():
+    clock = FakeClock()
+    bucket = TokenBucket(20, 15.0, clock)
+    for _ in range(10):
+        bucket.take()
+    assert bucket.utilization() == pytest.approx(0.5)
+    clock.now = 15.0
+    assert bucket.utilization() == 0
+
+
+def test_acquire_waits_when_empty():
+    clock = FakeClock()
+    scheduler = RequestScheduler(clock=clock, sleep=clock.sleep)
+    for _ in range(60):
+        assert scheduler.acquire(QUOTA_QUOTE, PRIORITY_EXIT) == 0
+    waited = scheduler.acquire(QUOTA_QUOTE, PRIORITY_EXIT)
+    assert waited == pytest.approx(0.25)
+    assert scheduler.stats()[QUOTA_QUOTE]['waits'] == 1
+
+
+def test_priority_floor_keeps_reserve_for_exits():
+    clock = FakeClock()
+    scheduler = RequestScheduler(clock=clock, sleep=clock.sleep)
+    # 종목 갱신은 버킷의 절반을 남긴다.
+    granted = 0
+    while scheduler.try_acquire(QUOTA_QUOTE, PRIORITY_UNIVERSE):
+        granted += 1
+    assert granted == 30
+    assert scheduler.stats()[QUOTA_QUOTE]['deferred'] == 1
+
+    # 시세 요청은 20% 를 남기고, 매도는 남은 토큰을 다 쓸 수 있다.
+    assert not scheduler.can_acquire(QUOTA_QUOTE, PRIORITY_UNIVERSE)
+    assert scheduler.can_acquire(QUOTA_QUOTE, PRIORITY_QUOTE)
+    while scheduler.try_acquire(QUOTA_QUOTE, PRIORITY_QUOTE):
+        granted += 1
+    assert granted == 48
+    while scheduler.try_acquire(QUOTA_QUOTE, PRIORITY_EXIT):
+        granted += 1
+    assert granted == 60
+
+
+def test_low_priority_acquire_waits_for_floor():
+    clock = FakeClock()
+    scheduler = RequestScheduler(clock=clock, sleep=clock.sleep)
+    for _ in range(60):
+        scheduler.acquire(QUOTA_QUOTE, PRIORITY_EXIT)
+    # 예약분 30 개 + 1 개가 찰 때까지 기다린다.
+    assert scheduler.acquire(QUOTA_QUOTE, PRIORITY_UNIVERSE) == pytest.approx(31 * 0.25)
+
+
+def test_remote_limit_blocks_even_with_local_tokens():
+    clock = FakeClock()
+    status = FakeStatus()
+    status.remain = 0
+    status.LimitRequestRemainTime = 2000
+    scheduler = RequestScheduler(status, clock=clock, sleep=clock.sleep)
+    assert not scheduler.can_acquire(QUOTA_ORDER, PRIORITY_EXIT)
+
+    def release(seconds):
+        clock.sleep(seconds)
+        status.remain = 20
+
+    scheduler.sleep = release
+    assert scheduler.acquire(QUOTA_ORDER, PRIORITY_EXIT) == pytest.approx(2.0)
+
+
+def test_unknown_quota_is_not_limited():
+    scheduler = RequestScheduler()
+    assert scheduler.try_acquire(2)
+    assert scheduler.acquire(2) == 0.0
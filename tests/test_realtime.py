@@ -0,0 +1,68 @@
+from realtime import PRIORITY_CANDIDATE, PRIORITY_HOLDING, RealtimeManager
+
+
+class FakeSubscription:
+    """CpStockCur 흉내. fire() 로 체결 이벤트를 스크립트대로 보낸다."""
+
+    def __init__(self):
+        self.code = ''
+        self.manager = None
+        self.subscribed = False
+
+    def Subscribe(self, code, manager):
+        self.code = code
+        self.manager = manager
+        self.subscribed = True
+
+    def Unsubscribe(self):
+        self.subscribed = False
+
+    def fire(self, price, high=None, low=None):
+        self.manager.on_tick(self.code, price, high, low)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_holdings_always_subscribed_and_candidates_rotate():
+    manager = RealtimeManager(limit=3, create=FakeSubscription)
+    manager.set_targets({'A1': PRIORITY_HOLDING, 'B1': PRIORITY_CANDIDATE, 'B2': PRIORITY_CANDIDATE,
+                         'B3': PRIORITY_CANDIDATE})
+    first = set(manager.subscriptions)
+    assert 'A1' in first and len(first) == 3
+
+    manager.rotate()
+    second = set(manager.subscriptions)
+    assert 'A1' in second and len(second) == 3
+    assert first != second
+    assert manager.rotations == 2
+
+
+def test_unsubscribes_codes_that_leave_targets():
+    manager = RealtimeManager(limit=10, create=FakeSubscription)
+    manager.set_targets({'A1': PRIORITY_HOLDING, 'B1': PRIORITY_CANDIDATE})
+    b1 = manager.subscriptions['B1']
+    manager.set_targets({'A1': PRIORITY_HOLDING})
+    assert not b1.subscribed and set(manager.subscriptions) == {'A1'}
+
+
+def test_scripted_ticks_reach_on_price_and_price_cache():
+    clock = FakeClock()
+    received = []
+    manager = RealtimeManager(lambda *tick: received.append(tick), limit=10, create=FakeSubscription, clock=clock)
+    manager.set_targets({'A1': PRIORITY_HOLDING})
+
+    for price in (100, 101, 99):
+        manager.subscriptions['A1'].fire(price, 101, 99)
+    assert received == [('A1', 100, 101, 99), ('A1', 101, 101, 99), ('A1', 99, 101, 99)]
+    assert manager.ticks == 3
+    assert manager.get_price('A1') == 99
+
+    clock.now = 5.0
+    assert manager.get_price('A1', max_age=1.0) is None
+    assert manager.get_price('B1') is None
@@ -0,0 +1,78 @@
+import pytest
+
+from config import config
+
+CASH = 'CpTrade.CpTdNew5331A'
+ORDER = 'CpTrade.CpTd0311'
+
+
+@pytest.fixture
+def sim_trade(monkeypatch, tmp_path):
+    """시뮬레이션 시장에서 첫 주기까지 돈 trade 모듈. 실시간 체결은 realtime.on_tick() 으로 스크립트대로 넣는다."""
+    import bench
+
+    monkeypatch.chdir(tmp_path)  # setup_trade() 가 바꾼 작업 디렉터리를 되돌린다.
+    saved = dict(vars(config))
+    trade, market = bench.setup_trade(100, 0.0, True)
+    yield trade, market
+    vars(config).update(saved)
+
+
+def get_candidate(trade):
+    """보유하지 않았고 매수 구간 가운데 가격이면 매수 조건을 만족하는 후보 (code, price)"""
+    holdings = trade.position_cache.peek()
+    for code in trade.code_list:
+        indicator = trade.indicator_engine.get(code)
+        if indicator is None or code in holdings or trade.code_list[code][2] <= 0:
+            continue
+        price = int(indicator['target'] * (1 + config.profit_rate / 200))
+        if indicator['ma5'] < price and indicator['ma10'] < price:
+            return code, price
+    pytest.skip('no buy candidate in the simulated market')
+
+
+def test_repeated_buy_ticks_query_cash_once(sim_trade):
+    trade, market = sim_trade
+    code, price = get_candidate(trade)
+    cash, orders = market.requests[CASH], market.requests[ORDER]
+
+    for _ in range(20):
+        trade.realtime.on_tick(code, price, price, price)
+
+    assert market.requests[CASH] - cash == 1
+    assert market.requests[ORDER] - orders == 1
+    assert len(trade.order_manager.get_orders(code)) == 1
+
+
+def pump_conclusions(market):
+    """쌓인 실시간 이벤트 중 주문 체결(CpConclusion)만 전달한다. 시장 시세 체결은 스크립트로만 넣는다."""
+    from simulator import SimConclusion
+
+    events = [event for event in market.events if isinstance(event[0], SimConclusion)]
+    market.events.clear()
+    for publisher, header, data in events:
+        publisher.header, publisher.data = header, data
+        for handler in list(publisher.handlers):
+            handler.OnReceived()
+
+
+def test_loss_exit_sells_once_and_blacklists_once(sim_trade):
+    trade, market = sim_trade
+    holdings = trade.position_cache.get()
+    code, stock = next(iter(holdings.items()))
+    price = int(stock['price'] * (1 + (config.loss_rate - 5) / 100))
+    orders = market.requests[ORDER]
+    with open('blacklist.csv', encoding='utf-8') as f:
+        rows = f.read().splitlines()
+
+    # 손절 가격 체결이 계속 들어오고, 사이사이 주문 체결 이벤트를 받는다.
+    for _ in range(20):
+        trade.realtime.on_tick(code, price, stock['price'], price)
+        pump_conclusions(market)
+
+    sells = [order for order in trade.order_manager.get_orders(code) if order.side == trade.SELL]
+    assert len(sells) == 1 and sells[0].filled == stock['shares']
+    assert market.requests[ORDER] - orders == 1
+    assert code not in trade.position_cache.peek()
+    with open('blacklist.csv', encoding='utf-8') as f:
+        assert [row.split(',')[0] for row in f.read().splitlines()[len(rows):]] == [code]
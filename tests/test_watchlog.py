@@ -0,0 +1,43 @@
+from watchlog import WatchLog
+
+
+def make_log(capacity, count):
+    log = WatchLog(capacity, clock=lambda: 0.0)
+    for i in range(count):
+        log.append(900 + i, f'A{i:06d}', 1)
+    return log
+
+
+def test_restore_into_larger_capacity_has_no_empty_events():
+    saved = make_log(4, 1)
+    saved.read('buy')  # buy 는 seq 1 까지 읽었다.
+    for i in range(1, 10):
+        saved.append(900 + i, f'A{i:06d}', 1)
+
+    log = WatchLog(16)
+    log.set_state(saved.get_state())
+    assert log.first_seq == 7
+    assert len(log) == 4
+    assert [event['seq'] for event in log.find()] == [7, 8, 9, 10]
+    assert log.get(6) is None
+
+    # 저장 전에 덮어쓴 2~6 은 dropped 로 세고, 새 소비자는 되살린 이벤트의 처음부터 읽는다.
+    assert [event['seq'] for event in log.read('buy')] == [7, 8, 9, 10]
+    assert log.dropped == {'buy': 5}
+    assert [event['seq'] for event in log.read('sell')] == [7, 8, 9, 10]
+
+
+def test_restore_into_smaller_capacity_keeps_latest():
+    log = WatchLog(2)
+    log.set_state(make_log(8, 5).get_state())
+    assert [event['code'] for event in log.find()] == ['A000003', 'A000004']
+    assert log.append(901, 'A000001', 1) is None  # 버린 이벤트는 다시 받지 않는다.
+    assert log.append(905, 'A000005', 1) == 6
+
+
+def test_restore_empty_state():
+    log = WatchLog(16)
+    log.set_state(WatchLog(4).get_state())
+    assert len(log) == 0
+    assert log.read('buy') == []
+    assert log.append(900, 'A000000', 1) == 1
@@ -0,0 +1,133 @@
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+__all__ = ['TICK_DTYPE', 'TickStore']
+
+# 체결 한 건: 시각(hhmmss), 체결가
+TICK_DTYPE = np.dtype([('time', '<i4'), ('price', '<f8')])
+
+
+class TickStore:
+    """종목/일자별 체결을 고정 길이 바이너리 레코드로 덧붙여 저장한다.
+
+    ./curr/<code>-<YYYY-MM-DD>.tick 은 시각 순으로만 덧붙이므로 시각 범위 조회는 이분 탐색으로 한다.
+    장 마감 후 compact() 로 압축 보관(.npz)하고, 보관 기간이 지난 파일은 지운다.
+    """
+
+    def __init__(self, path='./curr', retention_days=5):
+        self.path = path
+        self.archive_path = os.path.join(path, 'archive')
+        self.retention_days = retention_days
+        self.last = {}  # (code, date) -> (마지막 시각, 마지막 시각의 체결가 집합)
+
+    def get_file_path(self, code, date):
+        return os.path.join(self.path, f'{code}-{date}.tick')
+
+    def _load_last(self, code, date):
+        key = (code, date)
+        if key not in self.last:
+            ticks = self.read(code, date)
+            if len(ticks):
+                last_time = int(ticks['time'][-1])
+                self.last[key] = (last_time, set(ticks['price'][ticks['time'] == last_time].tolist()))
+            else:
+                self.last[key] = (-1, set())
+        return self.last[key]
+
+    def append(self, code, date, rows):
+        """(시각 hhmmss, 체결가) 목록 중 저장된 마지막 시각 이후의 체결만 덧붙이고, 덧붙인 건수를 반환한다.
+
+        rows 의 순서는 상관없다. (StockBid 는 최신순)
+        """
+        last_time, last_prices = self._load_last(code, date)
+
+        rows = sorted(rows, key=lambda row: row[0])
+        new_rows = []
+        seen = set()
+        for hms, price in rows:
+            if hms < last_time or (hms, price) in seen:
+                continue
+            if hms == last_time and price in last_prices:
+                continue
+            seen.add((hms, price))
+            new_rows.append((hms, price))
+
+        if not new_rows:
+            return 0
+
+        ticks = np.array(new_rows, dtype=TICK_DTYPE)
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.get_file_path(code, date), 'ab') as f:
+            ticks.tofile(f)
+
+        tail_time = int(ticks['time'][-1])
+        tail_prices = {price for hms, price in new_rows if hms == tail_time}
+        if tail_time == last_time:
+            tail_prices |= last_prices
+        self.last[(code, date)] = (tail_time, tail_prices)
+        return len(new_rows)
+
+    def read(self, code, date, start=None, end=None):
+        """start <= 시각 <= end (hhmmss) 체결 배열을 반환한다."""
+        file_path = self.get_file_path(code, date)
+        if os.path.isfile(file_path):
+            # 쓰다 만 마지막 레코드는 무시한다.
+            count = os.path.getsize(file_path) // TICK_DTYPE.itemsize
+            ticks = np.fromfile(file_path, dtype=TICK_DTYPE, count=count)
+        else:
+            archive = os.path.join(self.archive_path, f'{code}-{date}.npz')
+            if not os.path.isfile(archive):
+                return np.empty(0, dtype=TICK_DTYPE)
+            with np.load(archive) as data:
+                ticks = data['ticks']
+
+        lo = 0 if start is None else np.searchsorted(ticks['time'], start, side='left')
+        hi = len(ticks) if end is None else np.searchsorted(ticks['time'], end, side='right')
+        return ticks[lo:hi]
+
+    def read_frame(self, code, date, start=None, end=None):
+        """Prophet 입력 형식(ds, y) DataFrame 으로 반환한다."""
+        ticks = self.read(code, date, start, end)
+        times = pd.to_datetime([f'{date} {t // 10000:02d}:{t // 100 % 100:02d}:{t % 100:02d}'
+                                for t in ticks['time'].tolist()])
+        return pd.DataFrame({'ds': times, 'y': ticks['price']})
+
+    def codes(self, date):
+        """date 에 체결이 저장된 종목 코드 목록을 반환한다."""
+        suffix = f'-{date}.tick'
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(name[:-len(suffix)] for name in os.listdir(self.path) if name.endswith(suffix))
+
+    def compact(self, date):
+        """date 의 체결 파일을 압축 보관하고 원본을 지운다."""
+        os.makedirs(self.archive_path, exist_ok=True)
+        for code in self.codes(date):
+            ticks = self.read(code, date)
+            archive = os.path.join(self.archive_path, f'{code}-{date}.npz')
+            temp = archive + '.tmp.npz'
+            np.savez_compressed(temp, ticks=ticks)
+            os.replace(temp, archive)
+            os.remove(self.get_file_path(code, date))
+            self.last.pop((code, date), None)
+
+    def expire(self, today=None):
+        """보관 기간이 지난 체결 파일과 압축 파일을 지운다. 지운 파일 수를 반환한다."""
+        today = today or datetime.now()
+        cutoff = (today - timedelta(days=self.retention_days)).strftime('%Y-%m-%d')
+        removed = 0
+        for path in (self.path, self.archive_path):
+            if not os.path.isdir(path):
+                continue
+            for name in os.listdir(path):
+                stem, ext = os.path.splitext(name)
+                if ext not in ('.tick', '.npz', '.csv'):
+                    continue
+                date = stem[-10:]
+                if len(date) == 10 and date < cutoff:
+                    os.remove(os.path.join(path, name))
+                    removed += 1
+        return removed
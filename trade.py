@@ -1,5 +1,4 @@
-import csv
-import ctypes
+import atexit
 import os
 import sys
 import time
@@ -8,15 +7,32 @@ from collections import OrderedDict, defaultdict
 from datetime import datetime
 
 import numpy as np
-import pandas as pd
-import schedule
-import win32com.client
 from slacker import Slacker
 
+import breakout
+import broker
+import metrics
+from barstore import BarStore
+from blacklist import Blacklist
 from config import config
 from connect import connect
-from holiday import is_holiday
+from holiday import is_holiday, trading_calendar
+from indicators import IndicatorEngine
 from marketwatch import CpRpMarketWatch
+from notifier import Notifier, SlackSink
+from orders import BUY, SELL, OrderManager
+from position import CpConclusion, PositionCache
+from predtable import PredictionTable
+from quote import QuoteSnapshot
+from quota import PRIORITY_ACCOUNT, PRIORITY_EXIT, PRIORITY_ORDER, PRIORITY_QUOTE, PRIORITY_UNIVERSE, \
+    QUOTA_QUOTE, RequestScheduler
+from realtime import PRIORITY_CANDIDATE, PRIORITY_HOLDING, RealtimeManager
+from runtime import COALESCE, BrokerExecutor, Runtime
+from shard import ShardedEvaluator
+from statestore import StateStore
+from tickstore import TickStore
+from universe import ListedStockCache, select_top
+from watchlog import WatchLog
 
 indicators = {
     10: '외국계증권사창구첫매수',
@@ -69,15 +85,25 @@ indicators = {
 }
 
 slack = Slacker(config.token)
+notifier = Notifier(SlackSink(slack), '#stock', config.notify_queue_size, coalesce_window=config.notify_coalesce)
+atexit.register(notifier.close)
 
 code_list = OrderedDict()
-black_list = OrderedDict()
-watch_data = {}
+watch_log = WatchLog(config.watch_log_size)
 ohlc_list = {}
+ohlc_date = None  # ohlc_list 의 일봉을 마지막으로 맞춘 날 YYYYMMDD
+tick_cursor = 0  # collect_ticks() 가 다음에 받을 code_list 순번
 high_list = {}
 
+indicator_engine = IndicatorEngine(10, (5, 10), breakout.get_k_grid(config.k_step))
+strategy = None  # strategy_workers 가 있으면 ShardedEvaluator
+bar_store = BarStore('./bars', calendar=trading_calendar)
+tick_store = TickStore('./curr', config.tick_retention_days)
+black_list = Blacklist('blacklist.csv', config.blacklist_days, trading_calendar)
+prediction_table = PredictionTable('./predict/predict.tbl')
+state_store = StateStore(config.state_path)
+
 pre_stock_message = ''
-remark = ''
 
 
 def print_message(*args):
@@ -87,48 +113,58 @@ def print_message(*args):
 
 
 def slack_send_message(message):
-    """인자로 받은 문자열을 파이썬 셸과 슬랙으로 동시에 출력한다."""
+    """인자로 받은 문자열을 파이썬 셸에 출력하고 슬랙 전송 큐에 넣는다. (전송은 기다리지 않는다)"""
+    key = message  # 시각을 뺀 내용이 같으면 반복 메시지로 합친다.
     message = datetime.now().strftime('[%Y-%m-%d %H:%M:%S]\n') + message
     print(message)
     print('----------------------------------------------------------------------------')
-    slack.chat.post_message('#stock', message)
+    notifier.send(message, key)
 
 
 def check_creon_system():
     """크레온 플러스 시스템 연결 상태를 점검한다."""
     # 관리자 권한으로 프로세스 실행 여부
-    if not ctypes.windll.shell32.IsUserAnAdmin():
+    if not broker.is_user_admin():
         print_message('check_creon_system() : admin user -> FAILED')
         return False
 
     # 연결 여부 체크
-    if win32com.client.Dispatch('CpUtil.CpCybos').IsConnect == 0:
+    if broker.Dispatch('CpUtil.CpCybos').IsConnect == 0:
         print_message('check_creon_system() : connect to server -> FAILED')
         return False
 
     # 주문 관련 초기화 - 계좌 관련 코드가 있을 때만 사용
-    if win32com.client.Dispatch('CpTrade.CpTdUtil').TradeInit(0) != 0:
+    if broker.Dispatch('CpTrade.CpTdUtil').TradeInit(0) != 0:
         print_message('check_creon_system() : init trade -> FAILED')
         return False
 
     return True
 
 
-def wait_for_request(check_type):
-    """크레온 플러스 시스템 요청을 대기한다."""
-    remain_count = cpStatus.GetLimitRemainCount(check_type)  # 0: 주문 관련 1: 시세 요청 관련 2: 실시간 요청 관련
+def wait_for_request(check_type, priority=PRIORITY_QUOTE):
+    """크레온 플러스 시스템 요청을 우선순위에 따라 대기한다."""
+    # 0: 주문 관련 1: 시세 요청 관련 2: 실시간 요청 관련
+    if check_type in scheduler.buckets:
+        waited = scheduler.acquire(check_type, priority)
+        metrics.observe_quota_wait(check_type, waited)
+        if waited:
+            print_message(f'대기시간: {waited:2.2f}초')
+        return
+
+    remain_count = cpStatus.GetLimitRemainCount(check_type)
     if 0 < remain_count:
         return
 
     remain_time = cpStatus.LimitRequestRemainTime
+    metrics.observe_quota_wait(check_type, remain_time / 1000)
     print_message(f'대기시간: {remain_time / 1000:2.2f}초')
-    time.sleep(remain_time / 1000)
+    broker.sleep(remain_time / 1000)
 
 
+@metrics.timed
 def get_watch_data():
-    """특징주 포착을 수신한다."""
-    wait_for_request(2)
-    cpRpMarketWatch.Request('*', watch_data)
+    """특징주 포착 구독을 유지한다. 처음과 재연결 뒤에만 놓친 신호를 조회한다."""
+    cpRpMarketWatch.Request('*', watch_log)
 
 
 def get_high_volume_code():
@@ -138,7 +174,7 @@ def get_high_volume_code():
     cpVolume.SetInputValue(2, ord('Y'))  # 관리 종목 제외 Y/N
     cpVolume.SetInputValue(3, ord('Y'))  # 우선주 제외 Y/N
 
-    wait_for_request(1)
+    wait_for_request(1, PRIORITY_UNIVERSE)
     cpVolume.BlockRequest()
 
     stop = cpVolume.GetHeaderValue(0)
@@ -188,7 +224,7 @@ def get_biggest_moves_code():
     cpMoves.SetInputValue(7, 0)  # 등락율 시작
     cpMoves.SetInputValue(8, 20)  # 등락율 끝, 20% 상승 제외
 
-    wait_for_request(1)
+    wait_for_request(1, PRIORITY_UNIVERSE)
     cpMoves.BlockRequest()
 
     for i in range(cpMoves.GetHeaderValue(0)):
@@ -213,38 +249,26 @@ def get_biggest_moves_code():
 
 
 def get_market_cap(codes):
-    """시가총액 순으로 종목 코드를 변환한다."""
-    cpMarketEye.SetInputValue(0, [0, 4, 20])  # 0: 종목코드 4: 현재가 20: 상장주식수
-    cpMarketEye.SetInputValue(1, codes)  # 종목코드 or 종목코드 리스트
-
-    wait_for_request(1)
-    cpMarketEye.BlockRequest()
-
-    market_caps = OrderedDict()
-    for i in range(cpMarketEye.GetHeaderValue(2)):
-        code = cpMarketEye.GetDataValue(0, i)  # 코드
-        close = cpMarketEye.GetDataValue(1, i)  # 종가
-        listed_stock = cpMarketEye.GetDataValue(2, i)  # 상장주식수
+    """종목별 시가총액(억 원)을 반환한다. 상장주식수는 처음 보는 종목만 요청한다."""
+    listed_stock_cache.refresh(codes)
 
-        market_cap = close * listed_stock
-        if cpCodeMgr.IsBigListingStock(code):
-            market_cap *= 1000
-        market_cap = market_cap // 100000000
-        market_caps[code] = market_cap
+    market_caps = {}
+    for code in codes:
+        price = code_list[code][1]  # 현재가
+        market_caps[code] = listed_stock_cache.get_market_cap(code, price)
 
     return market_caps
 
 
-def sort_code_list(market_caps: OrderedDict):
+def sort_code_list(market_caps: dict):
     """시가총액 상위 순으로 종목 코드를 정렬한다."""
     if len(code_list) <= 0 or len(market_caps) <= 0:
         return
 
-    for (code, (vol, price, percent, name)), (code2, (market_cap)) in zip(code_list.items(), market_caps.items()):
-        if code == code2:
-            code_list[code] = (vol, price, percent, name, market_cap)
+    for code, (vol, price, percent, name) in code_list.items():
+        code_list[code] = (vol, price, percent, name, market_caps.get(code, 0))
 
-    temp = OrderedDict(sorted(code_list.items(), key=lambda x: x[1][4], reverse=True)[:config.code_limit])
+    temp = OrderedDict(select_top(code_list.items(), config.code_limit, key=lambda x: x[1][4]))
     code_list.clear()
     code_list.update(temp)
 
@@ -258,8 +282,16 @@ def print_code_list():
     print_message(message)
 
 
+@metrics.timed
 def get_code_list():
-    """종목 코드를 가져온다."""
+    """종목 코드를 가져온다. 시세 요청 여유가 없으면 다음 갱신으로 미룬다."""
+    if code_list and not scheduler.can_acquire(QUOTA_QUOTE, PRIORITY_UNIVERSE, 3):
+        return
+
+    previous = set(code_list.keys())
+    cache = listed_stock_cache
+    requests, saved, hits = cache.requests, cache.saved, cache.hits
+
     code_list.clear()
     get_high_volume_code()
     get_biggest_moves_code()
@@ -267,24 +299,34 @@ def get_code_list():
     sort_code_list(market_caps)
     print_code_list()
 
+    added, removed = code_list.keys() - previous, previous - code_list.keys()
+    print_message(f'종목 변경: +{len(added)} -{len(removed)}, '
+                  f'시가총액 요청: {cache.requests - requests} (절약 {cache.saved - saved}), '
+                  f'캐시 종목: {cache.hits - hits}')
+
 
 def get_current_cash():
     """증거금 100% 주문 가능 금액을 반환한다."""
     cpCash.SetInputValue(0, acc)  # 계좌번호
     cpCash.SetInputValue(1, accFlag[0])  # 상품구분 - 주식 상품 중 첫번째
 
-    wait_for_request(0)
+    wait_for_request(0, PRIORITY_ACCOUNT)
     cpCash.BlockRequest()
     return cpCash.GetHeaderValue(9)  # 증거금 100% 주문 가능 금액
 
 
 def get_stock_balance():
-    """인자로 받은 종목의 종목명과 수량, 장부가를 반환한다."""
+    """보유 종목의 종목명과 수량, 장부가를 반환한다. 주기마다, 또는 주문/체결 후에만 다시 조회한다."""
+    return position_cache.get()
+
+
+def fetch_stock_balance():
+    """보유 종목의 종목명과 수량, 장부가를 조회한다."""
     cpStockBalance.SetInputValue(0, acc)  # 계좌번호
     cpStockBalance.SetInputValue(1, accFlag[0])  # 상품구분 - 주식 상품 중 첫번째
     cpStockBalance.SetInputValue(2, 50)  # 요청 건수(최대 50)
 
-    wait_for_request(0)
+    wait_for_request(0, PRIORITY_ACCOUNT)
     cpStockBalance.BlockRequest()
 
     stock_balance = {}
@@ -326,7 +368,11 @@ def print_stock_balance(stock_balance):
 
 
 def get_current_stock(code):
-    """인자로 받은 종목의 현재가, 고가, 저가를 반환한다."""
+    """인자로 받은 종목의 현재가, 고가, 저가를 반환한다. 시세 스냅샷이 최신이면 그 값을 쓴다."""
+    quote = quote_snapshot.get(code)
+    if quote is not None:
+        return quote
+
     cpStockMst.SetInputValue(0, code)  # 종목코드에 대한 가격 정보
 
     wait_for_request(1)
@@ -335,6 +381,7 @@ def get_current_stock(code):
     current_price = cpStockMst.GetHeaderValue(11)  # 현재가
     high = cpStockMst.GetHeaderValue(14)  # 고가
     low = cpStockMst.GetHeaderValue(15)  # 저가
+    quote_snapshot.update(code, current_price, high, low)
 
     return current_price, high, low
 
@@ -359,57 +406,91 @@ def has_enough_cash(code, name, current_price):
     return True, shares
 
 
+def submit_order(order):
+    """주문을 최유리 지정가 IOC 조건으로 내고 (BlockRequest 반환값, 주문번호) 를 반환한다."""
+    cpOrder.SetInputValue(0, order.side)  # 1:매도, 2:매수
+    cpOrder.SetInputValue(1, acc)  # 계좌번호
+    cpOrder.SetInputValue(2, accFlag[0])  # 상품구분 - 주식 상품 중 첫번째
+    cpOrder.SetInputValue(3, order.code)  # 종목코드
+    cpOrder.SetInputValue(4, order.quantity)  # 주문수량
+    cpOrder.SetInputValue(7, "1")  # 주문조건 0:기본, 1:IOC, 2:FOK
+    cpOrder.SetInputValue(8, "12")  # 주문호가 1:보통, 3:시장가 5:조건부, 12:최유리, 13:최우선
+
+    wait_for_request(0, PRIORITY_EXIT if order.side == SELL else PRIORITY_ORDER)
+    ret = cpOrder.BlockRequest()
+    return ret, cpOrder.GetHeaderValue(8)  # 8:주문번호
+
+
+def on_order_limited(order):
+    print_message(f'주의: 연속 주문 제한 ({order.client_id} {order.code})')
+
+
+def on_order_update(order):
+    """주문이 끝나면 체결 결과를 알린다."""
+    if not order.done:
+        return
+
+    if order.side == BUY and order.filled:
+        slack_send_message(f'{order.name} {order.price:,.1f}원 {order.filled}주 매수\n' + order.message)
+    elif order.side == SELL and order.filled < order.quantity:
+        slack_send_message(f'{order.name} {order.quantity - order.filled}주 매도 미체결 ({order.state})')
+
+
 def sell_stock(code, name, shares, percentage):
     """보유한 모든 종목을 최유리 지정가 IOC 조건으로 매도한다."""
     try:
-        # 최유리 IOC 매도 주문 설정
-        cpOrder.SetInputValue(0, "1")  # 1:매도, 2:매수
-        cpOrder.SetInputValue(1, acc)  # 계좌번호
-        cpOrder.SetInputValue(2, accFlag[0])  # 주식상품 중 첫번째
-        cpOrder.SetInputValue(3, code)  # 종목코드
-        cpOrder.SetInputValue(4, shares)  # 매도수량
-        cpOrder.SetInputValue(7, "1")  # 조건 0:기본, 1:IOC, 2:FOK
-        cpOrder.SetInputValue(8, "12")  # 호가 12:최유리, 13:최우선
-
-        # 최유리 IOC 매도 주문 요청
-        ret = cpOrder.BlockRequest()
-        if ret == 4:
-            print_message('주의: 연속 주문 제한')
-            wait_for_request(0)
-            cpOrder.BlockRequest()
+        order_manager.place(code, name, SELL, shares)
+        position_cache.invalidate()
     except Exception as e:
         traceback.print_exc(file=sys.stdout)
         slack_send_message(f"`sell({code}) -> exception! " + str(e) + "`")
 
 
 def get_transaction_history(code=""):
-    """ 금일 계좌별 주문/체결 내역 조회 데이터를 요청하고 수신한다."""
+    """ 금일 계좌별 주문/체결 내역 조회 데이터를 요청하고 수신한다. 다음 데이터가 있으면 이어서 받는다."""
     cpTrade.SetInputValue(0, acc)  # 계좌번호
     cpTrade.SetInputValue(1, accFlag[0])  # 상품구분 - 주식 상품 중 첫번째
     cpTrade.SetInputValue(2, code)  # 종목코드[default:""] - 생략 시 전종목에 대해서 조회가됨
-
-    wait_for_request(0)
-    cpTrade.BlockRequest()
+    cpTrade.SetInputValue(5, 20)  # 요청건수 (최대 20)
 
     history = defaultdict(list)
-    for i in range(cpTrade.GetHeaderValue(6)):
-        code = cpTrade.GetDataValue(3, i)  # 종목코드
-        name = cpTrade.GetDataValue(4, i)  # 종목이름
-        quantity = cpTrade.GetDataValue(9, i)  # 총체결수량
-        price = cpTrade.GetDataValue(11, i)  # 체결단가
-        state = cpTrade.GetDataValue(13, i)  # 정정취소구분내용
-        order = cpTrade.GetDataValue(35, i)  # 매매구분코드 1: 매도, 2: 매수
-        history[code].append({
-            'name': name,
-            'quantity': quantity,
-            'price': price,
-            'state': state,
-            'order': order
-        })
+    while True:
+        wait_for_request(0, PRIORITY_ACCOUNT)
+        cpTrade.BlockRequest()
+
+        for i in range(cpTrade.GetHeaderValue(6)):
+            code = cpTrade.GetDataValue(3, i)  # 종목코드
+            name = cpTrade.GetDataValue(4, i)  # 종목이름
+            quantity = cpTrade.GetDataValue(9, i)  # 총체결수량
+            price = cpTrade.GetDataValue(11, i)  # 체결단가
+            state = cpTrade.GetDataValue(13, i)  # 정정취소구분내용
+            order = cpTrade.GetDataValue(35, i)  # 매매구분코드 1: 매도, 2: 매수
+            history[code].append({
+                'name': name,
+                'quantity': quantity,
+                'price': price,
+                'state': state,
+                'order': order
+            })
+
+        if not cpTrade.Continue:  # 1: 다음 데이터 있음
+            break
 
     return history
 
 
+def load_order_history():
+    """재시작했을 때를 위해 금일 체결 내역을 주문 장부에 한 번 넣는다."""
+    try:
+        for code, items in get_transaction_history().items():
+            for item in items:
+                if '정상주문' == item['state']:
+                    order_manager.record(code, item['name'], str(item['order']), item['quantity'], item['price'])
+    except Exception as e:
+        traceback.print_exc(file=sys.stdout)
+        slack_send_message("`load_order_history() -> exception! " + str(e) + "`")
+
+
 def buy_stock(code, name, shares, message):
     """인자로 받은 종목을 최유리 지정가 IOC 조건으로 매수한다."""
     try:
@@ -427,176 +508,115 @@ def buy_stock(code, name, shares, message):
                           f'더 이상 구매하지 않습니다.')
             return
 
-        # 금일 계좌에 체결내역이 있을 경우 구매하지 않음
-        history = get_transaction_history(code)
-        if code in history.keys():
-            # 체결내역이 정상주문에 매수일 경우에
-            for item in history[code]:
-                if '정상주문' == item["state"]:
-                    print_message(f'거래 내역에 해당 종목이 있습니다.\n'
-                                  f'{code} {name}\n'
-                                  f'체결단가: {item["price"]:,}')
-                    return
+        # 금일 주문 내역이 있을 경우 구매하지 않음
+        if order_manager.has_traded(code):
+            print_message(f'거래 내역에 해당 종목이 있습니다.\n'
+                          f'{code} {name}')
+            return
 
-        read_blacklist()
-        if code in black_list.keys():
-            print_message(f'블랙리스트에 해당 종목({black_list[code]})이 있습니다.')
+        if code in black_list:
+            print_message(f'블랙리스트에 해당 종목({black_list.get(code)})이 있습니다.')
             return
 
-        # 최유리 IOC 매수 주문 설정
-        cpOrder.SetInputValue(0, "2")  # 2: 매수
-        cpOrder.SetInputValue(1, acc)  # 계좌번호
-        cpOrder.SetInputValue(2, accFlag[0])  # 상품구분 - 주식 상품 중 첫번째
-        cpOrder.SetInputValue(3, code)  # 종목코드
-        cpOrder.SetInputValue(4, shares)  # 매수할 수량
-        cpOrder.SetInputValue(7, "1")  # 주문조건 0:기본, 1:IOC, 2:FOK
-        cpOrder.SetInputValue(8, "12")  # 주문호가 1:보통, 3:시장가 5:조건부, 12:최유리, 13:최우선
-
-        # 매수 주문 요청
-        ret = cpOrder.BlockRequest()
-
-        if ret == 4:
-            print_message('주의: 연속 주문 제한')
-            wait_for_request(0)
-            cpOrder.BlockRequest()
-        history = get_transaction_history(code)
-        if code in history.keys():
-            # 체결내역이 정상주문에 매수일 경우에
-            for item in history[code]:
-                if '정상주문' == item["state"]:
-                    slack_send_message(f'{name} {item["price"]:,.1f}원 {shares}주 매수\n' + message)
+        # 최유리 IOC 매수 주문 요청 (체결 결과는 on_order_update 에서 알린다)
+        order_manager.place(code, name, BUY, shares, message)
+        position_cache.invalidate()
     except Exception as e:
         traceback.print_exc(file=sys.stdout)
         slack_send_message("`buy_stock(" + str(code) + ") -> exception! " + str(e) + "`")
 
 
+@metrics.timed
 def sell_watch_data():
-    """주요 신호 포착될 때 매도한다."""
+    """보유 종목에 매도 신호가 새로 포착되면 매도한다."""
     try:
-        global remark
-
         stock_balance = get_stock_balance()
 
         print_stock_balance(stock_balance)
 
-        for code in stock_balance:
+        sold = set()
+        for event in watch_log.read('sell'):
+            code = event['code']
+            if code not in stock_balance or code in sold or indicators.get(event['indicator']) is not False:
+                continue
             stock = stock_balance[code]
-            percentage = stock['percentage']
-            shares = stock['shares']
-            if code in watch_data.keys():
-                item = watch_data[code]
-                if item['indicator'] in indicators \
-                        and indicators[item['indicator']] is False:
-                    name = cpCodeMgr.CodeToName(code)
-                    message = f'[{item["time"]}] {code} {name}, {item["remark"]}'
-                    if remark != message:
-                        slack_send_message(remark)
-                    remark = message
-                    sell_stock(code, name, shares, percentage)
+            name = cpCodeMgr.CodeToName(code)
+            slack_send_message(f'[{event["time"]}] {code} {name}, {event["remark"]}')
+            sell_stock(code, name, stock['shares'], stock['percentage'])
+            sold.add(code)
     except Exception as e:
         traceback.print_exc(file=sys.stdout)
         slack_send_message("`sell_watch_data() -> exception! " + str(e) + "`")
 
 
+@metrics.timed
 def buy_watch_data():
-    """주요 신호 포착될 때 매수한다."""
+    """매수 신호가 새로 포착되면 매수한다."""
     try:
-        global remark
-
-        for code in watch_data.keys():
-            item = watch_data[code]
-            if item['indicator'] in indicators \
-                    and indicators[item['indicator']] is True:
-                if not cpCodeMgr.IsBigListingStock(code):
-                    continue
-
-                name = cpCodeMgr.CodeToName(code)
-                current_price, _, _ = get_current_stock(code)
-                enough, shares = has_enough_cash(code, name, current_price)
-                if enough:
-                    message = f'[{item["time"]}] {code} {name}, {item["remark"]}'
-                    if remark != message:
-                        buy_stock(code, name, shares, message)
-                    remark = message
-    except Exception as e:
-        traceback.print_exc(file=sys.stdout)
-        slack_send_message("`buy_watch_data() -> exception! " + str(e) + "`")
-
-
-def get_ohlc(code, window):
-    """인자로 받은 종목의 OHLC 가격 정보를 shares 개수만큼 반환한다."""
-    path = './ohlc'
-    os.makedirs(path, exist_ok=True)
-
-    today = datetime.now().strftime('%Y-%m-%d')
-    file_path = path + '/' + code + '-' + today + '.csv'
-
-    if os.path.isfile(file_path):
-        df = pd.read_csv(file_path)
-    else:
-        columns = ['open', 'high', 'low', 'close']
-        index, rows = [], []
-        cpOhlc.SetInputValue(0, code)  # 종목코드
-        cpOhlc.SetInputValue(1, ord('2'))  # 1:기간, 2:개수
-        cpOhlc.SetInputValue(4, window)  # 요청개수
-        cpOhlc.SetInputValue(5, [0, 1, 2, 3, 4, 5])  # 0:날짜, 1:시간, 2~5:시가,고가,저가,종가
-        cpOhlc.SetInputValue(6, ord('D'))  # D:일단위, m:분단위
-        cpOhlc.SetInputValue(9, ord('1'))  # 0:무수정주가, 1:수정주가
-
-        wait_for_request(1)
-        cpOhlc.BlockRequest()
-        for i in range(cpOhlc.GetHeaderValue(3)):  # 3:수신개수
-            index.append(cpOhlc.GetDataValue(0, i))
-            rows.append([cpOhlc.GetDataValue(2, i),
-                         cpOhlc.GetDataValue(3, i),
-                         cpOhlc.GetDataValue(4, i),
-                         cpOhlc.GetDataValue(5, i)])
+        events = [event for event in watch_log.read('buy') if indicators.get(event['indicator']) is True]
+        if not events:
+            return
 
-        df = pd.DataFrame(rows, index=index, columns=columns)
+        quote_snapshot.refresh_stale({event['code'] for event in events})
 
-        df.to_csv(file_path, index=True)
+        for event in events:
+            code = event['code']
+            if not cpCodeMgr.IsBigListingStock(code):
+                continue
 
-    return df
+            name = cpCodeMgr.CodeToName(code)
+            current_price, _, _ = get_current_stock(code)
+            enough, shares = has_enough_cash(code, name, current_price)
+            if enough:
+                buy_stock(code, name, shares, f'[{event["time"]}] {code} {name}, {event["remark"]}')
+    except Exception as e:
+        traceback.print_exc(file=sys.stdout)
+        slack_send_message("`buy_watch_data() -> exception! " + str(e) + "`")
 
 
-def get_ror(ohlc, k):
-    ohlc['range'] = (ohlc['high'] - ohlc['low']) * k
-    ohlc['target'] = ohlc['open'] + ohlc['range'].shift(1)
+def fetch_ohlc(code, count):
+    """인자로 받은 종목의 최근 count 개 일봉을 (날짜, 시가, 고가, 저가, 종가, 거래량) 목록으로 받는다."""
+    cpOhlc.SetInputValue(0, code)  # 종목코드
+    cpOhlc.SetInputValue(1, ord('2'))  # 1:기간, 2:개수
+    cpOhlc.SetInputValue(4, count)  # 요청개수
+    cpOhlc.SetInputValue(5, [0, 2, 3, 4, 5, 8])  # 0:날짜, 2~5:시가,고가,저가,종가, 8:거래량
+    cpOhlc.SetInputValue(6, ord('D'))  # D:일단위, m:분단위
+    cpOhlc.SetInputValue(9, ord('1'))  # 0:무수정주가, 1:수정주가
 
-    ohlc['ror'] = np.where(ohlc['high'] > ohlc['target'], ohlc['close'] / ohlc['target'], 1)
+    wait_for_request(1, PRIORITY_QUOTE)
+    cpOhlc.BlockRequest()
+    bars = []
+    for i in range(cpOhlc.GetHeaderValue(3)):  # 3:수신개수
+        bars.append([cpOhlc.GetDataValue(j, i) for j in range(6)])
 
-    return max(ohlc['ror'].cumprod())
+    return bars
 
 
-def get_k(ohlc):
-    K = 0.1
-    max_ror = get_ror(ohlc, K)
+def get_ohlc(code, window):
+    """인자로 받은 종목의 OHLC 가격 정보를 window 개수만큼 반환한다. (최신 일자가 0번)"""
+    # 일봉 저장소에 없는 날짜만 받는다.
+    bar_store.update(code, window, fetch_ohlc)
+    return bar_store.get_ohlc(code, window)
 
-    for k in [p / 10 for p in range(2, 10)]:
-        ror = get_ror(ohlc, k)
-        if max_ror < ror:
-            max_ror = ror
-            K = k
 
-    return K
+def update_ohlc(code, window=10):
+    """종목의 일봉을 받아 둔다. 지표 표에 이미 있는 종목이면 새로 생긴 일봉만 update_bar() 로 밀어 넣는다."""
+    previous = ohlc_list.get(code)
+    ohlc = ohlc_list[code] = get_ohlc(code, window)
+    if previous is None or not len(previous) or code not in indicator_engine:
+        return
 
+    for _, bar in ohlc[ohlc.index > previous.index[0]][::-1].iterrows():  # 오래된 일봉부터
+        indicator_engine.update_bar(code, bar['open'], bar['high'], bar['low'], bar['close'])
 
-def get_target_price(ohlc):
-    """매수 목표가를 반환한다."""
-    target_price = 0
 
+def update_indicators():
+    """지표 표에 없는 종목들의 이동평균, 변동폭, 매수 목표가를 한 번에 계산한다."""
     try:
-        lastday_key = ohlc.iloc[0].name
-        lastday = ohlc.loc[lastday_key]
-        today_open = lastday['close']
-        lastday_high = lastday['high']
-        lastday_low = lastday['low']
-        target_price = today_open + (lastday_high - lastday_low) * get_k(ohlc)
+        indicator_engine.set_bars({code: ohlc for code, ohlc in ohlc_list.items() if code not in indicator_engine})
     except Exception as e:
         traceback.print_exc(file=sys.stdout)
-        slack_send_message("`get_target_price() -> exception! " + str(e) + "`")
-
-    return target_price
+        slack_send_message("`update_indicators() -> exception! " + str(e) + "`")
 
 
 def get_predicted_price(code):
@@ -604,40 +624,20 @@ def get_predicted_price(code):
     predicted_price = 0
 
     try:
-        file_path = './predict/' + code + '.csv'
-        if os.path.isfile(file_path):
-            with open(file_path, 'r', encoding="utf-8") as f:
-                csv_reader = csv.reader(f)
-                for row in csv_reader:
-                    predicted_price = float(row[1])
+        record = prediction_table.get(code)
+        if record is not None:
+            predicted_price = record[0]
     except Exception as e:
         traceback.print_exc(file=sys.stdout)
-        slack_send_message("`get_target_price() -> exception! " + str(e) + "`")
+        slack_send_message("`get_predicted_price() -> exception! " + str(e) + "`")
 
     return predicted_price
 
 
-def get_movingaverage(ohlc, window):
-    """인자로 받은 종목에 대한 이동평균가격을 반환한다."""
-    try:
-        closes = ohlc['close'].sort_index()
-        ma = closes.rolling(window=window, min_periods=1).mean()
-        lastday_key = ohlc.iloc[0].name
-        return ma.loc[lastday_key]
-    except Exception as e:
-        traceback.print_exc(file=sys.stdout)
-        slack_send_message('`get_movingaverage(' + str(window) + ') -> exception! ' + str(e) + "`")
-        return None
-
-
 def read_blacklist():
+    """blacklist.csv 에 덧붙은 행을 읽는다."""
     try:
-        if os.path.isfile('blacklist.csv'):
-            with open('blacklist.csv', 'r', encoding="utf-8") as f:
-                csv_reader = csv.reader(f)
-                for row in csv_reader:
-                    if row:
-                        black_list[row[0]] = [row[1], row[2]]
+        black_list.refresh()
     except Exception as e:
         traceback.print_exc(file=sys.stdout)
         slack_send_message("`read_blacklist() -> exception! " + str(e) + "`")
@@ -645,54 +645,73 @@ def read_blacklist():
 
 def write_blacklist(code, name, percentage):
     try:
-        with open('blacklist.csv', 'a', encoding="utf-8", newline='\n') as f:
-            csv_writer = csv.writer(f)
-            row = [code, name, percentage]
-            csv_writer.writerow(row)
+        black_list.add(code, name, percentage)
     except Exception as e:
         traceback.print_exc(file=sys.stdout)
         slack_send_message("`write_blacklist() -> exception! " + str(e) + "`")
 
 
+def get_percentage(code, stock):
+    """보유 종목의 손익률. 시세 스냅샷이 최신이면 그 현재가로, 아니면 잔고 조회 때의 평가손익으로 계산한다."""
+    quote = quote_snapshot.get(code)
+    if quote is None:
+        return stock['percentage']
+    return (quote[0] - stock['price']) / stock['price'] * 100
+
+
+def is_selling(code):
+    """아직 끝나지 않은 매도 주문이 있는 종목인지 반환한다."""
+    return any(order.side == SELL and not order.done for order in order_manager.get_orders(code))
+
+
+def sell_stock_if_exit(code, stock, percentage):
+    """보유 종목 하나를 인자로 받은 손익률로 익절, 트레일링, 손절 조건을 따져 매도한다."""
+    name = stock['name']
+    shares = stock['shares']
+    price = stock['price']
+
+    predicted_price = get_predicted_price(code)  # 예상 목표가
+
+    if config.profit_rate < percentage and predicted_price and predicted_price < price:
+        sell_stock(code, name, shares, percentage)
+        slack_send_message(f'{name} {shares}주 매도\n'
+                           f'손익: `{percentage:2.2f}`\n'
+                           f'예상가: {predicted_price:2.2f}\n'
+                           f'현재가: {price:2.2f}')
+    else:
+        if code not in high_list.keys():
+            high_list[code] = percentage
+        else:
+            high_list[code] = max(percentage, high_list[code])
+
+        if config.profit_rate <= percentage:
+            if percentage <= high_list[code]:
+                sell_stock(code, name, shares, percentage)
+                slack_send_message(f'{name} {shares}주 매도 (손익: `{percentage:2.2f}`)')
+                del high_list[code]
+
+        if percentage <= config.loss_rate:
+            sell_stock(code, name, shares, percentage)
+            write_blacklist(code, name, percentage)
+            slack_send_message(f'{name} {shares}주 매도 (손익: `{percentage:2.2f}`)')
+            del high_list[code]
+
+
 def sell_all():
-    """보유한 모든 종목을 최유리 지정가 IOC 조건으로 매도한다."""
+    """보유한 모든 종목을 최유리 지정가 IOC 조건으로 매도한다.
+
+    손익률은 잔고 조회 때의 평가손익이 아니라 시세 스냅샷(실시간 체결, MarketEye)의 현재가로 계산한다.
+    """
     try:
         stock_balance = get_stock_balance()
 
         print_stock_balance(stock_balance)
 
         for code in stock_balance:
+            if is_selling(code):
+                continue
             stock = stock_balance[code]
-            name = stock['name']
-            shares = stock['shares']
-            price = stock['price']
-            percentage = stock['percentage']
-
-            predicted_price = get_predicted_price(code)  # 예상 목표가
-
-            if config.profit_rate < percentage and predicted_price and predicted_price < price:
-                sell_stock(code, name, shares, percentage)
-                slack_send_message(f'{name} {shares}주 매도\n'
-                                   f'손익: `{percentage:2.2f}`\n'
-                                   f'예상가: {predicted_price:2.2f}\n'
-                                   f'현재가: {price:2.2f}')
-            else:
-                if code not in high_list.keys():
-                    high_list[code] = percentage
-                else:
-                    high_list[code] = max(percentage, high_list[code])
-
-                if config.profit_rate <= percentage:
-                    if percentage <= high_list[code]:
-                        sell_stock(code, name, shares, percentage)
-                        slack_send_message(f'{name} {shares}주 매도 (손익: `{percentage:2.2f}`)')
-                        del high_list[code]
-
-                if percentage <= config.loss_rate:
-                    sell_stock(code, name, shares, percentage)
-                    write_blacklist(code, name, percentage)
-                    slack_send_message(f'{name} {shares}주 매도 (손익: `{percentage:2.2f}`)')
-                    del high_list[code]
+            sell_stock_if_exit(code, stock, get_percentage(code, stock))
     except Exception as e:
         traceback.print_exc(file=sys.stdout)
         slack_send_message("`sell_all() -> exception! " + str(e) + "`")
@@ -705,88 +724,192 @@ def getHMTFromTime(str_time):
     return time(hh, mm, tt).strftime("%H:%M:%S")
 
 
-def get_curr(code):
-    path = './curr'
-    os.makedirs(path, exist_ok=True)
-
+def get_curr(code, priority=PRIORITY_QUOTE):
+    """최근 체결 80건을 받아 저장되지 않은 체결만 체결 저장소에 덧붙인다."""
     today = datetime.now().strftime('%Y-%m-%d')
-    file_path = path + '/' + code + '-' + today + '.csv'
 
     # 현재가 통신
     cpStockBid.SetInputValue(0, code)
     cpStockBid.SetInputValue(2, 80)  # 요청개수 (최대 80)
     cpStockBid.SetInputValue(3, ord('C'))  # C 체결가 비교 방식 H 호가 비교방식
 
+    wait_for_request(1, priority)
     cpStockBid.BlockRequest()
 
     if cpStockBid.GetDibStatus() != 0:
         print("통신상태", cpStockBid.GetDibStatus(), cpStockBid.GetDibMsg1())
         return False
 
-    columns = ['ds', 'y']
     rows = []
     for i in range(cpStockBid.GetHeaderValue(2)):
-        rows.append([
-            today + ' ' + getHMTFromTime(cpStockBid.GetDataValue(9, i)),
-            cpStockBid.GetDataValue(4, i)
-        ])
+        rows.append((cpStockBid.GetDataValue(9, i),  # 시각 hhmmss
+                     cpStockBid.GetDataValue(4, i)))  # 체결가
+
+    return tick_store.append(code, today, rows)
+
+
+def buy_code(code):
+    """종목의 매수 목표가, 예상가, 이동평균가 보다 현재가가 클 때 매수한다."""
+    if code not in indicator_engine:
+        indicator_engine.set_bars({code: ohlc_list[code]})
+    indicator = indicator_engine.get(code)
+    target_price = indicator['target']  # 매수 목표가
+    predicted_price = get_predicted_price(code)  # 예상 목표가
+    ma5_price = indicator['ma5']  # 5일 이동평균가
+    ma10_price = indicator['ma10']  # 10일 이동평균가
+    current_price, high, low = get_current_stock(code)
+    percent = code_list[code][2]
+    # print(name, current_price, target_price, high, ma5_price, ma10_price)
+    # 매수 목표가, 5일 이동평균가, 10일 이동평균가 보다 현재가가 클 때 매수
+    if target_price < current_price < target_price + target_price * (config.profit_rate / 100) \
+            and current_price + current_price * (config.profit_rate / 100) < predicted_price \
+            and ma5_price < current_price \
+            and ma10_price < current_price \
+            and 0 < percent:
+        submit_buy(code, current_price, target_price, predicted_price, ma5_price, ma10_price)
+
+
+def submit_buy(code, current_price, target_price, predicted_price, ma5_price, ma10_price):
+    """매수 조건을 만족한 종목을 증거금이 충분하면 매수한다."""
+    # 증거금 조회도 주문 요청 제한을 쓰므로, buy_stock() 이 어차피 거를 종목은 조회 전에 거른다.
+    if order_manager.has_traded(code) or code in black_list:
+        return
+
+    name = code_list[code][3]
+    enough, shares = has_enough_cash(code, name, current_price)
+    if enough:
+        message = f'현재가: {current_price:,}원\n' \
+                  f'목표가: {int(target_price):,}원\n' \
+                  f'예상가: {int(predicted_price):,}원\n' \
+                  f'MA05: {int(ma5_price):,}원\n' \
+                  f'MA10: {int(ma10_price):,}원'
+        buy_stock(code, name, shares, message)
 
-    df = pd.DataFrame(rows, columns=columns)
 
-    if os.path.isfile(file_path):
-        df = df.append(pd.read_csv(file_path), ignore_index=True)
+def refresh_quotes():
+    """매수 후보와 보유 종목 중 quote_max_age 보다 오래된 시세를 MarketEye 로 한 번에 다시 받는다."""
+    quote_snapshot.refresh_stale(code_list.keys() | get_stock_balance().keys())
 
-    df.to_csv(file_path, index=False)
 
-    return df
+def collect_ticks():
+    """매수 후보의 체결을 한 번에 한 종목씩 돌아가며 체결 저장소에 받는다. (예측용, 매매 주기와 따로 돈다)"""
+    global tick_cursor
 
+    try:
+        codes = list(code_list.keys())
+        if not codes:
+            return
+        tick_cursor %= len(codes)
+        get_curr(codes[tick_cursor], PRIORITY_UNIVERSE)
+        tick_cursor += 1
+    except Exception as e:
+        traceback.print_exc(file=sys.stdout)
+        slack_send_message("`collect_ticks() -> exception! " + str(e) + "`")
+
+
+def evaluate_code_list():
+    """매수 후보 평가를 작업 프로세스들에 나눠 맡기고, 돌아온 매수 의도대로 이 프로세스에서 주문한다.
+
+    현재가는 MarketEye 로 200 종목씩 받은 시세 스냅샷에서 읽는다. 종목별 요청은 없다.
+    """
+    refresh_quotes()
+    sell_all()
+
+    refresh_quotes()
+    codes = list(code_list.keys())
+    prices, percents, predicted = [], [], []
+    for code in codes:
+        prices.append(get_current_stock(code)[0])
+        percents.append(code_list[code][2])
+        predicted.append(get_predicted_price(code))
 
+    results, buys = strategy.evaluate(indicator_engine.get_bars(codes), np.array(prices, dtype=float),
+                                      np.array(percents, dtype=float), np.array(predicted, dtype=float))
+    indicator_engine.set_results(np.array([indicator_engine.index[code] for code in codes]), results)
+
+    for i in buys:
+        code = codes[i]
+        indicator = indicator_engine.get(code)
+        submit_buy(code, prices[i], indicator['target'], predicted[i], indicator['ma5'], indicator['ma10'])
+
+
+@metrics.timed
 def sell_all_and_buy_code_list():
     """종목 코드의 목표가 보다 현재가가 클 때 매수한다."""
+    global ohlc_date
+
     try:
+        today = datetime.now().strftime('%Y%m%d')
+        if ohlc_date != today:
+            # 날짜가 바뀌면 받아 둔 종목도 빠진 일봉만 받아 지표를 한 칸씩 밀어 계산한다.
+            for code in list(ohlc_list.keys()):
+                update_ohlc(code)
+            ohlc_date = today
+        for code in code_list.keys():
+            if code not in ohlc_list.keys():
+                update_ohlc(code)
+        bar_store.save()
+        if strategy is not None:
+            # 지표 계산은 evaluate_code_list() 에서 작업 프로세스가 한다.
+            indicator_engine.set_bars({code: ohlc for code, ohlc in ohlc_list.items() if code not in indicator_engine},
+                                      compute=False)
+        else:
+            update_indicators()
+
+        if strategy is not None:
+            evaluate_code_list()
+            return
+
         for code in code_list.keys():
+            refresh_quotes()
             sell_all()
 
             get_curr(code)
 
-            if code not in ohlc_list.keys():
-                ohlc = get_ohlc(code, 10)
-                ohlc_list[code] = ohlc
-            else:
-                ohlc = ohlc_list[code]
-            target_price = get_target_price(ohlc)  # 매수 목표가
-            predicted_price = get_predicted_price(code)  # 예상 목표가
-            ma5_price = get_movingaverage(ohlc, 5)  # 5일 이동평균가
-            ma10_price = get_movingaverage(ohlc, 10)  # 10일 이동평균가
-            current_price, high, low = get_current_stock(code)
-            percent = code_list[code][2]
-            name = code_list[code][3]
-            # print(name, current_price, target_price, high, ma5_price, ma10_price)
-            # 매수 목표가, 5일 이동평균가, 10일 이동평균가 보다 현재가가 클 때 매수
-            if target_price < current_price < target_price + target_price * (config.profit_rate / 100) \
-                    and current_price + current_price * (config.profit_rate / 100) < predicted_price \
-                    and ma5_price < current_price \
-                    and ma10_price < current_price \
-                    and 0 < percent:
-                enough, shares = has_enough_cash(code, name, current_price)
-                if enough:
-                    message = f'현재가: {current_price:,}원\n' \
-                              f'목표가: {int(target_price):,}원\n' \
-                              f'예상가: {int(predicted_price):,}원\n' \
-                              f'MA05: {int(ma5_price):,}원\n' \
-                              f'MA10: {int(ma10_price):,}원'
-                    buy_stock(code, name, shares, message)
+            refresh_quotes()
+            buy_code(code)
     except Exception as e:
         traceback.print_exc(file=sys.stdout)
         slack_send_message("`buy_code_list() -> exception! " + str(e) + "`")
 
 
+def on_price(code, current_price, high, low):
+    """실시간 체결가가 들어오면 보유 종목의 손익 한도와 매수 후보의 매수 조건을 바로 평가한다."""
+    try:
+        quote_snapshot.update(code, current_price, high, low)
+
+        stock = position_cache.peek().get(code)
+        if stock:
+            if not is_selling(code):
+                percentage = (current_price - stock['price']) / stock['price'] * 100
+                sell_stock_if_exit(code, stock, percentage)
+        elif code in code_list.keys() and code in ohlc_list.keys():
+            buy_code(code)
+    except Exception as e:
+        traceback.print_exc(file=sys.stdout)
+        slack_send_message("`on_price(" + str(code) + ") -> exception! " + str(e) + "`")
+
+
+def update_subscriptions():
+    """보유 종목과 매수 후보로 실시간 체결 구독을 맞춘다."""
+    try:
+        priorities = {code: PRIORITY_CANDIDATE for code in code_list.keys()}
+        for code in watch_log.codes():
+            priorities.setdefault(code, PRIORITY_CANDIDATE)
+        for code in position_cache.peek().keys():
+            priorities[code] = PRIORITY_HOLDING
+        realtime.set_targets(priorities)
+    except Exception as e:
+        traceback.print_exc(file=sys.stdout)
+        slack_send_message("`update_subscriptions() -> exception! " + str(e) + "`")
+
+
 def get_balance():
     """수익률, 잔량평가손익, 매도실현손익을 파이썬 셸과 동시에 슬랙으로 출력한다."""
     cpBalance.SetInputValue(0, acc)  # 계좌번호
     cpBalance.SetInputValue(1, accFlag[0])  # 상품구분 - 주식 상품 중 첫번째
 
-    wait_for_request(0)
+    wait_for_request(0, PRIORITY_ACCOUNT)
     cpBalance.BlockRequest()
 
     yield_rate = cpBalance.GetHeaderValue(3)
@@ -794,6 +917,91 @@ def get_balance():
     slack_send_message(f'수익률: `{yield_rate:>2.2f}`%')
 
 
+def save_state():
+    """재시작 때 되살릴 장중 상태(고점, 종목, 일봉, 특징주, 상장주식수)를 파일에 저장한다."""
+    try:
+        state_store.save({
+            'date': datetime.now().strftime('%Y-%m-%d'),
+            'high_list': high_list,
+            'code_list': code_list,
+            'ohlc_list': ohlc_list,
+            'watch_log': watch_log.get_state(),
+            'listed': listed_stock_cache.listed,
+        })
+    except Exception as e:
+        traceback.print_exc(file=sys.stdout)
+        slack_send_message("`save_state() -> exception! " + str(e) + "`")
+
+
+def restore_state():
+    """저장한 상태를 되살린다. 아직 보유한 종목의 고점은 항상, 나머지는 오늘 저장한 것만 쓴다. 오늘 상태를 되살렸으면 True."""
+    try:
+        state, saved = state_store.load()
+        if state is None:
+            return False
+
+        # 저장 뒤 매도한 종목의 고점은 버린다.
+        stock_balance = get_stock_balance()
+        high_list.update({code: high for code, high in state['high_list'].items() if code in stock_balance})
+        if state['date'] != datetime.now().strftime('%Y-%m-%d'):
+            print_message(f'상태 복원: 고점 {len(high_list)} ({state["date"]} 저장)')
+            return False
+
+        code_list.update(state['code_list'])
+        ohlc_list.update(state['ohlc_list'])
+        watch_log.set_state(state['watch_log'])
+        listed_stock_cache.listed.update(state['listed'])
+        print_message(f'상태 복원: 종목 {len(code_list)}, 일봉 {len(ohlc_list)}, 특징주 {len(watch_log)}, '
+                      f'고점 {len(high_list)} ({time.time() - saved:.0f}초 전 저장)')
+        return True
+    except Exception as e:
+        traceback.print_exc(file=sys.stdout)
+        slack_send_message("`restore_state() -> exception! " + str(e) + "`")
+        return False
+
+
+def init_creon_objects():
+    """크레온 플러스 공통 OBJECT 를 생성한다."""
+    global cpBalance, cpCash, cpStockBalance, cpStockCode, cpCodeMgr, cpVolume, cpMoves, cpMarketEye, cpStatus, \
+        cpTradeUtil, cpStockMst, cpOhlc, cpOrder, cpTrade, cpStockBid, cpRpMarketWatch, acc, accFlag, scheduler, \
+        quote_snapshot, realtime, position_cache, cpConclusion, listed_stock_cache, order_manager
+
+    cpBalance = broker.Dispatch("CpTrade.CpTd6032")
+    cpCash = broker.Dispatch('CpTrade.CpTdNew5331A')
+    cpStockBalance = broker.Dispatch('CpTrade.CpTd6033')
+    cpStockCode = broker.Dispatch('CpUtil.CpStockCode')
+    cpCodeMgr = broker.Dispatch('CpUtil.CpCodeMgr')
+    cpVolume = broker.Dispatch("CpSysDib.CpSvr7049")
+    cpMoves = broker.Dispatch("CpSysDib.CpSvrNew7043")
+    cpMarketEye = broker.Dispatch("CpSysDib.MarketEye")
+    cpStatus = broker.Dispatch('CpUtil.CpCybos')
+    cpTradeUtil = broker.Dispatch('CpTrade.CpTdUtil')
+    cpStockMst = broker.Dispatch('DsCbo1.StockMst')
+    cpOhlc = broker.Dispatch('CpSysDib.StockChart')
+    cpOrder = broker.Dispatch('CpTrade.CpTd0311')
+    cpTrade = broker.Dispatch('CpTrade.CpTd5341')
+    cpStockBid = broker.Dispatch("Dscbo1.StockBid")
+    cpRpMarketWatch = CpRpMarketWatch(lambda: cpStatus.IsConnect,
+                                      lambda check_type: wait_for_request(check_type, PRIORITY_QUOTE))
+    scheduler = RequestScheduler(cpStatus, clock=broker.clock, sleep=broker.sleep)
+    quote_snapshot = QuoteSnapshot(broker.Dispatch('CpSysDib.MarketEye'), lambda: wait_for_request(1, PRIORITY_QUOTE),
+                                   config.quote_max_age, broker.clock)
+    realtime = RealtimeManager(on_price, config.realtime_limit, cpStatus, clock=broker.clock)
+    position_cache = PositionCache(fetch_stock_balance, clock=broker.clock)
+    listed_stock_cache = ListedStockCache(cpMarketEye, lambda: wait_for_request(1, PRIORITY_UNIVERSE),
+                                          cpCodeMgr.IsBigListingStock)
+    cpConclusion = CpConclusion()
+    order_manager = OrderManager(submit_order, on_order_limited)
+    order_manager.add_listener(on_order_update)
+    cpConclusion.add_listener(position_cache.on_fill)
+    cpConclusion.add_listener(order_manager.on_conclusion)
+
+    cpTradeUtil.TradeInit()
+    acc = cpTradeUtil.AccountNumber[0]  # 계좌번호
+    accFlag = cpTradeUtil.GoodsList(acc, 1)  # -1:전체,1:주식,2:선물/옵션
+
+
+@metrics.timed
 def auto_trade():
     """자동 매도, 매수, 종료한다."""
     t_now = datetime.now()
@@ -802,12 +1010,20 @@ def auto_trade():
 
     # AM 09:00 ~ PM 15:30 : 매도 & 매수
     if t_start < t_now < t_exit:
+        position_cache.invalidate()  # 주기마다 잔고 한 번 조회
+        read_blacklist()
         sell_watch_data()
         buy_watch_data()
         sell_all_and_buy_code_list()
+        update_subscriptions()
 
     # PM 15:30 ~ :프로그램 종료
     if t_exit < t_now:
+        realtime.unsubscribe_all()
+        cpConclusion.Unsubscribe()
+        tick_store.compact(t_now.strftime('%Y-%m-%d'))
+        tick_store.expire(t_now)
+        save_state()
         slack_send_message('`장 마감`')
         time.sleep(1)
         get_balance()
@@ -816,49 +1032,54 @@ def auto_trade():
         sys.exit(0)
 
 
+def start():
+    """브로커 스레드에서 크레온 객체를 만들고 첫 갱신을 한다."""
+    init_creon_objects()
+    restored = restore_state()
+
+    cpConclusion.Subscribe()
+    load_order_history()
+
+    print_message('시작 시간')
+
+    get_watch_data()
+    if not restored:
+        get_code_list()  # 되살린 종목 목록은 다음 주기에 갱신한다.
+
+
 if __name__ == '__main__':
     try:
         if is_holiday():  # 휴일
             print_message('Today is holiday')
             sys.exit(0)
 
-        if not check_creon_system():
-            connect()
-
-        # 크레온 플러스 공통 OBJECT
-        cpBalance = win32com.client.Dispatch("CpTrade.CpTd6032")
-        cpCash = win32com.client.Dispatch('CpTrade.CpTdNew5331A')
-        cpStockBalance = win32com.client.Dispatch('CpTrade.CpTd6033')
-        cpStockCode = win32com.client.Dispatch('CpUtil.CpStockCode')
-        cpCodeMgr = win32com.client.Dispatch('CpUtil.CpCodeMgr')
-        cpVolume = win32com.client.Dispatch("CpSysDib.CpSvr7049")
-        cpMoves = win32com.client.Dispatch("CpSysDib.CpSvrNew7043")
-        cpMarketEye = win32com.client.Dispatch("CpSysDib.MarketEye")
-        cpStatus = win32com.client.Dispatch('CpUtil.CpCybos')
-        cpTradeUtil = win32com.client.Dispatch('CpTrade.CpTdUtil')
-        cpStockMst = win32com.client.Dispatch('DsCbo1.StockMst')
-        cpOhlc = win32com.client.Dispatch('CpSysDib.StockChart')
-        cpOrder = win32com.client.Dispatch('CpTrade.CpTd0311')
-        cpTrade = win32com.client.Dispatch('CpTrade.CpTd5341')
-        cpStockBid = win32com.client.Dispatch("Dscbo1.StockBid")
-        cpRpMarketWatch = CpRpMarketWatch()
-
-        cpTradeUtil.TradeInit()
-        acc = cpTradeUtil.AccountNumber[0]  # 계좌번호
-        accFlag = cpTradeUtil.GoodsList(acc, 1)  # -1:전체,1:주식,2:선물/옵션
-
-        print_message('시작 시간')
-
-        get_watch_data()
-        get_code_list()
-        schedule.every(15).seconds.do(get_watch_data)
-        schedule.every(15).seconds.do(get_code_list)
-
-        schedule.every(1).seconds.do(auto_trade)
-
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
+        if not check_creon_system() and not connect():
+            print_message('`main -> connect timeout`')
+            sys.exit(1)
+
+        if config.strategy_workers:
+            strategy = ShardedEvaluator(config.strategy_workers, 10, indicator_engine.windows, indicator_engine.ks,
+                                        config.profit_rate)
+            atexit.register(strategy.close)
+
+        runtime = Runtime(BrokerExecutor(broker.init_thread),
+                          on_error=lambda job, e: slack_send_message(f'`{job.name}() -> exception! {e}`'))
+        runtime.every(15, get_watch_data, priority=PRIORITY_QUOTE)
+        runtime.every(15, get_code_list, priority=PRIORITY_UNIVERSE)
+        runtime.every(1, auto_trade, priority=PRIORITY_EXIT, policy=COALESCE)
+        if strategy is not None:
+            # 병렬 평가 주기에는 종목별 체결 요청이 없으므로 예측용 체결은 따로 받는다.
+            runtime.every(1, collect_ticks, priority=PRIORITY_UNIVERSE, policy=COALESCE)
+        runtime.every(0.1, lambda: broker.pump_events(0), name='pump_events', priority=PRIORITY_UNIVERSE + 1)
+        runtime.every(config.state_interval, save_state, priority=PRIORITY_UNIVERSE + 1)
+        runtime.every(60, lambda: print_message(runtime.report(), cpRpMarketWatch.report()), name='report',
+                      blocking=False)
+
+        metrics.registry.add_collector(metrics.runtime_collector(runtime))
+        runtime.every(15, lambda: metrics.write(config.metrics_path), name='metrics', blocking=False)
+        if config.metrics_port:
+            metrics.serve(config.metrics_port)
+        runtime.run(start)
     except Exception as ex:
         traceback.print_exc(file=sys.stdout)
         print_message('`main -> exception! ' + str(ex) + '`')
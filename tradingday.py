@@ -0,0 +1,149 @@
+import csv
+import os
+import sys
+import traceback
+from datetime import date, datetime, timedelta
+
+__all__ = ['TradingCalendar', 'get_krx_closures']
+
+
+def to_date(day):
+    if isinstance(day, datetime):
+        return day.date()
+    if isinstance(day, date):
+        return day
+    return datetime.strptime(str(day).replace('-', ''), '%Y%m%d').date()
+
+
+def get_krx_closures(year):
+    """공휴일 외의 거래소 휴장일(근로자의 날, 연말 휴장일)을 반환한다."""
+    closures = {date(year, 5, 1): '근로자의 날'}
+
+    # 연말 휴장일: 12월 마지막 평일
+    year_end = date(year, 12, 31)
+    while 5 <= year_end.weekday():
+        year_end -= timedelta(days=1)
+    closures[year_end] = '연말 휴장일'
+    return closures
+
+
+class TradingCalendar:
+    """연도별로 미리 계산한 거래일 표로 거래일 여부와 거래일 계산을 O(1) 로 한다.
+
+    휴장일은 ./calendar/<year>.csv 에 보관하고, 파일이 없는 해에만 fetch(year) 로 공휴일을 받아 만든다.
+    """
+
+    def __init__(self, path='./calendar', fetch=None):
+        self.path = path
+        self.fetch = fetch
+        self.years = set()
+        self.closures = {}  # date -> 사유
+        self.start = None  # 표의 첫 날
+        self.index = []  # 날짜 순번 -> 그 날까지의 거래일 수
+        self.trading_days = []  # 거래일 목록
+
+    def get_file_path(self, year):
+        return os.path.join(self.path, f'{year}.csv')
+
+    def load_year(self, year):
+        """year 의 휴장일을 캐시 파일에서 읽는다. 없으면 받아서 캐시 파일로 저장한다."""
+        file_path = self.get_file_path(year)
+        closures = {}
+        if os.path.isfile(file_path):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                for row in csv.reader(f):
+                    if row:
+                        closures[to_date(row[0])] = row[1]
+        else:
+            holidays = None
+            if self.fetch is not None:
+                try:
+                    holidays = self.fetch(year)
+                except Exception:
+                    traceback.print_exc(file=sys.stdout)
+
+            closures.update(holidays or {})
+            closures.update(get_krx_closures(year))
+
+            # 공휴일을 못 받았으면 다음에 다시 받도록 저장하지 않는다.
+            if holidays is not None:
+                os.makedirs(self.path, exist_ok=True)
+                temp_path = file_path + '.tmp'
+                with open(temp_path, 'w', encoding='utf-8', newline='\n') as f:
+                    csv_writer = csv.writer(f)
+                    for day, name in sorted(closures.items()):
+                        csv_writer.writerow([day.strftime('%Y%m%d'), name])
+                os.replace(temp_path, file_path)
+
+        self.closures.update(closures)
+        self.years.add(year)
+        self.build()
+
+    def build(self):
+        """불러온 연도 전체의 누적 거래일 표를 만든다."""
+        first, last = min(self.years), max(self.years)
+        self.start = date(first, 1, 1)
+        days = (date(last, 12, 31) - self.start).days + 1
+
+        self.index = []
+        self.trading_days = []
+        for offset in range(days):
+            day = self.start + timedelta(days=offset)
+            if day.weekday() < 5 and day not in self.closures:
+                self.trading_days.append(day)
+            self.index.append(len(self.trading_days))
+
+    def ensure(self, *days):
+        for year in sorted({day.year for day in days}):
+            for y in range(min(self.years | {year}), max(self.years | {year}) + 1):
+                if y not in self.years:
+                    self.load_year(y)
+
+    def count_until(self, day):
+        """표의 첫 날부터 day 까지(포함)의 거래일 수"""
+        return self.index[(day - self.start).days]
+
+    def is_trading_day(self, day=None):
+        day = to_date(day or datetime.now())
+        self.ensure(day)
+        offset = (day - self.start).days
+        return self.index[offset] != (self.index[offset - 1] if offset else 0)
+
+    def next_trading_day(self, day=None):
+        """day 다음 거래일을 반환한다."""
+        day = to_date(day or datetime.now())
+        self.ensure(day, day + timedelta(days=14))
+        count = self.count_until(day)
+        if len(self.trading_days) <= count:
+            self.ensure(date(day.year + 1, 1, 1))
+            count = self.count_until(day)
+        return self.trading_days[count]
+
+    def previous_trading_day(self, day=None):
+        """day 이전 거래일을 반환한다."""
+        day = to_date(day or datetime.now())
+        self.ensure(day - timedelta(days=14), day)
+        count = self.count_until(day - timedelta(days=1))
+        if count == 0:
+            self.ensure(date(day.year - 1, 1, 1))
+            count = self.count_until(day - timedelta(days=1))
+        return self.trading_days[count - 1]
+
+    def last_trading_day(self, day=None):
+        """day 가 거래일이면 day, 아니면 이전 거래일을 반환한다."""
+        day = to_date(day or datetime.now())
+        return day if self.is_trading_day(day) else self.previous_trading_day(day)
+
+    def add_trading_days(self, day, count):
+        """day 로부터 count 번째 거래일을 반환한다."""
+        day = to_date(day)
+        self.ensure(day)
+        while len(self.trading_days) < self.count_until(day) + count:
+            self.ensure(date(max(self.years) + 1, 1, 1))
+        return self.trading_days[self.count_until(day) + count - 1]
+
+    def trading_days_between(self, start, end):
+        """start 다음 날부터 end 까지(포함)의 거래일 수를 반환한다."""
+        start, end = to_date(start), to_date(end)
+        self.ensure(start, end)
+        return self.count_until(end) - self.count_until(start)
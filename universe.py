@@ -0,0 +1,62 @@
+import heapq
+
+from quote import MARKET_EYE_LIMIT
+
+__all__ = ['ListedStockCache', 'select_top']
+
+
+class ListedStockCache:
+    """종목별 상장주식수를 보관하고 현재가로 시가총액을 계산한다.
+
+    상장주식수는 장중에 거의 바뀌지 않으므로 처음 보는 종목만 MarketEye 로 받는다.
+    """
+    # 0: 종목코드 20: 상장주식수
+    FIELDS = [0, 20]
+
+    def __init__(self, market_eye, wait=None, is_big_listing=None):
+        self.market_eye = market_eye
+        self.wait = wait
+        self.is_big_listing = is_big_listing
+        self.listed = {}  # code -> (상장주식수, 상장주식수가 천 주 단위인지)
+        self.requests = 0
+        self.saved = 0  # 아낀 MarketEye 요청 수
+        self.hits = 0  # 다시 요청하지 않은 종목 수
+
+    def refresh(self, codes):
+        """처음 보는 종목의 상장주식수만 요청하고, 요청한 종목 수를 반환한다."""
+        codes = list(codes)
+        new_codes = [code for code in codes if code not in self.listed]
+        self.hits += len(codes) - len(new_codes)
+        # 예전처럼 전 종목을 요청했다면 필요했을 요청 수와의 차이
+        self.saved += (len(codes) + MARKET_EYE_LIMIT - 1) // MARKET_EYE_LIMIT \
+            - (len(new_codes) + MARKET_EYE_LIMIT - 1) // MARKET_EYE_LIMIT
+
+        for start in range(0, len(new_codes), MARKET_EYE_LIMIT):
+            chunk = new_codes[start:start + MARKET_EYE_LIMIT]
+            self.market_eye.SetInputValue(0, self.FIELDS)
+            self.market_eye.SetInputValue(1, chunk)
+
+            if self.wait:
+                self.wait()
+            self.market_eye.BlockRequest()
+            self.requests += 1
+
+            for i in range(self.market_eye.GetHeaderValue(2)):  # 2: 종목 수
+                code = self.market_eye.GetDataValue(0, i)
+                big = bool(self.is_big_listing(code)) if self.is_big_listing else False
+                self.listed[code] = (self.market_eye.GetDataValue(1, i), big)
+
+        return len(new_codes)
+
+    def get_market_cap(self, code, price):
+        """현재가로 계산한 시가총액(억 원)을 반환한다. 상장주식수를 모르면 0."""
+        listed_stock, big = self.listed.get(code, (0, False))
+        market_cap = price * listed_stock
+        if big:
+            market_cap *= 1000
+        return market_cap // 100000000
+
+
+def select_top(items, count, key):
+    """items (code, value) 중 key 가 큰 count 개를 큰 순으로 반환한다. O(n log count)"""
+    return heapq.nlargest(count, items, key=key)
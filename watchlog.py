@@ -0,0 +1,181 @@
+import time
+from collections import deque
+
+import numpy as np
+
+from marketwatch import indicators as remarks
+
+__all__ = ['WATCH_DTYPE', 'WatchLog']
+
+# 특징주 포착 이벤트 한 건. seq 0 은 빈 칸이다.
+WATCH_DTYPE = np.dtype([
+    ('seq', '<i8'),
+    ('timestamp', '<f8'),  # 받은 시각 (epoch 초)
+    ('time', '<i4'),  # 포착 시각 hhmm
+    ('code', 'U12'),
+    ('indicator', '<i4'),
+])
+
+
+class WatchLog:
+    """특징주 포착 이벤트를 순번(seq)을 붙여 고정 크기 링 버퍼에 쌓는다.
+
+    가득 차면 가장 오래된 이벤트부터 덮어쓰므로 메모리는 capacity 건을 넘지 않는다.
+    소비자(매수, 매도 등)마다 커서를 두어 read() 는 그 소비자가 아직 읽지 않은 이벤트만 한 번씩 반환한다.
+    종목별, 지표별 색인으로 버퍼에 남아 있는 이벤트를 찾는다.
+    """
+
+    def __init__(self, capacity=4096, clock=time.time):
+        self.capacity = capacity
+        self.clock = clock
+        self.events = np.zeros(capacity, dtype=WATCH_DTYPE)
+        self.next_seq = 1
+        self.oldest_seq = 1  # 되살린 이벤트 중 가장 오래된 seq. 그 앞의 칸은 비어 있다.
+        self.by_code = {}  # code -> deque[seq]
+        self.by_indicator = {}  # indicator -> deque[seq]
+        self.keys = {}  # (시각, 종목코드, 지표) -> seq
+        self.evicted_time = -1  # 덮어쓴 이벤트 중 가장 늦은 포착 시각
+        self.last_time = 0  # 받은 이벤트 중 가장 늦은 포착 시각
+        self.cursors = {}  # 소비자 -> 다음에 읽을 seq
+        self.dropped = {}  # 소비자 -> 읽기 전에 덮어써진 건수
+        self.duplicates = 0
+
+    def __len__(self):
+        return self.next_seq - self.first_seq
+
+    @property
+    def first_seq(self):
+        """버퍼에 남아 있는 가장 오래된 seq"""
+        return max(self.oldest_seq, self.next_seq - self.capacity)
+
+    def append(self, hm, code, indicator, timestamp=None):
+        """이벤트를 덧붙이고 seq 를 반환한다. 이미 받은(또는 덮어쓴 뒤 다시 받은) 이벤트면 None."""
+        key = (hm, code, indicator)
+        if key in self.keys or hm < self.evicted_time:
+            # CpMarketWatch 는 당일 신호를 처음부터 다시 주므로 같은 이벤트가 여러 번 온다.
+            self.duplicates += 1
+            return None
+
+        seq = self.next_seq
+        slot = seq % self.capacity
+        if self.events['seq'][slot]:
+            self.evict(slot)
+        self.events[slot] = (seq, self.clock() if timestamp is None else timestamp, hm, code, indicator)
+        self.by_code.setdefault(code, deque()).append(seq)
+        self.by_indicator.setdefault(indicator, deque()).append(seq)
+        self.keys[key] = seq
+        self.last_time = max(self.last_time, hm)
+        self.next_seq += 1
+        return seq
+
+    def evict(self, slot):
+        _, _, hm, code, indicator = self.events[slot].item()
+        for index, value in ((self.by_code, code), (self.by_indicator, indicator)):
+            seqs = index[value]
+            seqs.popleft()  # 가장 오래된 이벤트이므로 맨 앞이다.
+            if not seqs:
+                del index[value]
+        del self.keys[(hm, code, indicator)]
+        self.evicted_time = max(self.evicted_time, hm)
+
+    def get(self, seq):
+        """seq 의 이벤트를 dict(seq, timestamp, time, code, indicator, remark) 로 반환한다. 없으면 None."""
+        if not self.first_seq <= seq < self.next_seq:
+            return None
+        seq, timestamp, hm, code, indicator = self.events[seq % self.capacity].item()
+        h, m = divmod(hm, 100)
+        return {
+            'seq': seq,
+            'timestamp': timestamp,
+            'time': '%02d:%02d' % (h, m),
+            'code': code,
+            'indicator': indicator,
+            'remark': remarks.get(indicator, ''),
+        }
+
+    def read(self, consumer, limit=None):
+        """consumer 가 아직 읽지 않은 이벤트를 순서대로 반환하고 커서를 옮긴다.
+
+        처음 읽는 소비자는 버퍼의 처음부터 읽는다. 읽기 전에 덮어써진 이벤트는 dropped 에 센다.
+        """
+        cursor = self.cursors.get(consumer, self.first_seq)
+        if cursor < self.first_seq:
+            self.dropped[consumer] = self.dropped.get(consumer, 0) + self.first_seq - cursor
+            cursor = self.first_seq
+        stop = self.next_seq if limit is None else min(self.next_seq, cursor + limit)
+        self.cursors[consumer] = stop
+        return [self.get(seq) for seq in range(cursor, stop)]
+
+    def find(self, code=None, indicator=None):
+        """버퍼에 남아 있는 종목/지표의 이벤트를 오래된 순으로 반환한다."""
+        if code is None and indicator is None:
+            seqs = range(self.first_seq, self.next_seq)
+        elif indicator is None:
+            seqs = self.by_code.get(code, ())
+        elif code is None:
+            seqs = self.by_indicator.get(indicator, ())
+        else:
+            seqs = sorted(set(self.by_code.get(code, ())) & set(self.by_indicator.get(indicator, ())))
+        return [self.get(seq) for seq in seqs]
+
+    def latest(self, code):
+        """종목의 가장 최근 이벤트. 없으면 None."""
+        seqs = self.by_code.get(code)
+        return self.get(seqs[-1]) if seqs else None
+
+    def codes(self):
+        """버퍼에 이벤트가 있는 종목 코드 목록"""
+        return list(self.by_code)
+
+    def get_state(self):
+        """재시작 뒤 set_state() 로 되살릴 이벤트와 소비자 커서를 반환한다."""
+        return {
+            'events': self.events[self.events['seq'] > 0],  # 빈 칸은 빼고 저장한다.
+            'next_seq': self.next_seq,
+            'cursors': dict(self.cursors),
+            'dropped': dict(self.dropped),
+            'evicted_time': self.evicted_time,
+            'last_time': self.last_time,
+            'duplicates': self.duplicates,
+        }
+
+    def set_state(self, state):
+        """get_state() 의 상태를 되살린다. capacity 가 작아졌으면 최근 이벤트만 남긴다.
+
+        capacity 가 커졌어도 first_seq 는 되살린 가장 오래된 이벤트보다 앞으로 가지 않는다.
+        """
+        events = np.sort(state['events'][state['events']['seq'] > 0], order='seq')
+        evicted, events = events[:-self.capacity], events[-self.capacity:]
+
+        self.events[:] = 0
+        self.by_code.clear()
+        self.by_indicator.clear()
+        self.keys.clear()
+        for record in events:
+            seq, _, hm, code, indicator = record.item()
+            self.events[seq % self.capacity] = record
+            self.by_code.setdefault(code, deque()).append(seq)
+            self.by_indicator.setdefault(indicator, deque()).append(seq)
+            self.keys[(hm, code, indicator)] = seq
+
+        self.next_seq = state['next_seq']
+        # 저장 전에 덮어쓴 이벤트와 빈 칸을 읽지 않도록 되살린 이벤트의 처음부터 읽게 한다.
+        self.oldest_seq = int(events['seq'][0]) if len(events) else self.next_seq
+        self.dropped = dict(state['dropped'])
+        self.cursors = {}
+        for consumer, cursor in state['cursors'].items():
+            if cursor < self.first_seq:
+                self.dropped[consumer] = self.dropped.get(consumer, 0) + self.first_seq - cursor
+            self.cursors[consumer] = max(cursor, self.first_seq)
+        self.evicted_time = max([state['evicted_time']] + evicted['time'].tolist())
+        self.last_time = state['last_time']
+        self.duplicates = state['duplicates']
+
+    def stats(self):
+        return {
+            'events': len(self),
+            'appended': self.next_seq - 1,
+            'duplicates': self.duplicates,
+            'lag': {consumer: self.next_seq - cursor for consumer, cursor in self.cursors.items()},
+            'dropped': dict(self.dropped),
+        }